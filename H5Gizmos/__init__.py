@@ -1,5 +1,9 @@
 "Tools for building interactive graphical interfaces for applications using browser technology and HTML5"
 
+from time import perf_counter as _perf_counter
+# for the H5GIZMOS_STARTUP_PROFILE startup time breakdown.
+_import_started = _perf_counter()
+
 from .python.gizmo_server import (
     #run,
     serve,
@@ -46,9 +50,18 @@ from .python.gz_jQuery import (
     show_matplotlib_plt,
 )
 
+from .python.gz_virtual_stack import VirtualStack
+from .python.gz_data_grid import DataGrid
+from .python.gz_image_stream import ImageStream
+from .python.gz_tiled_image import TiledImage
+from .python.gz_time_series import TimeSeries
+
 from .python.gz_tools import (
     use_proxy,
     use_proxy_if_remote,
 )
 
 from .python.gizmo_link import setup_gizmo_link
+
+from .python.gizmo_server import startup_mark as _startup_mark
+_startup_mark("H5Gizmos imported")
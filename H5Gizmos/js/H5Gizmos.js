@@ -174,6 +174,31 @@ var H5Gizmos = {};
         forget_reference(id_string) {
             delete this.object_cache[id_string];
         };
+        destroy_caches(id_strings) {
+            // Release component object caches (Component.destroy): remove cached jQuery elements
+            // from the DOM, call destroy() on other cached objects which have one, and forget the caches.
+            for (var id_string of id_strings) {
+                var cache = this.object_cache[id_string];
+                if (cache) {
+                    for (var key in cache) {
+                        var value = cache[key];
+                        if (!value) {
+                            continue;
+                        }
+                        try {
+                            if (value.jquery) {
+                                value.remove();
+                            } else if (typeof value.destroy == "function") {
+                                value.destroy();
+                            }
+                        } catch (error) {
+                            console.warn("destroy failed for " + id_string + "." + key, error);
+                        }
+                    }
+                }
+                delete this.object_cache[id_string];
+            }
+        };
         send(json_object) {
             var that = this;
             // need to send halt confirmation.
@@ -992,6 +1017,132 @@ var H5Gizmos = {};
         return new StoreBlob(url, to_object, property_name, converter);
     };
 
+    // Transfers in progress by url, for cancellation.
+    H5Gizmos.active_transfers = {};
+
+    // Fetch binary data into a preallocated buffer using parallel HTTP Range requests.
+    class FetchArray extends DeferredValue {
+        constructor(url, to_object, property_name, converter, total_bytes, options) {
+            super();
+            options = options || {};
+            this.url = url;
+            this.to_object = to_object;
+            this.property_name = property_name;
+            this.converter = converter;
+            this.total_bytes = total_bytes;
+            this.chunk_size = Math.max(1, options.chunk_size || total_bytes);
+            this.parallel = Math.max(1, options.parallel || 1);
+            this.on_progress = options.on_progress || null;
+            this.shape = options.shape || null;
+            this.loaded = 0;
+            this.last_progress = 0;
+            this.buffer = new ArrayBuffer(total_bytes);
+            this.bytes = new Uint8Array(this.buffer);
+            this.controller = new AbortController();
+            this.next_start = 0;
+            H5Gizmos.active_transfers[url] = this;
+            var that = this;
+            this.run().then(
+                function () { that.on_complete(); },
+                function (err) { that.on_failure(err); }
+            );
+        };
+        async run() {
+            if (this.total_bytes <= this.chunk_size) {
+                // one request: no range needed.
+                await this.fetch_chunk(0, this.total_bytes, false);
+                return;
+            }
+            var workers = [];
+            for (var i=0; i<this.parallel; i++) {
+                workers.push(this.work());
+            }
+            await Promise.all(workers);
+        };
+        async work() {
+            while (this.next_start < this.total_bytes) {
+                var start = this.next_start;
+                var end = Math.min(start + this.chunk_size, this.total_bytes);
+                this.next_start = end;
+                await this.fetch_chunk(start, end, true);
+            }
+        };
+        async fetch_chunk(start, end, use_range) {
+            var headers = {};
+            if (use_range) {
+                headers["Range"] = "bytes=" + start + "-" + (end - 1);
+            }
+            var response = await fetch(this.url, {headers: headers, signal: this.controller.signal});
+            if (!response.ok) {
+                throw new Error("fetch failed: " + response.status + " " + this.url);
+            }
+            var reader = response.body.getReader();
+            var cursor = start;
+            while (true) {
+                var result = await reader.read();
+                if (result.done) {
+                    break;
+                }
+                var chunk = result.value;
+                if (cursor + chunk.length > end) {
+                    throw new Error("too much data for range: " + [start, end]);
+                }
+                this.bytes.set(chunk, cursor);
+                cursor += chunk.length;
+                this.loaded += chunk.length;
+                this.report_progress();
+            }
+            if (cursor != end) {
+                throw new Error("incomplete data for range: " + [start, end, cursor]);
+            }
+        };
+        report_progress() {
+            // Throttle progress callbacks which are sent over the web socket.
+            var now = Date.now();
+            if (this.on_progress && 
+                ((this.loaded == this.total_bytes) || (now - this.last_progress > 100))) {
+                this.last_progress = now;
+                this.on_progress(this.loaded, this.total_bytes);
+            }
+        };
+        cancel() {
+            this.controller.abort();
+        };
+        on_complete() {
+            delete H5Gizmos.active_transfers[this.url];
+            try {
+                var binary_data = this.buffer;
+                var converter = this.converter;
+                if (converter) {
+                    binary_data = new converter(binary_data);
+                }
+                if (this.shape) {
+                    binary_data.shape = this.shape;
+                }
+                this.to_object[this.property_name] = binary_data;
+                this.resolve(binary_data.length);
+            } catch (err) {
+                this.reject(err);
+            }
+        };
+        on_failure(err) {
+            delete H5Gizmos.active_transfers[this.url];
+            this.controller.abort();
+            this.reject(err);
+        };
+    };
+
+    H5Gizmos.fetch_array = function (url, to_object, property_name, converter, total_bytes, options) {
+        return new FetchArray(url, to_object, property_name, converter, total_bytes, options);
+    };
+
+    H5Gizmos.cancel_transfer = function (url) {
+        var transfer = H5Gizmos.active_transfers[url];
+        if (transfer) {
+            transfer.cancel();
+        }
+    };
+
     class StoreJSON extends StoreBlob {
         constructor(url, to_object, property_name) {
             super(url, to_object, property_name, null, "json");
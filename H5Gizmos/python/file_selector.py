@@ -75,6 +75,11 @@ class FileSelector:
         assert os.path.isdir(root_folder), "Root folder should be a directory: " + repr(root_folder)
         self.start_location = start_location
         self.current_location = start_location
+        # Reuse path selectors and listing stacks across resets so only the changes are sent.
+        # Entries which are no longer displayed are destroyed after each reset.
+        self.path_selectors = {}
+        self.listing_stacks = {}
+        self.displayed_keys = set()
         self.title_text = gz.Text(title)
         self.input_area = gz.Input(self.current_location, size=input_width)
         value = self.get_value()
@@ -107,6 +112,7 @@ class FileSelector:
             self.info_area.text("no select action for " + repr(value))
     
     def listing_gizmo(self):
+        self.displayed_keys = set()
         current_path = ""
         components = splitall(self.current_location)
         return self.listing_gizmo_recursive(current_path, components)
@@ -124,9 +130,9 @@ class FileSelector:
                     filepath = os.path.join(current_path, filename)
                     full_filepath = os.path.join(self.root_folder, filepath)
                     is_subdir = os.path.isdir(full_filepath)
-                    selector = PathSelector(self, filename, filepath, is_subdir)
+                    selector = self.path_selector(filename, filepath, is_subdir)
                     children.append(selector.gizmo)
-                result = gz.Stack(children)
+                result = self.listing_stack(current_path, children)
             else:
                 # just list the file
                 return None
@@ -138,12 +144,31 @@ class FileSelector:
             #next_is_dir = os.path.isdir(next_full_path)
             other_components = components[1:]
             sublisting = self.listing_gizmo_recursive(next_path, other_components)
-            selector = PathSelector(self, this_component, current_path, is_dir=True, flag="--")
+            selector = self.path_selector(this_component, current_path, is_dir=True, flag="--")
             children = [selector.gizmo]
             if sublisting is not None:
                 children.append(sublisting)
-            result = gz.Stack(children)
+            result = self.listing_stack(current_path, children)
+        return result
+
+    def path_selector(self, component, current_path, is_dir=False, flag="++"):
+        key = (component, current_path, is_dir, flag)
+        self.displayed_keys.add(key)
+        result = self.path_selectors.get(key)
+        if result is None:
+            result = self.path_selectors[key] = PathSelector(self, component, current_path, is_dir, flag)
+        return result
+
+    def listing_stack(self, current_path, children):
+        "Reuse the displayed stack for the path, updating only the children that changed."
+        self.displayed_keys.add(current_path)
+        result = self.listing_stacks.get(current_path)
+        if result is not None and result.element is not None:
+            result.attach_children(children)
+            return result
+        result = gz.Stack(children)
         result.css({"margin-left": "20px"})
+        self.listing_stacks[current_path] = result
         return result
 
     def set_current_path(self, to_path):
@@ -162,6 +187,20 @@ class FileSelector:
         self.input_area.set_value(to_path)
         gizmo = self.listing_gizmo()
         self.listing_container.attach_children([gizmo])
+        self.prune()
+
+    def prune(self):
+        "Destroy the cached selectors and stacks which are no longer displayed."
+        displayed = self.displayed_keys
+        kept = [selector.gizmo for (key, selector) in self.path_selectors.items() if key in displayed]
+        kept += [stack for (key, stack) in self.listing_stacks.items() if key in displayed]
+        stale = []
+        for key in [key for key in self.path_selectors if key not in displayed]:
+            stale.append(self.path_selectors.pop(key).gizmo)
+        for key in [key for key in self.listing_stacks if key not in displayed]:
+            stale.append(self.listing_stacks.pop(key))
+        for component in stale:
+            component.destroy(keep=kept)
 
     def get_value(self):
         return os.path.join(self.root_folder, self.current_location)
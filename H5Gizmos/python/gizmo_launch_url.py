@@ -5,6 +5,7 @@ from .gz_jQuery import Html
 from .gz_parent_protocol import schedule_task
 import traceback
 import html
+import time
 
 ERR_TEMPLATE = """
 <p>
@@ -35,13 +36,80 @@ REDIRECT_PAGE = """
 </html>
 """
 
+def prime_gizmo(gizmo):
+    "Register the standard jQuery component dependencies for a gizmo ahead of time."
+    primer = Html("<div></div>")
+    primer.attach_gizmo(gizmo)
+
+class WarmGizmoPool:
+
+    """
+    Gizmos created ahead of time, with managers, entry pages and the standard
+    static dependencies already registered, ready to be bound to new components.
+    The session reaper leaves gizmos alone while they wait in the pool.
+    """
+
+    def __init__(self, size=2, title="launched gizmo", primer=prime_gizmo):
+        self.size = size
+        self.title = title
+        self.primer = primer
+        self.ready = []
+        self.starting = 0
+
+    def fill(self):
+        while len(self.ready) + self.starting < self.size:
+            self.starting += 1
+            schedule_task(self.add_warm_gizmo())
+
+    async def make_gizmo(self):
+        gizmo = await get_gizmo(title=self.title)
+        if self.primer is not None:
+            self.primer(gizmo)
+        return gizmo
+
+    async def add_warm_gizmo(self):
+        try:
+            gizmo = await self.make_gizmo()
+            gizmo._manager.pooled = True
+            self.ready.append(gizmo)
+        finally:
+            self.starting -= 1
+
+    async def take(self):
+        "Return a warm gizmo if one is ready, otherwise make one now.  Refill in the background."
+        result = None
+        while self.ready and result is None:
+            gizmo = self.ready.pop(0)
+            # skip gizmos removed by the session reaper
+            if not gizmo._torn_down:
+                result = gizmo
+        self.fill()
+        if result is None:
+            result = await self.make_gizmo()
+        result._manager.pooled = False
+        result._manager.last_activity = time.time()
+        return result
+
+async def launch_component(component, title="launched gizmo", warm_pool=None):
+    "Start a component in a new (or warm) gizmo and schedule the round-trip start test."
+    if warm_pool is not None:
+        gizmo = await warm_pool.take()
+    else:
+        gizmo = await get_gizmo(title=title)
+    component.prepare_application(gizmo)
+    component.add_std_icon(gizmo)
+    #print("schedule round-trip communication test...")
+    schedule_task(gizmo._has_started())
+    return gizmo
+
 class LaunchGizmoAndRedirect(FileGetter):
 
-    def __init__(self, component_maker, title="launched gizmo", proxy=False, parent_component=None):
+    def __init__(self, component_maker, title="launched gizmo", proxy=False, parent_component=None, warm_pool=None):
         self.title = title
         self.component_maker = component_maker
         self.proxy = proxy
         self.parent_component = parent_component
+        self.warm_pool = warm_pool
         self.delay_ms = 50  # hardcoded for now.
 
     async def handle_get(self, info, request, interface=STDInterface):
@@ -50,14 +118,13 @@ class LaunchGizmoAndRedirect(FileGetter):
             component = self.component_maker()
         except:
             return self.error_response(interface)
-        gizmo = await get_gizmo(title=self.title)
-        component.prepare_application(gizmo)
-        component.add_std_icon(gizmo)
-        #print("schedule round-trip communication test...")
-        schedule_task(gizmo._has_started())
+        gizmo = await launch_component(component, title=self.title, warm_pool=self.warm_pool)
+        return self.redirect_response(gizmo._manager.identifier, gizmo._filename, interface)
+
+    def redirect_response(self, identifier, filename, interface):
         nonce = new_identifier("N")
         #redirect_url = gizmo._entry_url(proxy=self.proxy)
-        redirect_url = "../%s/%s?nonce=%s" % (gizmo._manager.identifier, gizmo._filename, nonce)  # use relative url
+        redirect_url = "../%s/%s?nonce=%s" % (identifier, filename, nonce)  # use relative url
         parent_component = self.parent_component
         if parent_component is not None:
             parent_component.add("created new gizmo at " + repr(redirect_url))
@@ -77,10 +144,18 @@ class LaunchGizmoAndRedirect(FileGetter):
         response = interface.respond(body=err_fmt.encode("utf8"), content_type="text/html")
         return response
 
-def add_launcher(to_gizmo, component_maker, filename=None, parent_component=None):
+def add_launcher(to_gizmo, component_maker, filename=None, parent_component=None, warm_pool_size=0):
+    """
+    Serve a URL which launches a new gizmo for a new component from component_maker for each request.
+    If warm_pool_size is positive keep that many gizmos ready in advance to speed up launches.
+    """
     if filename is None:
         filename = new_identifier("gizmo_launcher")
-    launcher = LaunchGizmoAndRedirect(component_maker, parent_component=parent_component)
+    warm_pool = None
+    if warm_pool_size > 0:
+        warm_pool = WarmGizmoPool(warm_pool_size)
+        warm_pool.fill()
+    launcher = LaunchGizmoAndRedirect(component_maker, parent_component=parent_component, warm_pool=warm_pool)
     mgr = to_gizmo._manager
     mgr.add_http_handler(filename, launcher)
     relative_url = to_gizmo.relative_url(filename)
@@ -91,11 +166,11 @@ def add_launcher(to_gizmo, component_maker, filename=None, parent_component=None
 
 class Launcher:
 
-    def __init__(self, component, component_maker, filename=None):
+    def __init__(self, component, component_maker, filename=None, warm_pool_size=0):
         self.to_gizmo = component.gizmo
         self.component_maker = component_maker
         (self.relative_url, self.full_url, self.filename) = add_launcher(
-            self.to_gizmo, component_maker, filename)
+            self.to_gizmo, component_maker, filename, warm_pool_size=warm_pool_size)
         self.active = True
 
     def anchor_string(self, text=None, relative=True):
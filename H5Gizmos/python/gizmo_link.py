@@ -111,7 +111,12 @@ from .gz_parent_protocol import schedule_task
 from .gizmo_script_support import GIZMO_SCRIPT
 import os
 import json
+import shlex
+import time
+import html
+import collections
 from . import gizmo_script_support
+from .gizmo_server import UNIX_SOCKET_ENV_VAR, UNIX_SOCKET_ONLY_ENV_VAR, unix_socket_path
 
 # refs
 # https://stackoverflow.com/questions/62355732/python-package-discovery-for-entry-points-subgroups
@@ -128,6 +133,59 @@ JUPYTER_SERVER_PLUGIN_NAME = "GizmoLink"
 
 REDIRECT_AUTOMATICALLY = True
 
+# Environment variable giving the number of warm (pre-imported) script workers to keep per module.
+WARM_POOL_ENV_VAR = "GIZMO_LINK_WARM_POOL"
+
+# Environment variable giving seconds without proxied traffic before a gizmo script process is killed (unset: never).
+SCRIPT_IDLE_TTL_ENV_VAR = "GIZMO_LINK_IDLE_TTL"
+
+# Environment variable giving the maximum running scripts for each user and module (unset: no limit).
+SCRIPT_LIMIT_ENV_VAR = "GIZMO_LINK_SCRIPT_LIMIT"
+
+# Bytes of output kept for each script output stream.
+SCRIPT_LOG_LIMIT = 1 << 18
+
+# Script output read size.
+SCRIPT_READ_SIZE = 1 << 16
+
+# Finished scripts listed on the status page.
+FINISHED_SCRIPTS_KEPT = 20
+
+# Request headers forwarded to the upstream gizmo server.
+FORWARD_REQUEST_HEADERS = (
+    "Accept", "Accept-Encoding", "Content-Type", "Range", "If-Range",
+    "If-None-Match", "If-Modified-Since", "If-Match", "If-Unmodified-Since", "Cookie",
+)
+
+# Upstream response headers relayed to the browser.
+FORWARD_RESPONSE_HEADERS = (
+    "Content-Type", "Content-Encoding", "Content-Range", "Accept-Ranges", "Vary",
+    "ETag", "Last-Modified", "Cache-Control",
+)
+
+RELAY_CHUNK_SIZE = 1 << 16
+
+# Keep alive connections per upstream port.
+UPSTREAM_CONNECTION_LIMIT = 32
+
+# Upstream sessions and warm pools kept (least recently used idle ones are closed beyond these).
+UPSTREAM_SESSION_LIMIT = 64
+WARM_POOL_MODULE_LIMIT = 16
+
+# Web socket messages buffered in each relay direction before reading pauses.
+WS_RELAY_QUEUE_SIZE = 64
+
+# Web socket relay directions.
+TO_CLIENT = "to_client"
+TO_SERVER = "to_server"
+
+RELAYED_WS_TYPES = (
+    aiohttp.WSMsgType.TEXT,
+    aiohttp.WSMsgType.BINARY,
+    aiohttp.WSMsgType.PING,
+    aiohttp.WSMsgType.PONG,
+)
+
 icon_path = os.path.join(static_folder, "logo.svg")
 start_html_path = os.path.join(static_folder, "gizmo_link_start.html")
 
@@ -161,14 +219,39 @@ PROTOCOLS = ("http", "ws")
 
 class GizmoLink:
 
-    def __init__(self, port, base_url, prefix, verbose=True):
+    upstream_limit = UPSTREAM_SESSION_LIMIT
+    warm_pool_limit = WARM_POOL_MODULE_LIMIT
+
+    def __init__(self, port, base_url, prefix, verbose=True, warm_pool_size=None, unix_socket_dir=None, unix_socket_only=None):
         self.port = port
         self.base_url = base_url
         self.prefix = prefix
         self.verbose = verbose
+        if warm_pool_size is None:
+            warm_pool_size = int(os.environ.get(WARM_POOL_ENV_VAR, "0"))
+        self.warm_pool_size = warm_pool_size
+        # ports and modules come from client URLs: both are least recently used first.
+        self.module_to_warm_pool = collections.OrderedDict()
+        self.port_to_upstream = collections.OrderedDict()
+        # Gizmo scripts started here listen on Unix domain sockets in this folder if set.
+        if unix_socket_dir is None:
+            unix_socket_dir = os.environ.get(UNIX_SOCKET_ENV_VAR) or None
+        if unix_socket_only is None:
+            unix_socket_only = bool(os.environ.get(UNIX_SOCKET_ONLY_ENV_VAR))
+        self.unix_socket_dir = unix_socket_dir
+        self.unix_socket_only = unix_socket_only and (unix_socket_dir is not None)
+        self.supervisor = ScriptSupervisor(activity=self.last_activity, verbose=verbose)
         if self.verbose:
             print("GizmoLink created.")
 
+    def script_environment(self):
+        "Environment variable settings for gizmo scripts started by the proxy."
+        result = {}
+        if self.unix_socket_dir is not None:
+            result[UNIX_SOCKET_ENV_VAR] = self.unix_socket_dir
+            result[UNIX_SOCKET_ONLY_ENV_VAR] = "1" if self.unix_socket_only else ""
+        return result
+
     def json_parameters(self, module_name=None, script_name=None, prefix=None, redirect=False):
         result = dict(
             port=self.port,
@@ -184,6 +267,8 @@ class GizmoLink:
             result["modules_and_scripts"] = gizmo_script_support.modules_and_scripts_json()
         elif script_name is None:
             result["module_detail"] = gizmo_script_support.module_detail_json(module_name)
+            # warm up workers while the user chooses a script.
+            self.warm_pool(module_name)
         else:
             result["launch"] = (prefix is not None)
         return result
@@ -198,11 +283,92 @@ class GizmoLink:
         #app.router.add_route('GET', '/demo', self.demo)
         app.router.add_route('GET', '/test', self.test)
         app.router.add_route('GET', '/icon', self.icon)
+        app.router.add_route('GET', '/proxy_stats', self.proxy_stats)
+        app.router.add_route('GET', '/status', self.status)
         app.router.add_static("/static", static_folder, show_index=True)
+        app.on_startup.append(self.startup)
+        app.on_cleanup.append(self.cleanup)
         if self.verbose:
             print("GizmoLink app created.")
         return app
 
+    async def startup(self, app):
+        self.supervisor.start_reaper()
+
+    async def cleanup(self, app):
+        self.supervisor.stop_reaper()
+        for pool in self.module_to_warm_pool.values():
+            pool.stop()
+        for upstream in self.port_to_upstream.values():
+            await upstream.close()
+
+    def upstream(self, port):
+        "The pooled upstream session for the gizmo server at port."
+        upstreams = self.port_to_upstream
+        result = upstreams.get(port)
+        if result is None:
+            result = upstreams[port] = UpstreamSession(port, unix_socket_dir=self.unix_socket_dir)
+            self.evict_upstreams()
+        else:
+            upstreams.move_to_end(port)
+        return result
+
+    def evict_upstreams(self):
+        "Close least recently used upstream sessions without open requests beyond upstream_limit."
+        upstreams = self.port_to_upstream
+        excess = len(upstreams) - self.upstream_limit
+        # never the newest, which is about to be used.
+        for (port, upstream) in list(upstreams.items())[:-1]:
+            if excess <= 0:
+                break
+            if upstream.in_use():
+                continue
+            del upstreams[port]
+            schedule_task(upstream.close())
+            excess -= 1
+
+    def last_activity(self, port):
+        "Time of the last proxied traffic for the gizmo server at port (or None)."
+        upstream = self.port_to_upstream.get(port)
+        if upstream is None:
+            return None
+        return upstream.last_activity
+
+    async def status(self, request):
+        "Status of the gizmo script processes as HTML (or JSON with ?format=json)."
+        if request.rel_url.query.get("format") == "json":
+            return self.respond_bytes(json.dumps(self.supervisor.status(), indent=4), content_type="application/json")
+        return self.respond_bytes(self.supervisor.status_html())
+
+    async def proxy_stats(self, request):
+        "Request counts and latencies for each upstream gizmo server as JSON."
+        stats = {str(port): upstream.stats() for (port, upstream) in sorted(self.port_to_upstream.items())}
+        return self.respond_bytes(json.dumps(stats, indent=4), content_type="application/json")
+
+    def warm_pool(self, module_name):
+        "Get the warm worker pool for the module (filling it in the background), or None if disabled."
+        if self.warm_pool_size <= 0:
+            return None
+        pools = self.module_to_warm_pool
+        pool = pools.get(module_name)
+        if pool is None:
+            pool = WarmScriptPool(
+                module_name, self.warm_pool_size, verbose=self.verbose, environment=self.script_environment())
+            pools[module_name] = pool
+            while len(pools) > self.warm_pool_limit:
+                (evicted_name, evicted) = pools.popitem(last=False)
+                evicted.stop()
+        else:
+            pools.move_to_end(module_name)
+        pool.fill()
+        return pool
+
+    def take_warm_process(self, module_name):
+        pool = self.warm_pool(module_name)
+        if pool is None:
+            return None
+        return pool.take()
+
     async def icon(self, request):
         bytes = open(icon_path, "rb").read()
         return self.respond_bytes(bytes, content_type="image/svg+xml")
@@ -234,13 +400,22 @@ class GizmoLink:
         #if self.verbose:
         #    print("Start parameters:", json_parameters)
         if json_parameters["launch"]:
-            watcher = ScriptWatcher(module, script, prefix)
+            user = request_user(request)
             try:
-                link_url = await watcher.start_script_and_get_start_url()
-            except Exception as e:
+                self.supervisor.check_limit(user, module)
+            except ScriptLimitExceeded as e:
                 json_parameters["launch_exception"] = repr(e)
             else:
-                json_parameters["link_url"] = link_url
+                warm_process = self.take_warm_process(module)
+                watcher = ScriptWatcher(
+                    module, script, prefix, warm_process=warm_process, environment=self.script_environment())
+                try:
+                    link_url = await watcher.start_script_and_get_start_url()
+                except Exception as e:
+                    json_parameters["launch_exception"] = repr(e)
+                else:
+                    json_parameters["link_url"] = link_url
+                self.supervisor.add(watcher, user)
         json_parameter_str = json.dumps(json_parameters, indent=4)
         formatted = template.format(
             JSON_PARAMETERS=json_parameter_str,
@@ -258,62 +433,44 @@ class GizmoLink:
         self.verbose_check("connect_get", request)
         (prefix, port, protocol, target_path) = self.parse_connect_path(request)
         assert prefix == "connect", "bad prefix: " + repr(prefix)
-        target_url = "http://localhost:%s/%s" % (port, target_path)
+        target_url = self.upstream(port).target_url(target_path)
         if self.verbose:
             print("forwarding GET to target", repr(target_url))
         if protocol == "http":
-            # get request
-            # xxxx kiss for now.
-            async with aiohttp.ClientSession() as session:
-                async with session.get(target_url) as resp:
-                    status = resp.status
-                    content_type = resp.content_type
-                    # xxxx should probably stream this?
-                    bytes = await resp.read()
-                    # forward....
-                    # xxxx should use streaming?
-                    return self.respond_bytes(bytes, content_type, status)
+            return await self.upstream(port).relay("GET", target_url, request)
         else:
             assert protocol == "ws", (
                 "For GET protocol must be ws or http: " + repr(protocol))
             # ws connection
-            ws = web.WebSocketResponse()
+            # pings and pongs are relayed to the gizmo server, not answered here.
+            ws = web.WebSocketResponse(autoping=False)
             await ws.prepare(request)
             if self.verbose:
                 print("ws attached.")
-            connector = WebSocketConnector(ws, port, target_path, self.verbose)
-            await connector.get_server_ws()
-            connector.start_listener_tasks()
-            await connector.server_listener_task
+            upstream = self.upstream(port)
+            connector = WebSocketConnector(
+                ws, port, target_path, self.verbose, session=upstream.get_ws_session(), monitor=upstream,
+                server_url=target_url)
+            upstream.open_web_sockets += 1
+            try:
+                await connector.get_server_ws()
+                connector.start_listener_tasks()
+                await connector.server_listener_task
+            finally:
+                upstream.open_web_sockets -= 1
 
     async def connect_post(self, request):
         "Connect HTTP POST to underlying gizmo"
         self.verbose_check("connect_post", request)
         (prefix, port, protocol, target_path) = self.parse_connect_path(request)
         assert prefix == "connect", "bad prefix: " + repr(prefix)
-        target_url = "http://localhost:%s/%s" % (port, target_path)
+        target_url = self.upstream(port).target_url(target_path)
         if self.verbose:
             print("forwarding POST to target", repr(protocol), repr(target_url))
         if protocol == "http":
-            # Streaming uploads
+            # Streaming uploads and downloads
             # https://docs.aiohttp.org/en/stable/client_quickstart.html
-            content = request.content
-            async def content_sender():
-                chunk = await content.readany()
-                while chunk:
-                    yield chunk
-                    chunk = await content.readany()
-            async with aiohttp.ClientSession() as session:
-                # stream post data
-                async with session.post(target_url, data=content_sender()) as resp:
-                    status = resp.status
-                    content_type = resp.content_type
-                    # xxxx should probably stream this?
-                    bytes = await resp.read()
-                    #print("    got post response", len(bytes), status, content_type)
-                    #if len(bytes) < 1000:
-                    #    print (repr(bytes))
-                    return self.respond_bytes(bytes, content_type, status)
+            return await self.upstream(port).relay("POST", target_url, request)
         else:
             assert protocol == "http", "POST expects 'http' protocol marker: " + repr(protocol)
         #return await self.test(request)
@@ -380,48 +537,312 @@ class GizmoLink:
         return self.base_url + ("/".join(path_components))
 
 
+class RelayTruncated(ConnectionError):
+
+    "The relay failed after the response headers were sent: the client connection was aborted."
+
+    def __init__(self, response, cause):
+        super().__init__("Relayed response truncated: " + repr(cause))
+        self.response = response
+        self.cause = cause
+
+async def relay_http(session, method, target_url, request, chunk_size=RELAY_CHUNK_SIZE, on_headers=None):
+    """
+    Relay request to target_url using the client session, streaming the request body
+    (for POST) and the response body.  Writes wait for the client, which applies back pressure upstream.
+    Call on_headers() (if given) when the upstream response headers arrive.
+    Errors before the response is prepared propagate.  Later errors abort the client connection
+    (so the client sees a truncated response) and raise RelayTruncated.
+    """
+    headers = {}
+    for name in FORWARD_REQUEST_HEADERS:
+        value = request.headers.get(name)
+        if value is not None:
+            headers[name] = value
+    data = None
+    if method == "POST":
+        data = request.content
+    async with session.request(method, target_url, headers=headers, data=data) as resp:
+        if on_headers is not None:
+            on_headers()
+        response_headers = {}
+        for name in FORWARD_RESPONSE_HEADERS:
+            value = resp.headers.get(name)
+            if value is not None:
+                response_headers[name] = value
+        if resp.content_length is not None:
+            response_headers["Content-Length"] = str(resp.content_length)
+        response = web.StreamResponse(status=resp.status, reason=resp.reason, headers=response_headers)
+        await response.prepare(request)
+        try:
+            async for chunk in resp.content.iter_chunked(chunk_size):
+                await response.write(chunk)
+            await response.write_eof()
+        except Exception as e:
+            # The headers are sent already: never follow them with another response.
+            transport = request.transport
+            if transport is not None:
+                transport.abort()
+            raise RelayTruncated(response, e)
+        return response
+
+class UpstreamSession:
+
+    """
+    A pooled keep alive client session for one upstream gizmo server port,
+    with request counts and latencies for monitoring.
+    """
+
+    def __init__(self, port, limit=UPSTREAM_CONNECTION_LIMIT, unix_socket_dir=None):
+        self.port = port
+        self.limit = limit
+        self.unix_socket_dir = unix_socket_dir
+        self.session = None
+        self.ws_session = None
+        self.requests = 0
+        self.active = 0
+        self.open_web_sockets = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.total_latency = 0.0  # seconds until the upstream response headers arrive
+        self.max_latency = 0.0
+        self.total_seconds = 0.0  # seconds until the response is complete
+        self.ws_messages = {TO_CLIENT: 0, TO_SERVER: 0}
+        self.ws_bytes = {TO_CLIENT: 0, TO_SERVER: 0}
+        self.last_activity = time.time()
+
+    def get_session(self):
+        session = self.session
+        if session is None or session.closed:
+            connector = self.make_connector(self.limit)
+            # Pass compressed content through as is.
+            session = self.session = aiohttp.ClientSession(connector=connector, auto_decompress=False)
+        return session
+
+    def unix_socket_path(self):
+        "The Unix domain socket of the upstream gizmo server if it has one."
+        if self.unix_socket_dir is None:
+            return None
+        path = unix_socket_path(self.port, self.unix_socket_dir)
+        if os.path.exists(path):
+            return path
+        return None
+
+    def target_url(self, path):
+        if self.unix_socket_path() is not None:
+            # The socket identifies the server (pseudo ports may be out of the TCP range).
+            return "http://localhost/%s" % (path,)
+        return "http://localhost:%s/%s" % (self.port, path)
+
+    def make_connector(self, limit):
+        # Prefer the Unix domain socket to the TCP loopback port if the gizmo server provides one.
+        path = self.unix_socket_path()
+        if path is not None:
+            return aiohttp.UnixConnector(path=path, limit=limit)
+        return aiohttp.TCPConnector(limit=limit)
+
+    def get_ws_session(self):
+        "Web socket connections are long lived so they use a separate session without a connection limit."
+        session = self.ws_session
+        if session is None or session.closed:
+            connector = self.make_connector(0)
+            session = self.ws_session = aiohttp.ClientSession(connector=connector)
+        return session
+
+    async def relay(self, method, target_url, request):
+        self.requests += 1
+        self.active += 1
+        start = self.last_activity = time.time()
+        def on_headers():
+            self.record_latency(time.time() - start)
+        try:
+            response = await relay_http(self.get_session(), method, target_url, request, on_headers=on_headers)
+        except RelayTruncated as e:
+            # the client connection is already aborted.
+            self.errors += 1
+            return e.response
+        except aiohttp.ClientError as e:
+            # nothing was sent to the client yet.
+            self.errors += 1
+            return web.Response(status=502, text="Gizmo upstream error: " + repr(e))
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.active -= 1
+            self.total_seconds += time.time() - start
+        length = response.content_length
+        if length is not None:
+            self.bytes_sent += length
+        return response
+
+    def record_latency(self, seconds):
+        self.total_latency += seconds
+        self.max_latency = max(self.max_latency, seconds)
+
+    def count_ws_message(self, direction, nbytes):
+        self.last_activity = time.time()
+        self.ws_messages[direction] += 1
+        self.ws_bytes[direction] += nbytes
+
+    def stats(self):
+        requests = self.requests
+        return dict(
+            unix_socket=self.unix_socket_path(),
+            ws_messages=dict(self.ws_messages),
+            ws_bytes=dict(self.ws_bytes),
+            requests=requests,
+            active=self.active,
+            errors=self.errors,
+            bytes_sent=self.bytes_sent,
+            mean_latency_ms=(1000.0 * self.total_latency / requests) if requests else None,
+            max_latency_ms=1000.0 * self.max_latency,
+            mean_total_ms=(1000.0 * self.total_seconds / requests) if requests else None,
+        )
+
+    def in_use(self):
+        "Is a request or web socket relay using the session?"
+        return self.active > 0 or self.open_web_sockets > 0
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        if self.ws_session is not None:
+            await self.ws_session.close()
+            self.ws_session = None
+
 class WebSocketConnector:
 
-    def __init__(self, ws, server_port, server_path, verbose=False):
+    """
+    Relay web socket messages between a client web socket and a gizmo server web socket.
+    Text, binary, ping and pong frames pass through as they are.
+    Each direction buffers at most queue_size messages: when the receiving side falls behind
+    the relay stops reading from the sending side.
+    """
+
+    def __init__(self, ws, server_port, server_path, verbose=False, session=None, queue_size=WS_RELAY_QUEUE_SIZE, monitor=None, server_url=None):
         self.from_client_ws = ws
         self.from_server_ws = None
-        self.session = None
+        # Use the given (pooled) session if provided, otherwise make and close a private one.
+        self.session = session
+        self.own_session = session is None
         self.server_port = server_port
         self.server_path = server_path
+        self.server_url = server_url
         self.verbose = verbose
+        self.queue_size = queue_size
+        # monitor (for example an UpstreamSession) gets count_ws_message(direction, nbytes) calls.
+        self.monitor = monitor
+        self.started = time.time()
+        self.stopped = None
+        self.messages = {TO_CLIENT: 0, TO_SERVER: 0}
+        self.bytes = {TO_CLIENT: 0, TO_SERVER: 0}
+        self.max_queued = {TO_CLIENT: 0, TO_SERVER: 0}
+        self.server_listener_task = self.client_listener_task = None
 
     async def get_server_ws(self):
-        session = self.session = aiohttp.ClientSession()
-        server_url = "http://localhost:%s/%s" % (self.server_port, self.server_path)
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession()
+            self.own_session = True
+        server_url = self.server_url
+        if server_url is None:
+            server_url = "http://localhost:%s/%s" % (self.server_port, self.server_path)
         if self.verbose:
             print ("Connecting session to server URL", server_url)
-        self.from_server_ws = await session.ws_connect(server_url)
+        # pings and pongs are relayed, not answered here.
+        self.from_server_ws = await self.session.ws_connect(server_url, autoping=False)
 
     def start_listener_tasks(self):
+        self.started = time.time()
         self.server_listener_task = schedule_task(self.listen_to_server())
         self.client_listener_task = schedule_task(self.listen_to_client())
 
-    async def listen_to_server(self, from_ws=None, to_ws=None):
+    async def listen_to_server(self, from_ws=None, to_ws=None, direction=TO_CLIENT):
         if from_ws is None:
             from_ws = self.from_server_ws
             to_ws = self.from_client_ws
-        async for msg in from_ws:
-            typ = msg.type
-            if typ == aiohttp.WSMsgType.text:
-                # pass the message on the the client
-                txt = msg.data
-                #print ("got", repr(txt), "from websocket", from_ws)
-                await to_ws.send_str(txt)
-            else:
-                #print("unexpected message type", typ)
-                break
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        reader = schedule_task(self.read_messages(from_ws, queue, direction))
+        try:
+            while True:
+                msg = await queue.get()
+                if msg is None:
+                    break
+                await self.send_message(to_ws, msg)
+        except (ConnectionError, RuntimeError) as e:
+            # the receiving socket closed under us.
+            if self.verbose:
+                print("relay send failed", direction, repr(e))
+        finally:
+            if not reader.done():
+                reader.cancel()
         if self.verbose:
-            print("Server listener stopping.")
+            print("Listener stopping", direction)
+        self.stopped = time.time()
         schedule_task(self.terminate_listeners())
 
     async def listen_to_client(self):
-        return await self.listen_to_server(self.from_client_ws, self.from_server_ws)
-    
+        return await self.listen_to_server(self.from_client_ws, self.from_server_ws, TO_SERVER)
+
+    async def read_messages(self, from_ws, queue, direction):
+        "Queue relayable messages from from_ws until it closes (then queue None)."
+        cancelled = False
+        try:
+            while True:
+                msg = await from_ws.receive()
+                typ = msg.type
+                if typ not in RELAYED_WS_TYPES:
+                    # close, closing, closed or error
+                    break
+                self.count_message(direction, msg.data)
+                # Wait here when the queue is full (back pressure on from_ws).
+                await queue.put(msg)
+                self.max_queued[direction] = max(self.max_queued[direction], queue.qsize())
+        except asyncio.CancelledError:
+            # the listener stopped: nothing reads the stop marker.
+            cancelled = True
+            raise
+        finally:
+            if not cancelled:
+                # wait for room (never drop relayed messages) so the listener sends everything first.
+                await queue.put(None)
+
+    async def send_message(self, to_ws, msg):
+        typ = msg.type
+        data = msg.data
+        if typ == aiohttp.WSMsgType.TEXT:
+            await to_ws.send_str(data)
+        elif typ == aiohttp.WSMsgType.BINARY:
+            await to_ws.send_bytes(data)
+        elif typ == aiohttp.WSMsgType.PING:
+            await to_ws.ping(data)
+        elif typ == aiohttp.WSMsgType.PONG:
+            await to_ws.pong(data)
+
+    def count_message(self, direction, data):
+        nbytes = len(data) if data else 0
+        self.messages[direction] += 1
+        self.bytes[direction] += nbytes
+        monitor = self.monitor
+        if monitor is not None:
+            monitor.count_ws_message(direction, nbytes)
+
+    def stats(self):
+        "Message and byte counts and throughput for each direction."
+        end = self.stopped or time.time()
+        seconds = max(end - self.started, 1e-6)
+        result = dict(seconds=seconds)
+        for direction in (TO_CLIENT, TO_SERVER):
+            result[direction] = dict(
+                messages=self.messages[direction],
+                bytes=self.bytes[direction],
+                max_queued=self.max_queued[direction],
+                messages_per_second=self.messages[direction] / seconds,
+                bytes_per_second=self.bytes[direction] / seconds,
+            )
+        return result
+
     async def terminate_listeners(self):
         if self.verbose:
             print("terminating listeners.")
@@ -430,17 +851,264 @@ class WebSocketConnector:
                 await ws.close()
             except Exception:
                 pass
-        try:
-            if self.verbose:
-                print("closing session", self.session)
-            await self.session.close()
-        except Exception:
-            pass
+        if self.own_session:
+            try:
+                if self.verbose:
+                    print("closing session", self.session)
+                await self.session.close()
+            except Exception:
+                pass
         for task in [self.server_listener_task, self.client_listener_task]:
-            if not task.done():
-                print("cancelling task", task)
+            if task is not None and not task.done() and task is not asyncio.current_task():
+                if self.verbose:
+                    print("cancelling task", task)
                 task.cancel()
 
+def link_port(url):
+    "The gizmo server port in a proxy link url like .../connect/PORT/gizmo/..., or None."
+    if isinstance(url, bytes):
+        url = url.decode("utf-8")
+    spath = url.split("/connect/", 1)
+    if len(spath) < 2:
+        return None
+    try:
+        return int(spath[1].split("/")[0])
+    except ValueError:
+        return None
+
+def request_user(request):
+    "The user name for per user script limits."
+    user = os.environ.get("JUPYTERHUB_USER")
+    if user:
+        return user
+    return request.remote or "unknown"
+
+class RingLog:
+
+    "Keep the most recent output blocks, up to about limit bytes."
+
+    def __init__(self, limit=SCRIPT_LOG_LIMIT):
+        self.limit = limit
+        self.blocks = collections.deque()
+        self.size = 0
+        self.dropped = 0  # bytes discarded
+
+    def append(self, block):
+        if len(block) > self.limit:
+            self.dropped += len(block) - self.limit
+            block = block[-self.limit:]
+        self.blocks.append(block)
+        self.size += len(block)
+        while self.size > self.limit:
+            old = self.blocks.popleft()
+            self.size -= len(old)
+            self.dropped += len(old)
+
+    def __iter__(self):
+        return iter(self.blocks)
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def tail(self, nbytes=2000):
+        return b"".join(self.blocks)[-nbytes:]
+
+def process_usage(pid):
+    """
+    Return (cpu_seconds, rss_bytes) for the process using psutil if installed,
+    or /proc otherwise.  Return (None, None) if not available.
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        try:
+            process = psutil.Process(pid)
+            times = process.cpu_times()
+            return (times.user + times.system, process.memory_info().rss)
+        except psutil.Error:
+            return (None, None)
+    try:
+        with open("/proc/%s/stat" % pid) as f:
+            stat = f.read()
+        with open("/proc/%s/statm" % pid) as f:
+            statm = f.read()
+    except OSError:
+        return (None, None)
+    # The command name may contain spaces: count fields after the last ")" (starting at field 3, the state).
+    fields = stat[stat.rindex(")") + 2:].split()
+    (utime, stime) = (int(fields[11]), int(fields[12]))
+    cpu = (utime + stime) / os.sysconf("SC_CLK_TCK")
+    rss = int(statm.split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    return (cpu, rss)
+
+class ScriptLimitExceeded(RuntimeError):
+
+    "Too many scripts are running for the user and module."
+
+class ScriptSupervisor:
+
+    """
+    Track the gizmo script processes started by the proxy.
+    Limit the running scripts for each user and module and
+    kill scripts with no proxied traffic for idle_ttl seconds.
+    activity(port) gives the time of the last traffic for a gizmo server port (or None).
+    """
+
+    def __init__(self, limit=None, idle_ttl=None, activity=None, verbose=False):
+        if limit is None:
+            limit_str = os.environ.get(SCRIPT_LIMIT_ENV_VAR)
+            if limit_str:
+                limit = int(limit_str)
+        if idle_ttl is None:
+            ttl_str = os.environ.get(SCRIPT_IDLE_TTL_ENV_VAR)
+            if ttl_str:
+                idle_ttl = float(ttl_str)
+        self.limit = limit
+        self.idle_ttl = idle_ttl
+        self.activity = activity
+        self.verbose = verbose
+        self.running = []
+        self.finished = collections.deque(maxlen=FINISHED_SCRIPTS_KEPT)
+        self.killed = 0
+        self.reaper_task = None
+
+    def running_for(self, user, module_name):
+        return [w for w in self.running if w.user == user and w.module_name == module_name]
+
+    def check_limit(self, user, module_name):
+        limit = self.limit
+        if limit is not None and len(self.running_for(user, module_name)) >= limit:
+            raise ScriptLimitExceeded(
+                "%s already has %s running %s scripts." % (user, limit, module_name))
+
+    def add(self, watcher, user):
+        "Supervise the started watcher."
+        process = watcher.process
+        if process is None:
+            return
+        watcher.user = user
+        watcher.started = time.time()
+        self.running.append(watcher)
+        schedule_task(self.wait_for_exit(watcher))
+
+    async def wait_for_exit(self, watcher):
+        await watcher.process.wait()
+        watcher.ended = time.time()
+        if watcher in self.running:
+            self.running.remove(watcher)
+        self.finished.append(watcher)
+
+    def last_activity(self, watcher):
+        result = watcher.started
+        if self.activity is not None and watcher.port is not None:
+            last = self.activity(watcher.port)
+            if last is not None:
+                result = max(result, last)
+        return result
+
+    def idle_scripts(self, now=None):
+        if self.idle_ttl is None:
+            return []
+        if now is None:
+            now = time.time()
+        return [w for w in self.running if now - self.last_activity(w) >= self.idle_ttl]
+
+    def reap_idle(self, now=None):
+        "Terminate idle scripts.  Return the watchers terminated."
+        result = self.idle_scripts(now)
+        for watcher in result:
+            if watcher.process.returncode is None:
+                if self.verbose:
+                    print("terminating idle script", watcher.command, watcher.process.pid)
+                watcher.kill_reason = "idle"
+                watcher.process.terminate()
+                self.killed += 1
+        return result
+
+    def start_reaper(self, interval=None):
+        if self.idle_ttl is None:
+            return None
+        if interval is None:
+            interval = max(1.0, min(self.idle_ttl, 60.0) / 2.0)
+        self.stop_reaper()
+        self.reaper_task = schedule_task(self._reap_periodically(interval))
+        return self.reaper_task
+
+    def stop_reaper(self):
+        if self.reaper_task is not None:
+            self.reaper_task.cancel()
+            self.reaper_task = None
+
+    async def _reap_periodically(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.reap_idle()
+            except Exception as e:
+                print("script reaper exception: " + repr(e))
+
+    def watcher_status(self, watcher, now):
+        process = watcher.process
+        (cpu, rss) = (None, None)
+        if process.returncode is None:
+            (cpu, rss) = process_usage(process.pid)
+        return dict(
+            user=watcher.user,
+            module=watcher.module_name,
+            script=watcher.script_name,
+            pid=process.pid,
+            port=watcher.port,
+            returncode=process.returncode,
+            kill_reason=watcher.kill_reason,
+            seconds=(watcher.ended or now) - watcher.started,
+            idle_seconds=now - self.last_activity(watcher),
+            cpu_seconds=cpu,
+            rss_bytes=rss,
+            stdout_bytes=watcher.captured_stdout.size,
+            stderr_bytes=watcher.captured_stderr.size,
+            stderr_tail=watcher.captured_stderr.tail(200).decode("utf-8", "replace"),
+        )
+
+    def status(self, now=None):
+        if now is None:
+            now = time.time()
+        return dict(
+            limit=self.limit,
+            idle_ttl=self.idle_ttl,
+            killed=self.killed,
+            running=[self.watcher_status(w, now) for w in self.running],
+            finished=[self.watcher_status(w, now) for w in self.finished],
+        )
+
+    def status_html(self, now=None):
+        status = self.status(now)
+        columns = ["user", "module", "script", "pid", "port", "returncode", "kill_reason",
+            "seconds", "idle_seconds", "cpu_seconds", "rss_bytes", "stdout_bytes", "stderr_tail"]
+        def table(rows):
+            L = ["<table border>\n<tr>"]
+            for c in columns:
+                L.append("<th>%s</th>" % c)
+            L.append("</tr>\n")
+            for row in rows:
+                L.append("<tr>")
+                for c in columns:
+                    value = row[c]
+                    if isinstance(value, float):
+                        value = "%.1f" % value
+                    L.append("<td>%s</td>" % html.escape(str(value)))
+                L.append("</tr>\n")
+            L.append("</table>\n")
+            return "".join(L)
+        return """<html><head><title>Gizmo script status</title></head><body>
+<h3>Running scripts (limit per user and module: %s, idle ttl: %s, killed idle: %s)</h3>
+%s
+<h3>Recently finished scripts</h3>
+%s
+</body></html>""" % (status["limit"], status["idle_ttl"], status["killed"],
+            table(status["running"]), table(status["finished"]))
+
 class LinkNotFound(ValueError):
 
     "The link line was not found in the subprocess."
@@ -463,6 +1131,8 @@ class ScriptWatcher:
         capture=True,
         link_timeout=10,
         verbose=True,
+        warm_process=None,
+        environment=None,  # extra environment variable settings for the script
         ):
         #from .H5Gizmos import make_future
         from .gz_parent_protocol import make_future
@@ -474,10 +1144,16 @@ class ScriptWatcher:
         self.link_timeout = link_timeout
         self.capture = capture
         self.verbose = verbose
-        self.captured_stdout = []
-        self.captured_stderr = []
+        self.captured_stdout = RingLog()
+        self.captured_stderr = RingLog()
         self.link_future = make_future(link_timeout, on_timeout=self.on_timeout)
         self.process = None
+        self.warm_process = warm_process
+        self.environment = environment or {}
+        self.port = None
+        self.user = None
+        self.started = self.ended = None
+        self.kill_reason = None
         self.command = "%s %s/%s" % (self.starter, self.module_name, self.script_name)
 
     async def start_script_and_get_start_url(self, delay=0.1):
@@ -487,11 +1163,38 @@ class ScriptWatcher:
         #from .H5Gizmos import schedule_task
         schedule_task(self.run_script())
         url = await self.link_future
+        self.port = link_port(url)
+        if await self.wait_for_unix_socket(url):
+            # The script is listening: no need to wait.
+            delay = None
         if delay is not None:
             await asyncio.sleep(delay)
         # return url encoded as string (not bytes)
         return url.decode("utf-8") 
 
+    async def wait_for_unix_socket(self, url, timeout=5.0, poll=0.01):
+        """
+        If the script listens on a Unix domain socket (named by the port in the link url)
+        wait until it accepts a connection and return True.
+        """
+        folder = self.environment.get(UNIX_SOCKET_ENV_VAR) or os.environ.get(UNIX_SOCKET_ENV_VAR)
+        port = link_port(url)
+        if not folder or port is None:
+            return False
+        path = unix_socket_path(port, folder)
+        end = time.time() + timeout
+        while time.time() < end:
+            if os.path.exists(path):
+                try:
+                    (reader, writer) = await asyncio.open_unix_connection(path)
+                except OSError:
+                    pass
+                else:
+                    writer.close()
+                    return True
+            await asyncio.sleep(poll)
+        return False
+
     def html(self):
         from cgi import escape
         L = ["<pre>\n"]
@@ -509,22 +1212,46 @@ class ScriptWatcher:
         return "".join(L)
 
     async def run_script(self):
+        if self.warm_process is not None:
+            await self.assign_warm_process()
+        else:
+            await self.start_process()
+        await self.watch_stdout()
+
+    async def assign_warm_process(self):
+        "Use an already started warm worker instead of starting a new process."
+        warm = self.warm_process
+        self.process = warm.process
+        self.command = warm.command
+        # keep output captured while the worker was waiting
+        self.captured_stdout = warm.captured_stdout
+        self.captured_stderr = warm.captured_stderr
+        if self.verbose:
+            print("assigning", repr(self.script_name), "to warm worker", warm.process.pid)
+        await warm.assign(self.script_name, self.server_prefix)
+
+    async def start_process(self):
         #from .H5Gizmos import schedule_task
         from .gizmo_server import PREFIX_ENV_VAR
         env = os.environ.copy()
+        env.update(self.environment)
         env[PREFIX_ENV_VAR] = self.server_prefix
         verbose = self.verbose
         if self.verbose:
             print("starting command", repr(self.command))
             print("prefix is", repr(env[PREFIX_ENV_VAR]))
-        self.process = await asyncio.create_subprocess_shell(
-            self.command,
+        # exec (not shell) so that terminate() and the usage statistics reach the script itself.
+        self.process = await asyncio.create_subprocess_exec(
+            *shlex.split(self.command),
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
             env=env,
         )
         # read stderr in other task
         schedule_task(self.readall(self.process.stderr, self.captured_stderr))
+
+    async def watch_stdout(self):
+        verbose = self.verbose
         # look for pattern in stdout line
         found = False
         while not found:
@@ -552,7 +1279,7 @@ class ScriptWatcher:
         if not self.link_future.done():
             self.link_future.set_exception(LinkNotFound("Did not find %s in stdout." % repr(self.look_for)))
 
-    async def readall(self, reader, accumulator, blocksize=20):
+    async def readall(self, reader, accumulator, blocksize=SCRIPT_READ_SIZE):
         while True:
             block = await reader.read(blocksize)
             #print("got block", repr(block))
@@ -566,5 +1293,120 @@ class ScriptWatcher:
             print("process timeout")
         self.process.terminate()
 
+class WarmProcess:
+
+    """
+    A gizmo_script worker which has imported the scripts for a module
+    and is waiting on stdin to be told which script to run.
+    """
+
+    def __init__(self, module_name, starter=GIZMO_SCRIPT, environment=None):
+        self.module_name = module_name
+        self.environment = environment or {}
+        self.command = "%s %s %s" % (starter, gizmo_script_support.WARM_FLAG, module_name)
+        self.process = None
+        self.captured_stdout = RingLog()
+        self.captured_stderr = RingLog()
+
+    async def start(self, timeout=60):
+        # exec (not shell) so that terminate() reaches the worker itself.
+        env = os.environ.copy()
+        env.update(self.environment)
+        self.process = await asyncio.create_subprocess_exec(
+            *shlex.split(self.command),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env,
+        )
+        # Drain stderr so the worker cannot block on a full pipe.
+        schedule_task(self.drain_stderr())
+        await asyncio.wait_for(self.wait_until_ready(), timeout)
+        return self
+
+    async def drain_stderr(self):
+        stderr = self.process.stderr
+        while True:
+            block = await stderr.read(SCRIPT_READ_SIZE)
+            if not block:
+                break
+            self.captured_stderr.append(block)
+
+    async def wait_until_ready(self):
+        marker = gizmo_script_support.WARM_READY_MARKER.encode("utf8")
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                raise LinkNotFound("Warm worker exited before it was ready: " + repr(self.command))
+            self.captured_stdout.append(line)
+            if line.strip().startswith(marker):
+                return
+
+    def alive(self):
+        return self.process is not None and self.process.returncode is None
+
+    async def assign(self, script_name, prefix):
+        assignment = dict(script=script_name, prefix=prefix)
+        self.process.stdin.write((json.dumps(assignment) + "\n").encode("utf8"))
+        await self.process.stdin.drain()
+
+    def stop(self):
+        if self.alive():
+            self.process.terminate()
+
+class WarmScriptPool:
+
+    """
+    Keep up to size warm workers for a module, refilled in the background.
+    """
+
+    # stop refilling after this many consecutive start failures
+    failure_limit = 3
+
+    def __init__(self, module_name, size, starter=GIZMO_SCRIPT, verbose=False, environment=None):
+        self.module_name = module_name
+        self.environment = environment
+        self.size = size
+        self.starter = starter
+        self.verbose = verbose
+        self.ready = []
+        self.starting = 0
+        self.failures = 0
+
+    def fill(self):
+        while (self.failures < self.failure_limit) and (len(self.ready) + self.starting < self.size):
+            self.starting += 1
+            schedule_task(self.start_one())
+
+    async def start_one(self):
+        warm = WarmProcess(self.module_name, self.starter, environment=self.environment)
+        try:
+            await warm.start()
+        except Exception as e:
+            self.failures += 1
+            warm.stop()
+            if self.verbose:
+                print("warm worker for", repr(self.module_name), "failed to start:", repr(e))
+        else:
+            self.failures = 0
+            self.ready.append(warm)
+        finally:
+            self.starting -= 1
+
+    def take(self):
+        "Return a ready warm worker (or None if none are ready) and refill the pool."
+        result = None
+        while self.ready and result is None:
+            warm = self.ready.pop(0)
+            if warm.alive():
+                result = warm
+        self.fill()
+        return result
+
+    def stop(self):
+        for warm in self.ready:
+            warm.stop()
+        self.ready = []
+
 if __name__ == "__main__":
     start_script()
@@ -2,26 +2,132 @@
 Utilities for launching Gizmo scripts using entry point annotations.
 """
 
-from operator import mod
-import pkg_resources
+import os
+import sys
+import json
+import hashlib
 
 ENTRY_POINT_GROUP_NAME = "H5Gizmos.scripts"
 
+# Set to "0" to always scan the installed distributions instead of using the cached entry point index.
+ENTRY_POINT_INDEX_ENV_VAR = "GIZMO_ENTRY_POINT_INDEX"
+
+# One index per Python environment (formatted with a hash of the interpreter and its prefix).
+ENTRY_POINT_INDEX_FILENAME = "entry_points_%s.json"
+
 GIZMO_SCRIPT = "gizmo_script"
 
+# Printed by a warm worker when its imports are complete and it is waiting for a script assignment.
+WARM_READY_MARKER = "GIZMO_WARM_READY"
+
+WARM_FLAG = "--warm"
+
 module_to_name_to_entry = {}
 
-def find_entry_points():
+def find_entry_points(refresh=False):
+    if refresh:
+        module_to_name_to_entry.clear()
     if len(module_to_name_to_entry) == 0:
-        for entry in pkg_resources.iter_entry_points(group=ENTRY_POINT_GROUP_NAME):
-            entry_name = entry.name
-            entry_full_module = entry.module_name
+        for (entry_name, value) in entry_point_table(refresh=refresh):
+            entry = make_entry_point(entry_name, value)
+            entry_full_module = value.split(":")[0].strip()
             entry_module = entry_full_module.split(".")[0]
             name_to_entry = module_to_name_to_entry.get(entry_module, {})
             name_to_entry[entry_name] = entry
             module_to_name_to_entry[entry_module] = name_to_entry
     return module_to_name_to_entry
 
+def scan_entry_points():
+    "List [name, value] pairs (like ['main', 'package.module:main']) for the installed gizmo script entry points."
+    try:
+        from importlib import metadata
+    except ImportError:
+        # Python 3.7: pkg_resources is slow to import, so only import it when needed.
+        import pkg_resources
+        result = []
+        for entry in pkg_resources.iter_entry_points(group=ENTRY_POINT_GROUP_NAME):
+            value = entry.module_name
+            if entry.attrs:
+                value += ":" + ".".join(entry.attrs)
+            result.append([entry.name, value])
+        return result
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        entry_points = entry_points.select(group=ENTRY_POINT_GROUP_NAME)
+    else:
+        # Python < 3.10: a dictionary of groups.
+        entry_points = entry_points.get(ENTRY_POINT_GROUP_NAME, [])
+    result = []
+    for entry in entry_points:
+        pair = [entry.name, entry.value]
+        # a distribution may be found more than once on the path
+        if pair not in result:
+            result.append(pair)
+    return result
+
+def make_entry_point(name, value):
+    try:
+        from importlib import metadata
+    except ImportError:
+        import pkg_resources
+        return pkg_resources.EntryPoint.parse("%s = %s" % (name, value))
+    return metadata.EntryPoint(name, value, ENTRY_POINT_GROUP_NAME)
+
+def entry_point_index_key():
+    "Identify the installed distributions by the modification times of the folders on the import path."
+    stamps = []
+    for folder in sys.path:
+        try:
+            stamp = os.stat(folder or ".").st_mtime_ns
+        except OSError:
+            continue
+        stamps.append([folder, stamp])
+    data = json.dumps([sys.executable, sys.version, stamps])
+    return hashlib.sha1(data.encode("utf8")).hexdigest()
+
+def entry_point_index_path():
+    "The index file for this Python environment, so environments do not invalidate each other's index."
+    from .gz_resources import cache_folder
+    environment = json.dumps([sys.prefix, sys.executable])
+    digest = hashlib.sha1(environment.encode("utf8")).hexdigest()[:16]
+    return os.path.join(cache_folder(), ENTRY_POINT_INDEX_FILENAME % digest)
+
+def entry_point_table(refresh=False, index_path=None):
+    """
+    List the [name, value] gizmo script entry points using the on disk index
+    if the import path folders have not changed since it was written.
+    """
+    if os.environ.get(ENTRY_POINT_INDEX_ENV_VAR) == "0":
+        return scan_entry_points()
+    if index_path is None:
+        index_path = entry_point_index_path()
+    key = entry_point_index_key()
+    if not refresh:
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+            if index.get("key") == key:
+                return index["entries"]
+        except (OSError, ValueError):
+            pass
+    entries = scan_entry_points()
+    from .gizmo_server import write_sibling
+    try:
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    except OSError:
+        pass
+    write_sibling(index_path, json.dumps(dict(key=key, entries=entries)).encode("utf8"))
+    return entries
+
+def find_entry(module_name, script_name):
+    "Get the entry point, rescanning once in case the index is out of date."
+    for refresh in (False, True):
+        name_to_entry = find_entry_points(refresh=refresh).get(module_name, {})
+        entry = name_to_entry.get(script_name)
+        if entry is not None:
+            return entry
+    raise KeyError("No %s entry point %s/%s" % (ENTRY_POINT_GROUP_NAME, module_name, script_name))
+
 def main():
     import sys
     args = sys.argv
@@ -35,6 +141,9 @@ def main():
             print(GIZMO_SCRIPT, module_name)
         return
     else:
+        if args[1] == WARM_FLAG:
+            assert nargs == 3, "Expected: %s %s module_name" % (GIZMO_SCRIPT, WARM_FLAG)
+            return warm_worker(args[2])
         assert nargs == 2, "Only one argument expected: " + repr(args)
         arg = args[1]
         split_args = arg.split("/")
@@ -110,9 +219,36 @@ def module_detail_json(module_name):
     return result
 
 def start_entry_point(module_name, script_name):
-    find_entry_points()
-    name_to_entry = module_to_name_to_entry[module_name]
-    entry = name_to_entry[script_name]
+    entry = find_entry(module_name, script_name)
     loaded = entry.load()
     return loaded()
 
+def warm_worker(module_name, stdin=None):
+    """
+    Pre-import the gizmo scripts for module_name and their dependencies, then wait
+    for a single JSON line on stdin like {"script": "name", "prefix": "http://..."}
+    and run the named script using the given gizmo link prefix.
+    """
+    import sys
+    import os
+    import json
+    import H5Gizmos
+    from .gizmo_server import PREFIX_ENV_VAR
+    find_entry_points()
+    name_to_entry = module_to_name_to_entry.get(module_name, {})
+    for entry in name_to_entry.values():
+        # import the script modules (and numpy, aiohttp, matplotlib... as they require)
+        entry.load()
+    print(WARM_READY_MARKER, module_name)
+    sys.stdout.flush()
+    if stdin is None:
+        stdin = sys.stdin
+    line = stdin.readline()
+    if not line.strip():
+        # the launcher went away without assigning a script.
+        return
+    assignment = json.loads(line)
+    prefix = assignment.get("prefix")
+    if prefix is not None:
+        os.environ[PREFIX_ENV_VAR] = prefix
+    return start_entry_point(module_name, assignment["script"])
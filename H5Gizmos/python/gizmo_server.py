@@ -8,6 +8,7 @@ import aiohttp
 import asyncio
 #import weakref
 import mimetypes
+import collections
 import os
 import sys
 import contextlib
@@ -39,6 +40,40 @@ USE_SERVER_ADDRESS_VAR = "GIZMO_USE_SERVER_ADDRESS"
 # set/unset to enable/disable auto detection of prefix
 DETECT_PREFIX_ENV_VAR = True
 
+# Environment variable giving seconds before disconnected sessions are reaped (unset: never reap).
+SESSION_TTL_ENV_VAR = "GIZMO_SESSION_TTL"
+
+# Folder for Unix domain sockets: servers also listen on FOLDER/gizmo_<port>.sock if set.
+UNIX_SOCKET_ENV_VAR = "GIZMO_UNIX_SOCKET_DIR"
+
+# Set to a non-empty value to listen only on the Unix domain socket (no TCP port).
+# The browser must then connect through a GizmoLink proxy using the same socket folder.
+UNIX_SOCKET_ONLY_ENV_VAR = "GIZMO_UNIX_SOCKET_ONLY"
+
+# Unix socket only servers use "pseudo ports" above the TCP range to name their sockets.
+UNIX_PSEUDO_PORT_BASE = 100000
+
+# Set to a non-empty value to print where the time to the first page goes.
+STARTUP_PROFILE_ENV_VAR = "H5GIZMOS_STARTUP_PROFILE"
+
+STARTUP_MARKS = []
+
+def startup_mark(label, once=True):
+    "Record (and print if profiling is enabled) the time of a startup milestone."
+    if not os.environ.get(STARTUP_PROFILE_ENV_VAR):
+        return
+    if once and any(m[0] == label for m in STARTUP_MARKS):
+        return
+    now = time.perf_counter()
+    if not STARTUP_MARKS:
+        # Measure from the package import if possible.
+        started = getattr(sys.modules.get("H5Gizmos"), "_import_started", now)
+        STARTUP_MARKS.append(("start", started))
+    previous = STARTUP_MARKS[-1][1]
+    STARTUP_MARKS.append((label, now))
+    total = now - STARTUP_MARKS[0][1]
+    sys.stderr.write("H5Gizmos startup: %8.1f ms (+%7.1f ms) %s\n" % (1000 * total, 1000 * (now - previous), label))
+
 def get_or_create_event_loop():
     try:
         # xxxx this is deprecated in python 3.10 -- need a workaround that gets an unstarted event loop(?) or something
@@ -63,16 +98,21 @@ def run(main_awaitable, server=None, run_forever=True, exit_on_disconnect=None,
         run_until_exit()
 '''
 
-def serve(coroutine, verbose=False, delay=0.5):
+def serve(coroutine, verbose=False, delay=None):
     """
     Set up the global gizmo server and schedule the task, then run the event loop forever.
+    The task starts as soon as the server is listening (or after delay seconds if delay is given).
     """
     # xxx common code refactor?
-    _check_server(None, verbose=verbose)
+    server = _check_server(None, verbose=verbose)
 
     async def deferred_task():
         # gymnastics to avoid duplicate exceptions....
-        await asyncio.sleep(delay)
+        if delay is not None:
+            await asyncio.sleep(delay)
+        else:
+            await server.wait_until_ready()
+        startup_mark("main task started")
         task = H5Gizmos.schedule_task(coroutine)
         try:
             await task
@@ -107,13 +147,17 @@ def _check_server(server=None, verbose=False):
     if server is None:
         server = PROCESS_SHARED_GIZMO_SERVER
         if server is None:
-            server = PROCESS_SHARED_GIZMO_SERVER = GzServer(out=out, err=err)
+            # Resolve the host name later, off the event loop.
+            server = PROCESS_SHARED_GIZMO_SERVER = GzServer(out=out, err=err, resolve_server=False)
             if not verbose:
                 server.capture_stdout()
             else:
                 print("Created verbose GzServer")
             # schedule the server task
             server.run_in_task()
+            session_ttl = os.environ.get(SESSION_TTL_ENV_VAR)
+            if session_ttl:
+                server.start_session_reaper(float(session_ttl))
         if DETECT_PREFIX_ENV_VAR:
             prefix = os.environ.get(PREFIX_ENV_VAR)
             if prefix is not None:
@@ -156,13 +200,13 @@ def is_port_in_use(port):
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         return s.connect_ex(('localhost', port)) == 0
 
-async def get_reachable_server_name(local_ip, random_port, verbose=True):
+async def get_reachable_server_name(local_ip, random_port, verbose=True, ready=None):
     """
     Choose the most useful reachable server name which can be inferred
     from available interfaces.
     For use in external scripts, for example to pass to containers.
     """
-    validator = ValidateServerConnection(local_ip, random_port, verbose=verbose)
+    validator = ValidateServerConnection(local_ip, random_port, verbose=verbose, ready=ready)
     await validator.future
     if validator.succeeded:
         return local_ip
@@ -187,11 +231,9 @@ def print_reachable_server_name(verbose=True):
     server.verbose = verbose
     server.run_in_task(log=True)
     async def print_task():
-        # allow server to start
-        await asyncio.sleep(0.1)
         if verbose:
             print("print_task started.")
-        name = await get_reachable_server_name(local_ip, random_port, verbose=verbose)
+        name = await get_reachable_server_name(local_ip, random_port, verbose=verbose, ready=server.ready_future())
         if verbose:
             print("print task got", repr(name))
         sys.stdout = stdout
@@ -212,6 +254,37 @@ def get_local_ip(port=None):
         local_ip = socket.gethostbyname("localhost")
     return local_ip
 
+async def get_local_ip_async(port=None):
+    "Look up the local ip without blocking the event loop."
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, get_local_ip, port)
+
+
+def unix_socket_folder():
+    "The folder for gizmo Unix domain sockets, or None if not configured or not supported."
+    folder = os.environ.get(UNIX_SOCKET_ENV_VAR)
+    if not folder or not hasattr(socket, "AF_UNIX"):
+        return None
+    return folder
+
+def unix_socket_only():
+    return unix_socket_folder() is not None and bool(os.environ.get(UNIX_SOCKET_ONLY_ENV_VAR))
+
+def unix_socket_path(port, folder=None):
+    "The Unix domain socket path for the gizmo server at port, or None if sockets are not configured."
+    if folder is None:
+        folder = unix_socket_folder()
+        if folder is None:
+            return None
+    return os.path.join(folder, "gizmo_%s.sock" % port)
+
+def choose_unix_socket_port(folder, limit=1000):
+    "Choose an unused pseudo port (naming a socket in folder) for a Unix socket only server."
+    start = UNIX_PSEUDO_PORT_BASE + os.getpid()
+    for port in range(start, start + limit):
+        if not os.path.exists(unix_socket_path(port, folder)):
+            return port
+    raise ValueError("Could not find unused socket name in: " + repr(folder))
 
 def choose_port0(limit=1000):
     "old version"
@@ -303,6 +376,221 @@ class WebInterface:
 STDInterface = WebInterface()
 
 
+# Precompressed variants of static files.
+# Content types worth compressing (images and the like are already compressed).
+COMPRESSIBLE_CONTENT_TYPES = frozenset([
+    "text/javascript",
+    "application/javascript",
+    "text/css",
+    "text/html",
+    "text/plain",
+    "application/json",
+    "image/svg+xml",
+])
+
+# Files smaller than this are not worth compressing.
+COMPRESSION_MIN_SIZE = 1024
+
+# Bytes of compressed variants kept in memory by the server.
+COMPRESSION_CACHE_BYTES = 1 << 25
+
+# Sibling file suffix for each supported content encoding, in order of preference.
+ENCODING_SUFFIXES = {
+    "br": ".br",
+    "gzip": ".gz",
+}
+
+def available_encodings():
+    "Supported content encodings in order of preference.  Brotli is only used if installed."
+    result = []
+    for encoding in ENCODING_SUFFIXES:
+        if encoding == "br":
+            try:
+                import brotli
+            except ImportError:
+                continue
+        result.append(encoding)
+    return result
+
+def compress_bytes(bytes_content, encoding):
+    if encoding == "gzip":
+        import gzip
+        # mtime=0 so that identical input gives identical output.
+        return gzip.compress(bytes_content, compresslevel=9, mtime=0)
+    elif encoding == "br":
+        import brotli
+        return brotli.compress(bytes_content)
+    raise ValueError("unknown content encoding: " + repr(encoding))
+
+def parse_accept_encoding(header):
+    "Return the set of encodings accepted by an Accept-Encoding header value (ignoring q=0)."
+    result = set()
+    for item in (header or "").split(","):
+        parts = item.strip().split(";")
+        encoding = parts[0].strip().lower()
+        if not encoding:
+            continue
+        q = 1.0
+        for param in parts[1:]:
+            param = param.strip()
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            result.add(encoding)
+    return result
+
+def compressible(content_type):
+    if content_type is None:
+        return False
+    return content_type.split(";")[0].strip().lower() in COMPRESSIBLE_CONTENT_TYPES
+
+def negotiate_encoding(request, content_type, encodings=None):
+    """
+    Choose a content encoding for the response based on the request Accept-Encoding header,
+    or return None to send the content unencoded.
+    """
+    headers = getattr(request, "headers", None)
+    if not headers or not compressible(content_type):
+        return None
+    accepted = parse_accept_encoding(headers.get("Accept-Encoding"))
+    if "*" in accepted:
+        accepted = accepted | set(ENCODING_SUFFIXES)
+    if encodings is None:
+        encodings = available_encodings()
+    for encoding in encodings:
+        if encoding in accepted:
+            return encoding
+    return None
+
+def load_variant(path, encoding, min_size=COMPRESSION_MIN_SIZE, write_siblings=False):
+    """
+    Read an up to date precompressed sibling file (eg "jquery.js.gz") or compress the file.
+    Return None if the file is too small to bother.  Only build steps should write siblings.
+    """
+    if os.path.getsize(path) < min_size:
+        return None
+    sibling = path + ENCODING_SUFFIXES[encoding]
+    if os.path.isfile(sibling) and os.path.getmtime(sibling) >= os.path.getmtime(path):
+        return get_file_bytes(sibling)
+    result = compress_bytes(get_file_bytes(path), encoding)
+    if write_siblings:
+        write_sibling(sibling, result)
+    return result
+
+class CompressedVariants:
+
+    """
+    Compressed variants of files kept in memory, cached by (path, encoding) and validated
+    by modification time.  The least recently used variants are dropped beyond max_bytes.
+    Files are compressed in an executor thread so the event loop is not blocked.
+    """
+
+    def __init__(self, max_bytes=COMPRESSION_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.cached_bytes = 0
+        self.path_encoding_to_mtime_and_bytes = collections.OrderedDict()
+
+    def lookup(self, path, encoding, mtime):
+        "Return (found, variant) for the cached variant of the file version."
+        key = (path, encoding)
+        cached = self.path_encoding_to_mtime_and_bytes.get(key)
+        if cached is None or cached[0] != mtime:
+            return (False, None)
+        self.path_encoding_to_mtime_and_bytes.move_to_end(key)
+        return (True, cached[1])
+
+    def store(self, path, encoding, mtime, variant):
+        cache = self.path_encoding_to_mtime_and_bytes
+        key = (path, encoding)
+        old = cache.pop(key, None)
+        if old is not None and old[1] is not None:
+            self.cached_bytes -= len(old[1])
+        size = len(variant) if variant is not None else 0
+        if size > self.max_bytes:
+            return
+        cache[key] = (mtime, variant)
+        self.cached_bytes += size
+        while self.cached_bytes > self.max_bytes:
+            (_, (_, dropped)) = cache.popitem(last=False)
+            if dropped is not None:
+                self.cached_bytes -= len(dropped)
+
+    def get_variant(self, path, encoding, min_size=COMPRESSION_MIN_SIZE):
+        "Return compressed bytes for path, or None if the file is too small to bother."
+        mtime = os.path.getmtime(path)
+        (found, result) = self.lookup(path, encoding, mtime)
+        if not found:
+            result = load_variant(path, encoding, min_size)
+            self.store(path, encoding, mtime, result)
+        return result
+
+    async def get_variant_async(self, path, encoding, min_size=COMPRESSION_MIN_SIZE):
+        "As get_variant, compressing in an executor thread."
+        mtime = os.path.getmtime(path)
+        (found, result) = self.lookup(path, encoding, mtime)
+        if not found:
+            loop = asyncio.get_event_loop()
+            result = await loop.run_in_executor(None, load_variant, path, encoding, min_size)
+            self.store(path, encoding, mtime, result)
+        return result
+
+    async def respond(self, request, path, content_type, interface=STDInterface):
+        "Respond with a compressed variant if one is acceptable, else return None."
+        encoding = negotiate_encoding(request, content_type)
+        if encoding is None or not os.path.isfile(path):
+            return None
+        body = await self.get_variant_async(path, encoding)
+        if body is None:
+            return None
+        headers = {"Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+        return interface.respond(body=body, content_type=content_type, headers=headers)
+
+def write_sibling(path, bytes_content):
+    # Write via a temporary file so concurrent servers never see a partial variant.
+    temp_path = "%s.%s.tmp" % (path, os.getpid())
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(bytes_content)
+        os.replace(temp_path, path)
+    except OSError:
+        # The folder may be read only (eg, a system install): just keep the variant in memory.
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+
+COMPRESSED_VARIANTS = CompressedVariants()
+
+def precompress_folder(folder=None, encodings=None, verbose=True):
+    """
+    Build step: write compressed sibling variants for all compressible files under folder.
+    By default compress the H5Gizmos static folder.
+    """
+    if folder is None:
+        folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "static")
+        folder = os.path.abspath(folder)
+    if encodings is None:
+        encodings = available_encodings()
+    suffixes = tuple(ENCODING_SUFFIXES.values())
+    count = 0
+    for (dirpath, dirnames, filenames) in os.walk(folder):
+        for filename in filenames:
+            if filename.endswith(suffixes):
+                continue
+            path = os.path.join(dirpath, filename)
+            (content_type, _) = mimetypes.guess_type(path)
+            if not compressible(content_type):
+                continue
+            for encoding in encodings:
+                variant = load_variant(path, encoding, write_siblings=True)
+                if variant is not None:
+                    count += 1
+                    if verbose:
+                        print(encoding, len(variant), "of", os.path.getsize(path), path)
+    return count
+
+
 def gizmo_task_server(
         prefix="gizmo", 
         server=None, 
@@ -359,6 +647,10 @@ class GzServer:
     # 
     url_prefix = None
 
+    # Prefix for session (manager) identifiers.  Servers whose sessions share one
+    # identifier space, like gizmo worker processes, must use distinct prefixes.
+    manager_prefix = "MGR"
+
     def __init__(
             self, 
             prefix="gizmo", 
@@ -367,10 +659,26 @@ class GzServer:
             interface=STDInterface,
             out=None,  # context redirect (like widgets.Output) or None
             err=None,  # context redirect (like widgets.Output) or None
+            resolve_server=True,  # if False, look up the server name in check_server_name_is_reachable
             ):
+        self.unix_socket_dir = unix_socket_folder()
+        self.unix_only = unix_socket_only()
         if port is None:
-            port = choose_port()
-        server = server or get_local_ip(port)
+            if self.unix_only:
+                port = choose_unix_socket_port(self.unix_socket_dir)
+            else:
+                port = choose_port()
+        self.server_name_pending = False
+        if not server:
+            if self.unix_only:
+                # Only reachable through a local proxy.
+                server = "localhost"
+            elif resolve_server:
+                server = get_local_ip(port)
+            else:
+                # provisional name until the lookup completes.
+                server = "localhost"
+                self.server_name_pending = True
         self.prefix = prefix
         self.server = server
         self.port = port
@@ -386,6 +694,31 @@ class GzServer:
         self.err = err
         self.captured_stdout = None
         self.validator = None
+        self.reaper_task = None
+        self.reaped_sessions = 0
+        self.reaped_bytes = 0
+        self._ready = None
+        startup_mark("server created")
+
+    def ready_future(self):
+        "Future resolving to True when the server is listening (or False if it stopped first)."
+        if self._ready is None:
+            self._ready = get_or_create_event_loop().create_future()
+        return self._ready
+
+    def set_ready(self, value=True):
+        ready = self.ready_future()
+        if not ready.done():
+            ready.set_result(value)
+            if value:
+                startup_mark("server socket bound")
+
+    async def wait_until_ready(self, timeout=None):
+        "Wait until the server is accepting connections.  Return False if it stopped or timed out."
+        try:
+            return await asyncio.wait_for(asyncio.shield(self.ready_future()), timeout)
+        except asyncio.TimeoutError:
+            return False
 
     async def check_server_name_is_reachable(self):
         """
@@ -399,13 +732,24 @@ class GzServer:
         if server_str is not None and len(server_str) > 0:
             self.server = server_str
             return True
+        if self.unix_only:
+            # There is no TCP port to check.
+            return True
         validator = self.validator
         if validator is None:
+            if self.server_name_pending:
+                self.server_name_pending = False
+                self.server = await get_local_ip_async(self.port)
+                startup_mark("server name resolved")
             server = self.server
             port = self.port
-            validator = ValidateServerConnection(server, port)
+            ready = None
+            if self.task is not None:
+                ready = self.ready_future()
+            validator = ValidateServerConnection(server, port, ready=ready)
             self.validator = validator
         await validator.future
+        startup_mark("server name checked")
         if not validator.succeeded:
             # fall back to localhost
             #print("server", server, "is not reachable -- using localhost.")
@@ -415,6 +759,12 @@ class GzServer:
             pass
         return validator.succeeded
 
+    def unix_socket_path(self):
+        "The Unix domain socket this server listens on, or None."
+        if self.unix_socket_dir is None:
+            return None
+        return unix_socket_path(self.port, self.unix_socket_dir)
+
     def set_url_prefix(self, url_prefix):
         self.url_prefix = url_prefix
 
@@ -466,11 +816,69 @@ class GzServer:
         #c = self.counter
         #self.counter = c + 1
         #identifier = "MGR" + str(c)
-        identifier = new_identifier("MGR")
+        identifier = new_identifier(self.manager_prefix)
         result = GizmoManager(identifier, self, websocket_handler)
         self.identifier_to_manager[identifier] = result
         return result
 
+    def idle_managers(self, ttl, idle_ttl=None, now=None):
+        """
+        Managers whose web socket is closed or was never opened for ttl seconds,
+        or (if idle_ttl is given) whose open web socket has seen no traffic for idle_ttl seconds.
+        Managers of unused warm pool gizmos are never idle.
+        """
+        result = []
+        for mgr in list(self.identifier_to_manager.values()):
+            if mgr.pooled:
+                continue
+            idle = mgr.idle_seconds(now)
+            if mgr.is_connected():
+                if idle_ttl is not None and idle >= idle_ttl:
+                    result.append(mgr)
+            elif idle >= ttl:
+                result.append(mgr)
+        return result
+
+    async def remove_manager(self, mgr, reason="Gizmo session closed."):
+        "Tear down the manager and its session.  Return an estimate of the bytes released."
+        self.identifier_to_manager.pop(mgr.identifier, None)
+        return await mgr.close(reason)
+
+    async def reap_idle_sessions(self, ttl, idle_ttl=None, now=None):
+        "Remove idle managers.  Return a list of (identifier, bytes released) pairs."
+        report = []
+        for mgr in self.idle_managers(ttl, idle_ttl, now):
+            released = await self.remove_manager(mgr, reason="Idle gizmo session reaped.")
+            report.append((mgr.identifier, released))
+        if report:
+            released = sum(r[1] for r in report)
+            self.reaped_sessions += len(report)
+            self.reaped_bytes += released
+            if self.verbose:
+                self.my_print("reaped %s idle sessions releasing about %s bytes; %s remain." %
+                    (len(report), released, len(self.identifier_to_manager)))
+        return report
+
+    def start_session_reaper(self, ttl, idle_ttl=None, interval=None):
+        """
+        Periodically remove sessions disconnected for ttl seconds
+        (and open sessions with no traffic for idle_ttl seconds if idle_ttl is not None).
+        """
+        if interval is None:
+            interval = max(1.0, min(ttl, 60.0) / 2.0)
+        if self.reaper_task is not None:
+            self.reaper_task.cancel()
+        self.reaper_task = H5Gizmos.schedule_task(self._reap_periodically(ttl, idle_ttl, interval))
+        return self.reaper_task
+
+    async def _reap_periodically(self, ttl, idle_ttl, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reap_idle_sessions(ttl, idle_ttl)
+            except Exception as e:
+                self.my_print("session reaper exception: " + repr(e))
+
     def run_standalone(self, app_factory=web.Application, sync_run=web.run_app, **args):
         # used in test case only
         app = self.get_app(app_factory=app_factory)
@@ -532,8 +940,22 @@ class GzServer:
                 #raise ValueError("didn't choose port???")
                 pass
             #self.my_print ("runner using port", port)
-            if "print" not in args:
-                args["print"] = self.my_print
+            # aiohttp prints "Running on ..." after the sites have started: use that to signal readiness.
+            self.ready_future()
+            server_print = args.get("print", self.my_print)
+            if not log:
+                server_print = None
+            def ready_print(*args, **kwargs):
+                self.set_ready()
+                if server_print is not None:
+                    server_print(*args, **kwargs)
+            args["print"] = ready_print
+            socket_path = self.unix_socket_path()
+            if socket_path is not None:
+                os.makedirs(self.unix_socket_dir, exist_ok=True)
+                args["path"] = socket_path
+                if self.unix_only:
+                    port = None
             # Start the validator (which delays immediately to permit server start)
             #H5Gizmos.schedule_task(self.check_server_name_is_reachable())
             if log:
@@ -543,11 +965,9 @@ class GzServer:
             else:
                 if self.verbose:
                     print("running with no log")
-                def ignore_print(*args, **kwargs):
-                    pass
                 await async_run(
                     app, port=port, 
-                    access_log=None, print=ignore_print, **args)
+                    access_log=None, **args)
         except asyncio.CancelledError:
             self.status = "app has been cancelled,"
             #pr(self.status)
@@ -556,6 +976,16 @@ class GzServer:
             self.status = "app has stopped."
             #pr(self.status)
             self.stopped = True
+            self.set_ready(False)
+            self.remove_unix_socket()
+
+    def remove_unix_socket(self):
+        socket_path = self.unix_socket_path()
+        if socket_path is not None and os.path.exists(socket_path):
+            try:
+                os.remove(socket_path)
+            except OSError:
+                pass
 
     secret = bytes(str(time.time()), "utf8")
 
@@ -616,6 +1046,8 @@ class GzServer:
         with self.my_stderr():
             with self.my_stdout():
                 app = self.app
+                if self.reaper_task is not None:
+                    self.reaper_task.cancel()
                 if self.task is not None:
                     self.task.cancel()
                 if app is not None:
@@ -656,8 +1088,52 @@ class GizmoManager:
         self.filename_to_http_handler = {}
         #self.url_path = "/%s/%s" % (server.prefix, identifier)
         self.prefix = server.prefix
+        self.created = self.last_activity = time.time()
+        # True while the gizmo waits unused in a WarmGizmoPool: the session reaper skips it.
+        self.pooled = False
         #pr(self.identifier, "manager init with socket handler", self.web_socket_handler)
 
+    def pipeline(self):
+        return getattr(self.web_socket_handler, "pipeline", None)
+
+    def is_connected(self):
+        pipeline = self.pipeline()
+        return (pipeline is not None) and pipeline.is_connected()
+
+    def idle_seconds(self, now=None):
+        "Seconds since the last HTTP request or web socket traffic."
+        if now is None:
+            now = time.time()
+        last = self.last_activity
+        pipeline = self.pipeline()
+        if pipeline is not None:
+            last = max(last, pipeline.last_activity)
+        return now - last
+
+    def estimated_size(self):
+        "Rough count of bytes held in memory by the http handlers."
+        total = 0
+        for handler in self.filename_to_http_handler.values():
+            size = getattr(handler, "estimated_size", None)
+            if size is not None:
+                total += size()
+        return total
+
+    async def close(self, reason="Gizmo session closed."):
+        """
+        Close the web socket, drop all http handlers and release the gizmo callbacks.
+        Return an estimate of the bytes released.
+        """
+        released = self.estimated_size()
+        pipeline = self.pipeline()
+        if pipeline is not None:
+            await pipeline.close(message=reason.encode("utf8"))
+            if pipeline.gizmo is not None:
+                pipeline.gizmo._teardown(reason)
+        self.filename_to_http_handler = {}
+        self.web_socket_handler = None
+        return released
+
     def add_file(self, at_path, filename=None, content_type=None, interface=STDInterface):
         if filename is None:
             filename = os.path.split(at_path)[-1]
@@ -696,6 +1172,7 @@ class GizmoManager:
 
     async def handle(self, method, info, request, interface=STDInterface):
         #pr("... mgr handling", request.path, "method", method)
+        self.last_activity = time.time()
         filename = info.filename
         f2h = self.filename_to_http_handler
         if method == WS:
@@ -842,6 +1319,10 @@ class FileGetter:
         if remainder:
             raise NoSuchRelativePath("File is not a folder: " + repr([self.fs_path, remainder]))
 
+    def estimated_size(self):
+        # file content is not held in memory.
+        return 0
+
     def get_url_info(self, filename, mgr, content_type):
         self.prefix = mgr.prefix
         self.identifier = mgr.identifier
@@ -872,6 +1353,9 @@ class FileGetter:
         apath = info.additional_path
         assert not apath, "File is not a folder: " + repr((path, apath))
         assert interface.file_exists(path)
+        compressed = await COMPRESSED_VARIANTS.respond(request, path, self.content_type, interface)
+        if compressed is not None:
+            return compressed
         bytes = interface.get_file_bytes(path)
         return interface.respond(body=bytes, content_type=self.content_type)
 
@@ -895,8 +1379,11 @@ class FolderGetter(FileGetter):
         all = [path] + list(apath)
         full_os_path = "/".join(all)
         assert interface.file_exists(full_os_path), "No such file found: " + repr(full_os_path)
-        bytes = interface.get_file_bytes(full_os_path)
         (content_type, encoding) = mimetypes.guess_type(full_os_path)
+        compressed = await COMPRESSED_VARIANTS.respond(request, full_os_path, content_type, interface)
+        if compressed is not None:
+            return compressed
+        bytes = interface.get_file_bytes(full_os_path)
         return interface.respond(body=bytes, content_type=content_type)
 
     def validate_relative_path(self, remainder, interface=STDInterface):
@@ -907,10 +1394,56 @@ class FolderGetter(FileGetter):
         full_os_path = "/".join(all)
         assert interface.file_exists(full_os_path), "No such file found: " + repr(full_os_path)
 
+class QueryGetter(FileGetter):
+
+    """
+    Serve content computed by a component for GET requests with integer query parameters,
+    like ".../rows?start=100&count=50".  Subclasses set description, content_type and
+    query_defaults (parameter name --> default value) and define the coroutine method
+    respond_query(values, interface), where values maps parameter names to integers.
+    Malformed parameter values get a bad_query_status response.
+    """
+
+    description = "Query resource"
+    content_type = "application/octet-stream"
+    query_defaults = {}
+    bad_query_status = 400
+    headers = {"Cache-Control": "no-store"}
+    respond_query = None  # defined in subclass
+
+    def __init__(self, filename, component, mgr):
+        assert self.respond_query is not None, "QueryGetter subclasses must define respond_query: " + repr(type(self))
+        self.component = component
+        self.get_url_info(filename, mgr, self.content_type)
+
+    def validate_relative_path(self, remainder):
+        if remainder:
+            raise NoSuchRelativePath(self.description + " is not a folder: " + repr([self.filename, remainder]))
+
+    def query_values(self, query):
+        "The integer query parameters, or None if a value is malformed."
+        try:
+            return {name: int(query.get(name, default)) for (name, default) in self.query_defaults.items()}
+        except ValueError:
+            return None
+
+    async def handle_get(self, info, request, interface=STDInterface):
+        values = self.query_values(request.query)
+        if values is None:
+            body = ("malformed %s query" % self.description).encode("utf8")
+            return interface.respond(status=self.bad_query_status, body=body, content_type="text/plain")
+        return await self.respond_query(values, interface)
+
+    def respond_body(self, body, interface):
+        return interface.respond(body=body, content_type=self.content_type, headers=self.headers)
+
 class BytesGetter(FileGetter):
 
     """
     Serve bytes.
+    The content may be any bytes-like object including memoryviews, numpy arrays and mmaps.
+    Contiguous content is served without copying, so changes to a mutable source are visible.
+    HTTP Range requests are honored to support resumable and parallel fetches.
     """
 
     def __init__(self, filename, byte_content, mgr, content_type, chunksize=DEFAULT_PACKET_SIZE):
@@ -923,42 +1456,121 @@ class BytesGetter(FileGetter):
             raise NoSuchRelativePath("Bytes is not a folder: " + repr([self.filename, remainder]))
 
     def set_content(self, byte_content, content_type=None, check_sane=True):
-        if check_sane and len(byte_content) > self.get_sanity_limit:
+        view = byte_view(byte_content)
+        # memory mapped content is paged in on demand, so large sizes are fine.
+        if check_sane and len(view) > self.get_sanity_limit and not is_memory_mapped(byte_content):
             raise ValueError("transfers larger than %s not yet supported (%s)" %
-                (self.get_sanity_limit, len(byte_content)))
+                (self.get_sanity_limit, len(view)))
         if content_type is not None:
             self.content_type = content_type
-        self.bytes = bytes(byte_content)
+        self.bytes = view
 
     get_sanity_limit = 1590000000
 
+    def estimated_size(self):
+        if is_memory_mapped(self.bytes):
+            # pages of mapped files are owned by the OS cache
+            return 0
+        return self.bytes.nbytes
+
     async def handle_get(self, info, request, interface=STDInterface):
         # based on https://gist.github.com/buxx/d0a749b6673a18a90b47464b79254124
         bytes = self.bytes
         ln = len(bytes)
         chunksize = self.chunksize
         content_type = self.content_type
-        if ln < chunksize:
-            return interface.respond(body=bytes, content_type=content_type)
-        elif ln < self.get_sanity_limit:
-            response = web.StreamResponse(
-                status=200,
-                reason='OK',
-                headers={'Content-Type': content_type},
-            )
-            await response.prepare(request)
-            cursor = 0
-            while cursor < ln:
-                #print("cursor", cursor)
-                end = cursor + chunksize
-                chunk = bytes[cursor : end]
-                await response.write(chunk)
-                cursor = end
-            await response.write_eof()
-            return response
+        headers = {"Accept-Ranges": "bytes"}
+        status = 200
+        headers_in = getattr(request, "headers", None)
+        byte_range = parse_range_header(headers_in and headers_in.get("Range"), ln)
+        if byte_range == RANGE_NOT_SATISFIABLE:
+            headers["Content-Range"] = "bytes */%s" % ln
+            return interface.respond(status=416, headers=headers)
+        (start, end) = (0, ln)
+        if byte_range is not None:
+            (start, end) = byte_range
+            status = 206
+            headers["Content-Range"] = "bytes %s-%s/%s" % (start, end - 1, ln)
+        if end - start < chunksize:
+            return interface.respond(body=bytes[start:end], status=status, content_type=content_type, headers=headers)
+        headers["Content-Type"] = content_type or "application/octet-stream"
+        headers["Content-Length"] = str(end - start)
+        response = web.StreamResponse(status=status, headers=headers)
+        await response.prepare(request)
+        cursor = start
+        while cursor < end:
+            chunk_end = min(cursor + chunksize, end)
+            # memoryview slices do not copy.
+            await response.write(bytes[cursor : chunk_end])
+            cursor = chunk_end
+        await response.write_eof()
+        return response
+
+def byte_view(content):
+    "Flat unsigned byte memoryview of bytes-like content, copying only if the content is not contiguous."
+    if hasattr(content, "__array_interface__"):
+        import numpy as np
+        array = np.ascontiguousarray(content)
+        return memoryview(array.reshape(-1).view(np.uint8))
+    view = memoryview(content)
+    if view.ndim == 1 and view.format == "B":
+        return view
+    if not view.c_contiguous:
+        return memoryview(view.tobytes())
+    return view.cast("B")
+
+def is_memory_mapped(content):
+    "Test whether content is backed by a memory mapped file (an mmap or numpy memmap)."
+    import mmap
+    seen = set()
+    while content is not None and id(content) not in seen:
+        seen.add(id(content))
+        if isinstance(content, mmap.mmap):
+            return True
+        if hasattr(content, "__array_interface__"):
+            import numpy as np
+            if isinstance(content, np.memmap):
+                return True
+        if isinstance(content, memoryview):
+            content = content.obj
         else:
-            raise ValueError("transfers larger than %s not yet supported" %
-                self.get_sanity_limit)
+            content = getattr(content, "base", None)
+    return False
+
+# marker for an unsatisfiable byte range request
+RANGE_NOT_SATISFIABLE = "unsatisfiable"
+
+def parse_range_header(header, length):
+    """
+    Parse a single range HTTP Range header value like "bytes=0-99", "bytes=100-" or "bytes=-100".
+    Return (start, end) with end exclusive, None to send the whole content,
+    or RANGE_NOT_SATISFIABLE.
+    """
+    if not header:
+        return None
+    header = header.strip()
+    if not header.startswith("bytes=") or "," in header:
+        # multipart ranges are not supported: send everything.
+        return None
+    spec = header[len("bytes="):].strip()
+    (first, dash, last) = spec.partition("-")
+    if not dash:
+        return None
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0:
+                return RANGE_NOT_SATISFIABLE
+            return (max(0, length - suffix), length)
+        start = int(first)
+        end = length
+        if last:
+            end = min(int(last) + 1, length)
+    except ValueError:
+        return None
+    if start >= length or end <= start:
+        return RANGE_NOT_SATISFIABLE
+    return (start, end)
 
 class GizmoPipelineSocketHandler:
 
@@ -969,13 +1581,17 @@ class GizmoPipelineSocketHandler:
 
     async def handle(self, info, request, interface):
         #print("**** pipeline handler started")
+        startup_mark("web socket connected")
         await self.pipeline.handle_websocket_request(request)
 
 class ValidateServerConnection:
 
-    "Check that the web server '/ping' is reachable using the current port and server name."
+    """
+    Check that the web server is reachable using the current port and server name.
+    If a ready future is given wait for it instead of delaying to allow the server to start.
+    """
 
-    def __init__(self, server, port, delay=0.1, wait=0.2, verbose=False):
+    def __init__(self, server, port, delay=0.1, wait=0.2, verbose=False, ready=None, ready_wait=10):
         self.succeeded = False
         self.status = "initialized"
         self.verbose = verbose
@@ -983,6 +1599,8 @@ class ValidateServerConnection:
         self.port = port
         self.delay = delay
         self.wait = wait
+        self.ready = ready
+        self.ready_wait = ready_wait
         self.loop = get_or_create_event_loop()
         self.future = self.loop.create_future()
         self.task = self.loop.create_task(self.validate())
@@ -997,31 +1615,28 @@ class ValidateServerConnection:
         if verbose:
             print("starting connection validation")
         future = self.future
-        now = str(time.time())
         server = self.server
         port = self.port
-        url = "http://%s:%s/ping?now=%s" % (server, port, now)
         self.my_stderr = io.StringIO()
         with redirect_stderr(self.my_stderr):
             try:
-                self.status = "delaying"
-                await asyncio.sleep(self.delay)  # allow time for server to start (?)
+                if self.ready is not None:
+                    self.status = "waiting for server"
+                    await asyncio.wait_for(asyncio.shield(self.ready), self.ready_wait)
+                else:
+                    self.status = "delaying"
+                    await asyncio.sleep(self.delay)  # allow time for server to start (?)
                 self.status = "preparing"
                 self.timer = self.loop.create_task(self.timeout())
-                # https://www.twilio.com/blog/asynchronous-http-requests-in-python-with-aiohttp
-                # https://docs.aiohttp.org/en/stable/client_reference.html
-                self.status = "requesting"
-                async with aiohttp.ClientSession() as client:
-                    async with client.get(url) as resp:
-                        status = resp.status
-                        bytes = await resp.read()
-                        text = bytes.decode("utf-8")
-                        self.status = "responded"
-                        future.set_result((status, text))
-                        if verbose:
-                            print("validation succeeded")
-                        self.succeeded = True
-                        self.response = resp
+                # A TCP connection is enough to show the server name and port reach the server.
+                self.status = "connecting"
+                (reader, writer) = await asyncio.open_connection(server, port)
+                writer.close()
+                self.status = "connected"
+                future.set_result((server, port))
+                if verbose:
+                    print("validation succeeded")
+                self.succeeded = True
             except asyncio.CancelledError:
                 if verbose:
                     print("validation cancelled.")
@@ -0,0 +1,381 @@
+"""
+Multi-process gizmo session workers.
+
+A front GzServer dispatches each launched gizmo session to one of a pool of
+worker processes.  Each worker runs its own event loop, GzServer and gizmos on
+a local port, so a CPU heavy session only slows down the sessions sharing its worker.
+
+The front server registers a WorkerSession in place of a GizmoManager for each
+session identifier, which relays
+
+    /gizmo/http/<identifier>/...
+    /gizmo/ws/<identifier>
+
+to the worker that owns the session.
+
+Workers are started as
+
+    python -m H5Gizmos.python.gizmo_workers
+
+and receive JSON commands one per line on stdin.  They reply on stdout with lines
+prefixed by WORKER_MARKER (other output is ignored, as for gizmo scripts).
+
+Example:
+
+    pool = WorkerPool(nworkers=4)
+    await pool.start()
+    add_worker_launcher(main_component.gizmo, pool, "my_package.my_module:make_component")
+"""
+
+from . import gizmo_server
+from .gizmo_server import FileGetter, STDInterface, GET, POST, WS
+from .gizmo_launch_url import LaunchGizmoAndRedirect, launch_component, ERR_TEMPLATE
+from .gz_parent_protocol import schedule_task, new_identifier
+from aiohttp import web
+import aiohttp
+import asyncio
+import importlib
+import traceback
+import html
+import json
+import time
+import sys
+import os
+
+WORKER_MARKER = "GIZMO_WORKER:"
+
+def maker_reference(component_maker):
+    """
+    Convert a component maker to a "module:attribute" string which can be resolved in a worker.
+    Only module level callables (or reference strings) can be sent to another process.
+    """
+    if isinstance(component_maker, str):
+        assert ":" in component_maker, "Maker reference should be 'module:attribute': " + repr(component_maker)
+        return component_maker
+    module = getattr(component_maker, "__module__", None)
+    qualname = getattr(component_maker, "__qualname__", "")
+    if module is None or module == "__main__" or "<" in qualname:
+        raise ValueError(
+            "Worker component makers must be importable module level callables: " + repr(component_maker))
+    return "%s:%s" % (module, qualname)
+
+def resolve_maker(reference):
+    (module_name, attributes) = reference.split(":", 1)
+    result = importlib.import_module(module_name)
+    for name in attributes.split("."):
+        result = getattr(result, name)
+    return result
+
+def worker_environment():
+    "Environment for worker processes which makes sure they import this H5Gizmos package."
+    env = os.environ.copy()
+    package_parent = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    paths = [package_parent]
+    if env.get("PYTHONPATH"):
+        paths.append(env["PYTHONPATH"])
+    env["PYTHONPATH"] = os.pathsep.join(paths)
+    return env
+
+class WorkerLaunchError(RuntimeError):
+    "The worker could not launch the component."
+
+class WorkerProcess:
+
+    "Front side handle for one worker process."
+
+    def __init__(self, pool, index):
+        self.pool = pool
+        self.index = index
+        self.process = None
+        self.port = None
+        self.pid = None
+        self.sessions = set()
+        self.request_futures = {}
+        self.ready = asyncio.get_event_loop().create_future()
+        self.session = None
+        self.reader_task = None
+
+    def __repr__(self):
+        return "WorkerProcess" + repr((self.index, self.pid, self.port, len(self.sessions)))
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "H5Gizmos.python.gizmo_workers",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            env=worker_environment(),
+        )
+        self.reader_task = schedule_task(self.read_replies())
+        await self.ready
+        self.session = aiohttp.ClientSession(auto_decompress=False)
+
+    async def read_replies(self):
+        stdout = self.process.stdout
+        while True:
+            line = await stdout.readline()
+            if not line:
+                break
+            text = line.decode("utf8", "replace").strip()
+            if not text.startswith(WORKER_MARKER):
+                if self.pool.verbose:
+                    print("worker", self.index, ":", text)
+                continue
+            self.handle_reply(json.loads(text[len(WORKER_MARKER):]))
+        # The worker has exited: fail anything outstanding.
+        exception = WorkerLaunchError("Worker process exited: " + repr(self))
+        if not self.ready.done():
+            self.ready.set_exception(exception)
+        for future in self.request_futures.values():
+            if not future.done():
+                future.set_exception(exception)
+        self.request_futures = {}
+        self.pool.worker_exited(self)
+
+    def handle_reply(self, reply):
+        status = reply.get("status")
+        if status == "ready":
+            self.port = reply["port"]
+            self.pid = reply["pid"]
+            if not self.ready.done():
+                self.ready.set_result(True)
+            return
+        future = self.request_futures.pop(reply.get("request_id"), None)
+        if future is None or future.done():
+            return
+        if status == "launched":
+            future.set_result(reply)
+        else:
+            future.set_exception(WorkerLaunchError(reply.get("traceback", repr(reply))))
+
+    def send(self, command):
+        data = (json.dumps(command) + "\n").encode("utf8")
+        self.process.stdin.write(data)
+
+    async def request(self, command, timeout=60):
+        request_id = new_identifier("W")
+        command["request_id"] = request_id
+        future = asyncio.get_event_loop().create_future()
+        self.request_futures[request_id] = future
+        self.send(command)
+        await self.process.stdin.drain()
+        return await asyncio.wait_for(future, timeout)
+
+    async def launch(self, reference, title):
+        reply = await self.request(dict(command="launch", maker=reference, title=title))
+        self.sessions.add(reply["identifier"])
+        return reply
+
+    def close_session(self, identifier):
+        self.sessions.discard(identifier)
+        if self.process is not None and self.process.returncode is None:
+            self.send(dict(command="close", identifier=identifier))
+
+    async def stop(self):
+        if self.session is not None:
+            await self.session.close()
+        process = self.process
+        if process is not None and process.returncode is None:
+            try:
+                process.stdin.close()
+                await asyncio.wait_for(process.wait(), 2.0)
+            except (asyncio.TimeoutError, OSError):
+                process.terminate()
+
+class WorkerSession:
+
+    """
+    Stands in for a GizmoManager in the front server identifier_to_manager mapping,
+    relaying HTTP and web socket requests to the worker that owns the session.
+    """
+
+    def __init__(self, identifier, worker):
+        self.identifier = identifier
+        self.worker = worker
+        self.created = self.last_activity = time.time()
+        self.open_web_sockets = 0
+        self.pooled = False
+
+    def is_connected(self):
+        return self.open_web_sockets > 0
+
+    def idle_seconds(self, now=None):
+        if now is None:
+            now = time.time()
+        return now - self.last_activity
+
+    def estimated_size(self):
+        # Memory is held by the worker, not by the front server.
+        return 0
+
+    async def close(self, reason="Gizmo session closed."):
+        self.worker.close_session(self.identifier)
+        return 0
+
+    def worker_url(self, request):
+        return "http://localhost:%s%s" % (self.worker.port, request.path_qs)
+
+    async def handle(self, method, info, request, interface=STDInterface):
+        self.last_activity = time.time()
+        if method == WS:
+            return await self.relay_web_socket(request)
+        return await self.relay_http(method, request)
+
+    async def relay_http(self, method, request):
+        from .gizmo_link import relay_http
+        return await relay_http(self.worker.session, method, self.worker_url(request), request)
+
+    async def relay_web_socket(self, request):
+        from .gizmo_link import WebSocketConnector
+        ws = web.WebSocketResponse(autoping=False)
+        await ws.prepare(request)
+        connector = WebSocketConnector(ws, self.worker.port, request.path_qs[1:])
+        self.open_web_sockets += 1
+        try:
+            await connector.get_server_ws()
+            connector.start_listener_tasks()
+            await connector.server_listener_task
+        finally:
+            self.open_web_sockets -= 1
+            self.last_activity = time.time()
+        return ws
+
+class WorkerPool:
+
+    """
+    A pool of gizmo worker processes behind a front GzServer.
+    Each launch is assigned to the worker with the fewest sessions.
+    """
+
+    verbose = False
+
+    def __init__(self, nworkers=None, server=None):
+        if nworkers is None:
+            nworkers = os.cpu_count() or 1
+        self.nworkers = nworkers
+        self.server = server
+        self.workers = []
+
+    async def start(self):
+        self.server = gizmo_server._check_server(self.server)
+        self.workers = [WorkerProcess(self, i) for i in range(self.nworkers)]
+        await asyncio.gather(*[w.start() for w in self.workers])
+        return self
+
+    def choose_worker(self):
+        live = [w for w in self.workers if w.process is not None and w.process.returncode is None]
+        assert live, "No live gizmo worker processes."
+        return min(live, key=lambda w: len(w.sessions))
+
+    async def launch(self, component_maker, title="launched gizmo"):
+        """
+        Launch a component in a worker.  component_maker must be a "module:attribute"
+        reference or an importable module level callable.
+        Return (identifier, filename) for the session entry page.
+        """
+        reference = maker_reference(component_maker)
+        worker = self.choose_worker()
+        reply = await worker.launch(reference, title)
+        identifier = reply["identifier"]
+        i2m = self.server.identifier_to_manager
+        if identifier in i2m:
+            # Never route one session's traffic to another session.
+            worker.close_session(identifier)
+            raise WorkerLaunchError("Duplicate session identifier from worker: " + repr((identifier, worker)))
+        i2m[identifier] = WorkerSession(identifier, worker)
+        return (identifier, reply["filename"])
+
+    def worker_exited(self, worker):
+        # Drop the sessions the worker owned.
+        i2m = self.server.identifier_to_manager if self.server is not None else {}
+        for identifier in list(worker.sessions):
+            session = i2m.get(identifier)
+            if isinstance(session, WorkerSession) and session.worker is worker:
+                del i2m[identifier]
+        worker.sessions.clear()
+
+    async def stop(self):
+        await asyncio.gather(*[w.stop() for w in self.workers])
+
+class LaunchInWorkerAndRedirect(LaunchGizmoAndRedirect):
+
+    "Launch the component in a worker process and redirect the browser to it."
+
+    def __init__(self, pool, component_maker, title="launched gizmo", proxy=False, parent_component=None):
+        super().__init__(component_maker, title=title, proxy=proxy, parent_component=parent_component)
+        self.pool = pool
+        # fail early if the maker cannot be sent to a worker
+        self.reference = maker_reference(component_maker)
+
+    async def handle_get(self, info, request, interface=STDInterface):
+        try:
+            (identifier, filename) = await self.pool.launch(self.reference, title=self.title)
+        except WorkerLaunchError as e:
+            err_fmt = ERR_TEMPLATE % (html.escape(str(e)),)
+            return interface.respond(body=err_fmt.encode("utf8"), content_type="text/html")
+        return self.redirect_response(identifier, filename, interface)
+
+def add_worker_launcher(to_gizmo, pool, component_maker, filename=None, parent_component=None):
+    "Like gizmo_launch_url.add_launcher, but launch each new gizmo in a worker process of the pool."
+    if filename is None:
+        filename = new_identifier("gizmo_launcher")
+    launcher = LaunchInWorkerAndRedirect(pool, component_maker, parent_component=parent_component)
+    mgr = to_gizmo._manager
+    mgr.add_http_handler(filename, launcher)
+    relative_url = to_gizmo.relative_url(filename)
+    full_url = mgr.local_url(for_gizmo=to_gizmo, method="http", filename=filename)
+    return (relative_url, full_url, filename)
+
+# Worker process side.
+
+def emit(reply):
+    sys.stdout.write(WORKER_MARKER + json.dumps(reply) + "\n")
+    sys.stdout.flush()
+
+async def worker_launch(command):
+    request_id = command.get("request_id")
+    try:
+        maker = resolve_maker(command["maker"])
+        component = maker()
+        gizmo = await launch_component(component, title=command.get("title", "launched gizmo"))
+        emit(dict(
+            status="launched",
+            request_id=request_id,
+            identifier=gizmo._manager.identifier,
+            filename=gizmo._filename,
+        ))
+    except Exception:
+        emit(dict(status="error", request_id=request_id, traceback=traceback.format_exc()))
+
+async def worker_close(server, command):
+    mgr = server.identifier_to_manager.get(command.get("identifier"))
+    if mgr is not None:
+        await server.remove_manager(mgr, reason="Gizmo session closed by front server.")
+
+async def read_worker_commands(server):
+    loop = asyncio.get_event_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    while True:
+        line = await reader.readline()
+        if not line:
+            # The front server went away.
+            break
+        command = json.loads(line.decode("utf8"))
+        action = command.get("command")
+        if action == "launch":
+            schedule_task(worker_launch(command))
+        elif action == "close":
+            schedule_task(worker_close(server, command))
+    loop.stop()
+
+def worker_main():
+    gizmo_server.get_or_create_event_loop()
+    server = gizmo_server._check_server()
+    # Worker counters all start at the same value: make session identifiers unique per worker.
+    server.manager_prefix = "MGR%s" % os.getpid()
+    emit(dict(status="ready", port=server.port, pid=os.getpid()))
+    schedule_task(read_worker_commands(server))
+    gizmo_server.run_until_exit()
+
+if __name__ == "__main__":
+    worker_main()
@@ -29,6 +29,10 @@ JS_COLLECTION_NAME_MAP = {
     np.uint64: "BigUint64Array",
 }
 
+# Arrays larger than this are transferred by store_array in parallel HTTP Range requests.
+STORE_ARRAY_CHUNK_SIZE = 1 << 23
+STORE_ARRAY_PARALLEL = 4
+
 # xxx what is the diff np.dtype(np.uint8) vs np.uint8???
 for (ty, n) in list(JS_COLLECTION_NAME_MAP.items()):
     JS_COLLECTION_NAME_MAP[np.dtype(ty)] = n
@@ -47,6 +51,10 @@ class Component:
     _component_started_future = None
     _actions_awaiting_start = None
     _module_context = None
+    server_side_render = False  # opt in to rendering the initial HTML into the entry page.
+    rendered_on_server = False
+    held_callbacks = None   # callbacks registered on behalf of the component (released by destroy)
+    owned_getters = None    # getter url paths added by the component (removed by destroy)
 
     def __init__(self):
         # start the task which waits for gizmo initialization
@@ -122,6 +130,11 @@ class Component:
         if context is not None:
             import_map = context.import_map_html()
             self.insert_html(import_map)
+            page = self.gizmo._html_page
+            if page is not None and page.preload_hints:
+                hints = context.module_preload_html()
+                if hints:
+                    self.insert_html(hints)
             script = context.module_loader_html()
             self.insert_html(script)
 
@@ -329,10 +342,39 @@ class Component:
         self.modules = gizmo.modules
         body = self.body = gizmo.GIZMO_BODY
         interface = gizmo.H5GIZMO_INTERFACE
+        rendered = self.render_on_server(gizmo)
         element = self.dom_element_reference(gizmo)
         do(interface._set("Target", element))
         target = self.target = interface.Target
-        do(body.append(target))
+        if not rendered:
+            do(body.append(target))
+
+    def set_server_side_render(self, value=True):
+        """
+        Render the initial HTML for the component into the entry page so it appears with the first paint.
+        Event handlers are attached after the web socket connects.  Must be set before the gizmo starts.
+        """
+        self.server_side_render = value
+        return self
+
+    def static_html(self):
+        "HTML for the initial state of the component, or None if the component cannot be rendered on the server."
+        return None
+
+    def mark_rendered_on_server(self):
+        "Record that the component (and any sub-components) are in the entry page HTML."
+        self.rendered_on_server = True
+
+    def render_on_server(self, gizmo):
+        "Insert the static HTML for the component into the entry page if enabled and possible."
+        if not self.server_side_render or gizmo._html_page.materialized:
+            return False
+        html_text = self.static_html()
+        if html_text is None:
+            return False
+        gizmo._insert_html(html_text)
+        self.mark_rendered_on_server()
+        return True
 
     stylesheet_path = "../static/gizmo_style.css"  # changable in subclass (to None to disable)
 
@@ -478,6 +520,127 @@ class Component:
         "Get reference to a previously cached object on the JS side"
         return self.js_object_cache[name]
 
+    def add_getter(self, url_path, getter):
+        "Add a getter serving a resource for this component (removed when the component is destroyed)."
+        self.gizmo._add_getter(url_path, getter)
+        owned = self.owned_getters = self.owned_getters or []
+        if url_path not in owned:
+            owned.append(url_path)
+
+    def hold_callback(self, callback):
+        """
+        Record that this component passes the callback to the Javascript side (call before sending it).
+        Callbacks shared by several components are only released when the last holder releases them,
+        and callbacks which other code registered before any component held them are never released.
+        """
+        if callback is None:
+            return
+        held = self.held_callbacks = self.held_callbacks or []
+        if callback in held:
+            return
+        held.append(callback)
+        gizmo = self.gizmo
+        holders = gizmo._callback_holders
+        entry = holders.get(callback)
+        if entry is None:
+            # [number of holding components, registered by the components]
+            entry = holders[callback] = [0, callback not in gizmo._callable_to_oid]
+        entry[0] += 1
+
+    def drop_callback(self, callback):
+        "Release a held callback which this component no longer passes to the Javascript side."
+        held = self.held_callbacks
+        if not held or callback not in held:
+            return
+        held.remove(callback)
+        if self.release_hold(callback):
+            self.gizmo._unregister_callback(callable=callback)
+
+    def release_hold(self, callback):
+        "Count down the holders of the callback: return True if it should be unregistered."
+        gizmo = self.gizmo
+        holders = gizmo._callback_holders
+        entry = holders.get(callback)
+        if entry is None:
+            return False
+        entry[0] -= 1
+        if entry[0] > 0:
+            return False
+        del holders[callback]
+        return entry[1] and callback in gizmo._callable_to_oid
+
+    def release_callbacks(self):
+        "Unregister the callbacks held only by this component and the bound methods of this component."
+        gizmo = self.gizmo
+        c2o = gizmo._callable_to_oid
+        released = [c for c in (self.held_callbacks or ()) if self.release_hold(c)]
+        self.held_callbacks = None
+        released.extend(c for c in c2o if getattr(c, "__self__", None) is self)
+        for callback in released:
+            if callback in c2o:
+                gizmo._unregister_callback(callable=callback)
+
+    def sub_components(self):
+        "Components contained in this component (override in containers)."
+        return []
+
+    def component_tree(self, keep=()):
+        """
+        This component and all the components it contains, each listed once,
+        leaving out the components in keep and the components they contain.
+        """
+        result = []
+        seen = set()
+        for component in keep:
+            if component is not self:
+                seen.update(id(c) for c in component.component_tree())
+        stack = [self]
+        while stack:
+            component = stack.pop()
+            if id(component) in seen:
+                continue
+            seen.add(id(component))
+            result.append(component)
+            stack.extend(reversed(list(component.sub_components())))
+        return result
+
+    def release(self):
+        """
+        Release the Python side resources of this component (not its sub-components):
+        callbacks, getters and the object cache reference.  Extend in subclasses.
+        """
+        gizmo = self.gizmo
+        if gizmo is None:
+            return
+        self.release_callbacks()
+        for url_path in self.owned_getters or ():
+            gizmo._remove_getter(url_path)
+        self.owned_getters = None
+        if self.cache_name is not None:
+            gizmo._dereference_identity(self.cache_name)
+        self.cache_name = None
+        self.js_object_cache = None
+
+    def destroy(self, keep=()):
+        """
+        Release everything held by this component and its sub-components on both sides:
+        the Javascript object caches (removing the cached DOM elements), callbacks and getters.
+        The Javascript caches are released in one message.  Use detach() instead to show the
+        component again later.  Sub-components in keep (which moved elsewhere) are not released.
+        """
+        gizmo = self.gizmo
+        components = self.component_tree(keep)
+        cache_names = [c.cache_name for c in components if c.cache_name is not None]
+        for component in components:
+            component.release()
+        if gizmo is None or not cache_names or gizmo._torn_down:
+            return
+        try:
+            do(gizmo.H5GIZMO_INTERFACE.destroy_caches(cache_names))
+        except H5Gizmos.WebSocketIsClosed:
+            # the browser side is gone already.
+            pass
+
     def reference(self, name):
         assert self.gizmo is not None, "gizmo is not configured."
         return getattr(self.gizmo, name)
@@ -499,36 +662,71 @@ class Component:
         """
         return self.gizmo.H5Gizmos.Function(list(argument_names), body_string)
 
-    async def store_array(self, array, cache_name, dtype=None, timeout=60):
+    async def store_array(
+        self, 
+        array, 
+        cache_name, 
+        dtype=None, 
+        timeout=60, 
+        chunk_size=STORE_ARRAY_CHUNK_SIZE, 
+        parallel=STORE_ARRAY_PARALLEL,
+        on_progress=None,
+        ):
         """
         Transfer a numpy array to Javascript and store it in the local cache using HTTP GET.
         The array is flattened and converted to an appropriate Javascript indexed collection.
+        The collection has a "shape" property giving the dimensions of the original array.
         Return a reference to the cached index collection.
 
+        Large arrays are fetched in chunk_size HTTP Range requests, up to parallel at a time,
+        directly into a preallocated buffer.  If provided, on_progress(loaded, total) is called
+        as bytes arrive.  If the transfer is cancelled or times out it is aborted on the JS side.
+
         When done with the array in JS, break the array reference with component.uncache(cache_name).
         """
-        # XXX add multiple get implementation for VERY large arrays.
         gizmo = self.gizmo
+        array = np.asarray(array)
         if dtype is None:
             dtype = array.dtype
-        rarray = array.ravel().astype(dtype)
+        dtype = np.dtype(dtype)
         object = self.js_object_cache
         converter_name = JS_COLLECTION_NAME_MAP.get(dtype)
         assert converter_name is not None, "No JS converter for numpy dtype: " + repr(dtype)
         converter = gizmo.window[converter_name]
-        # Set up the blob resource
+        if array.dtype != dtype:
+            array = array.astype(dtype)
+        # Set up the blob resource: contiguous arrays are served from their own memory without copying.
         url = H5Gizmos.new_identifier("blob")
-        array_bytes = rarray.tobytes()
         content_type = "application/x-binary"
-        getter = gizmo_server.BytesGetter(url, array_bytes, gizmo._manager, content_type )
+        getter = gizmo_server.BytesGetter(url, array, gizmo._manager, content_type )
         gizmo._add_getter(url, getter)
+        options = dict(
+            chunk_size=int(chunk_size),
+            parallel=int(parallel),
+            shape=list(array.shape),
+        )
+        # Hold the progress callback for this transfer unless this component already holds it.
+        hold_progress = on_progress is not None and on_progress not in (self.held_callbacks or [])
+        if on_progress is not None:
+            if hold_progress:
+                self.hold_callback(on_progress)
+            options["on_progress"] = on_progress
         # Pull the resource on the JS side.
+        done = False
         try:
-            length = await get(gizmo.H5Gizmos.store_blob(url, object, cache_name, converter), timeout=timeout)
+            length = await get(
+                gizmo.H5Gizmos.fetch_array(url, object, cache_name, converter, array.nbytes, options), 
+                timeout=timeout)
             self._store_result = length # for debugging
+            done = True
         finally:
+            if not done:
+                # Stop any outstanding chunk requests.
+                do(gizmo.H5Gizmos.cancel_transfer(url))
             # Remove the resource
             gizmo._remove_getter(url)
+            if hold_progress:
+                self.drop_callback(on_progress)
         return self.my(cache_name)
 
     async def store_json(self, json_object, cache_name, timeout=60):
@@ -0,0 +1,386 @@
+"""
+A server paged data grid for numpy structured arrays, column dictionaries and pandas DataFrames.
+
+Sorting, filtering and paging happen in Python with vectorized numpy operations
+(sort permutations are cached per column), and the browser only fetches the windows
+of rows in or near the view, encoded as binary columns.  For a displayed grid, new sort
+orders and filters are computed in an executor thread so large tables do not block the
+event loop; the browser keeps showing the old view until the new one is ready.
+"""
+
+from . import gz_jQuery
+from . import gizmo_server
+from .gz_parent_protocol import do, schedule_task
+from .gz_virtual_stack import VIRTUAL_STACK_JS
+import numpy as np
+import asyncio
+import json
+
+DATA_GRID_JS = "GIZMO_STATIC/data_grid.js"
+
+# numpy dtypes with a matching javascript typed array; other numbers are sent as float64.
+TYPED_ARRAY_DTYPES = ("int8", "uint8", "int16", "uint16", "int32", "uint32", "float32", "float64")
+
+# comparison prefixes for numeric column filters, longest first.
+COMPARISONS = [
+    (">=", np.greater_equal),
+    ("<=", np.less_equal),
+    ("!=", np.not_equal),
+    (">", np.greater),
+    ("<", np.less),
+    ("=", np.equal),
+]
+
+class DataGridError(ValueError):
+    "The data cannot be shown in a data grid."
+
+def data_columns(data):
+    """
+    Return a list of (name, 1d numpy array) for a numpy structured array,
+    a pandas DataFrame or a dictionary mapping names to sequences.
+    """
+    if isinstance(data, np.ndarray):
+        if data.dtype.names is None:
+            raise DataGridError("Numpy arrays for data grids should have named fields: " + repr(data.dtype))
+        columns = [(name, data[name]) for name in data.dtype.names]
+    elif hasattr(data, "columns") and hasattr(data, "iloc"):
+        # pandas DataFrame (pandas is not imported here).
+        columns = [(str(name), data[name].to_numpy()) for name in data.columns]
+    elif hasattr(data, "items"):
+        columns = [(str(name), np.asarray(values)) for (name, values) in data.items()]
+    else:
+        raise DataGridError("Cannot make data grid columns from: " + repr(type(data)))
+    lengths = set(len(values) for (name, values) in columns)
+    if len(lengths) > 1:
+        raise DataGridError("Data grid columns should have the same length: " + repr(sorted(lengths)))
+    for (name, values) in columns:
+        if values.ndim != 1:
+            raise DataGridError("Data grid columns should be 1 dimensional: " + repr((name, values.shape)))
+    return columns
+
+def is_numeric(values):
+    return values.dtype.kind in "iufb"
+
+def numeric_mask(values, text):
+    "Return the mask for a numeric filter like '>3', '!=0', '1..5' or '7', or None if text is not numeric."
+    try:
+        for (prefix, comparison) in COMPARISONS:
+            if text.startswith(prefix):
+                return comparison(values, float(text[len(prefix):]))
+        if ".." in text:
+            (low, high) = text.split("..", 1)
+            return (values >= float(low)) & (values <= float(high))
+        return values == float(text)
+    except ValueError:
+        return None
+
+def align8(n):
+    return (n + 7) & ~7
+
+def encode_columns(columns, indices, header):
+    """
+    Encode the rows at indices as binary columns: a little endian uint32 header length,
+    the JSON header, then each column block starting at an 8 byte boundary.
+    Column block offsets in the header are relative to the first block.
+    """
+    count = len(indices)
+    blocks = []
+    position = 0
+    descriptions = []
+    def add_block(data):
+        nonlocal position
+        offset = position
+        blocks.append(data)
+        blocks.append(b"\0" * (align8(len(data)) - len(data)))
+        position = align8(position + len(data))
+        return offset
+    for (name, values) in columns:
+        window = values[indices]
+        kind = window.dtype.kind
+        if kind in "iufb":
+            if kind == "b":
+                window = window.astype(np.uint8)
+                column_kind = "bool"
+            else:
+                column_kind = "float" if kind == "f" else "int"
+            if window.dtype.name not in TYPED_ARRAY_DTYPES:
+                # int64 and friends: javascript numbers are float64.
+                window = window.astype(np.float64)
+            window = window.astype(window.dtype.newbyteorder("<"), copy=False)
+            offset = add_block(np.ascontiguousarray(window).tobytes())
+            descriptions.append(dict(name=name, kind=column_kind, dtype=window.dtype.name, offset=offset))
+        else:
+            texts = [str(value).encode("utf8") for value in window]
+            ends = np.zeros((count + 1,), dtype="<u4")
+            np.cumsum([len(text) for text in texts], out=ends[1:])
+            offsets = add_block(ends.tobytes())
+            offset = add_block(b"".join(texts))
+            descriptions.append(dict(name=name, kind="text", offsets=offsets, offset=offset))
+    header = dict(header, count=count, columns=descriptions)
+    header_bytes = json.dumps(header).encode("utf8")
+    prefix = np.array([len(header_bytes)], dtype="<u4").tobytes() + header_bytes
+    prefix = prefix + b"\0" * (align8(len(prefix)) - len(prefix))
+    return prefix + b"".join(blocks)
+
+class ColumnWindowGetter(gizmo_server.QueryGetter):
+
+    "Serve a window of grid rows as binary columns for GET ...?start=S&count=N."
+
+    description = "Grid window"
+    query_defaults = dict(start=0, count=0)
+
+    async def respond_query(self, values, interface):
+        grid = self.component
+        # never encode more than a window of rows per request.
+        body = grid.window_bytes(values["start"], min(values["count"], grid.window_size))
+        return self.respond_body(body, interface)
+
+class DataGrid(gz_jQuery.FetchingComponent):
+
+    """
+    A scrolling table for a numpy structured array, a dictionary of columns or a pandas DataFrame.
+    Click a column header to sort by the column (again to reverse the order).
+    Column filters are substrings for text columns and '>3', '<=2.5', '!=0', '1..5' or '7' for numbers.
+    """
+
+    getter_class = ColumnWindowGetter
+    getter_prefix = "grid_rows"
+
+    def __init__(
+        self,
+        data,
+        row_height=24,
+        height=400,
+        width=None,
+        column_width=120,
+        window_size=200,   # rows fetched by the browser per request
+        overscan=10,       # extra rows kept above and below the view
+        max_windows=20,    # fetched windows cached in the browser
+        on_row_click=None,
+        title=None,
+        ):
+        super().__init__(init_text=None, title=title)
+        self.row_height = row_height
+        self.column_width = column_width
+        self.window_size = window_size
+        self.overscan = overscan
+        self.max_windows = max_windows
+        self.on_row_click = on_row_click
+        self.version = 0
+        self.view_task = None  # background computation of the next view
+        self.set_data(data, refresh=False)
+        self.resize(width=width, height=height)
+        self.addClass("H5Gizmo-data-grid")
+
+    def set_data(self, data, refresh=True):
+        "Replace the table data (clearing the sort order and filters)."
+        self.columns = data_columns(data)
+        self.names = [name for (name, values) in self.columns]
+        self.nrows = len(self.columns[0][1]) if self.columns else 0
+        self.sort_column = None
+        self.ascending = True
+        self.filters = {}
+        # caches
+        self.permutations = {}   # column index --> ascending stable argsort
+        self.lower_texts = {}    # column index --> lower case strings for text filters
+        self.masks = {}          # column index --> (filter text, mask)
+        self.view = None         # row indices in view order, None for all rows in order
+        self.shown_key = self.view_key()  # the sort order and filters of self.view
+        if refresh:
+            if self.controller is not None:
+                do(self.controller.set_columns(self.names, None, True))
+            self.refresh()
+        return self
+
+    def column_index(self, column):
+        if isinstance(column, str):
+            return self.names.index(column)
+        assert 0 <= column < len(self.columns), "No such column: " + repr(column)
+        return column
+
+    def permutation(self, index):
+        "The cached stable ascending sort order for the column."
+        result = self.permutations.get(index)
+        if result is None:
+            result = self.permutations[index] = np.argsort(self.columns[index][1], kind="stable")
+        return result
+
+    def lower_text(self, index):
+        result = self.lower_texts.get(index)
+        if result is None:
+            values = self.columns[index][1]
+            result = self.lower_texts[index] = np.char.lower(values.astype(str))
+        return result
+
+    def column_mask(self, index, text):
+        cached = self.masks.get(index)
+        if cached is not None and cached[0] == text:
+            return cached[1]
+        values = self.columns[index][1]
+        mask = None
+        if is_numeric(values):
+            mask = numeric_mask(values, text.replace(" ", ""))
+        if mask is None:
+            if is_numeric(values):
+                # text filters never match numbers (avoid converting large numeric columns to strings).
+                mask = np.zeros(values.shape, dtype=bool)
+            else:
+                mask = np.char.find(self.lower_text(index), text.lower()) >= 0
+        self.masks[index] = (text, mask)
+        return mask
+
+    def filter_mask(self, filters):
+        "Boolean mask of the rows passing all (index, text) filters, or None if there are no filters."
+        result = None
+        for (index, text) in filters:
+            mask = self.column_mask(index, text)
+            result = mask if result is None else (result & mask)
+        return result
+
+    def view_key(self):
+        "The current (sort column, ascending, filters) which determine the view."
+        return (self.sort_column, self.ascending, tuple(sorted(self.filters.items())))
+
+    def compute_view(self, key):
+        "Row indices in view order for the view key, or None for all rows in order (may run in a thread)."
+        (sort_column, ascending, filters) = key
+        order = None
+        if sort_column is not None:
+            order = self.permutation(sort_column)
+            if not ascending:
+                order = order[::-1]
+        mask = self.filter_mask(filters)
+        if mask is None:
+            return order
+        if order is None:
+            return np.flatnonzero(mask)
+        return order[mask[order]]
+
+    def view_indices(self):
+        """
+        Row indices in view order (None for all rows in their original order).
+        While a new view is computed in the background this is the view shown in the browser.
+        """
+        key = self.view_key()
+        if key != self.shown_key and self.view_task is None:
+            self.view = self.compute_view(key)
+            self.shown_key = key
+        return self.view
+
+    def view_count(self):
+        view = self.view_indices()
+        return self.nrows if view is None else len(view)
+
+    def row_indices(self, start, count):
+        "Original row indices for view positions in range(start, start + count) clipped to the view."
+        start = max(0, start)
+        end = min(self.view_count(), start + max(0, count))
+        end = max(start, end)
+        view = self.view_indices()
+        if view is None:
+            return np.arange(start, end)
+        return view[start:end]
+
+    def window_bytes(self, start, count):
+        indices = self.row_indices(start, count)
+        header = dict(start=max(0, start), version=self.version, total=self.view_count(), nrows=self.nrows)
+        return encode_columns(self.columns, indices, header)
+
+    def sort_by(self, column, ascending=True):
+        "Sort the rows by the column name or index (None for the original order)."
+        if column is not None:
+            column = self.column_index(column)
+        self.sort_column = column
+        self.ascending = ascending
+        if self.controller is not None:
+            do(self.controller.show_sort(column, ascending))
+        self.refresh()
+
+    def set_filter(self, column, text):
+        "Filter the rows by the column name or index (an empty text removes the filter)."
+        index = self.column_index(column)
+        text = text.strip() if text else ""
+        if text:
+            self.filters[index] = text
+        else:
+            self.filters.pop(index, None)
+        self.refresh()
+
+    def refresh(self):
+        "Tell the browser to refetch the rows (after the data, sort order or filters changed)."
+        if self.controller is None:
+            self.version += 1
+        elif self.view_key() == self.shown_key:
+            self.send_reset()
+        elif self.view_task is None:
+            self.view_task = schedule_task(self.update_view())
+
+    def send_reset(self):
+        self.version += 1
+        do(self.controller.reset(self.view_count(), self.version, self.nrows))
+
+    async def update_view(self):
+        "Compute views off the event loop until the view matches the sort order and filters."
+        loop = asyncio.get_event_loop()
+        try:
+            key = self.view_key()
+            while key != self.shown_key:
+                columns = self.columns
+                view = await loop.run_in_executor(None, self.compute_view, key)
+                if columns is self.columns:
+                    (self.view, self.shown_key) = (view, key)
+                # the sort order or filters may have changed again meanwhile.
+                key = self.view_key()
+        finally:
+            self.view_task = None
+        if self.controller is not None:
+            self.send_reset()
+
+    def scroll_to(self, position):
+        if self.controller is not None:
+            do(self.controller.scroll_to(position))
+
+    def set_on_row_click(self, callback):
+        "callback(row_index) is called with the index of a clicked row in the original data."
+        self.on_row_click = callback
+
+    def header_clicked(self, index):
+        ascending = True
+        if index == self.sort_column:
+            ascending = not self.ascending
+        self.sort_by(index, ascending)
+
+    def filter_changed(self, index, text):
+        self.set_filter(index, text)
+
+    def row_clicked(self, position):
+        if self.on_row_click is not None:
+            indices = self.row_indices(position, 1)
+            if len(indices):
+                self.on_row_click(int(indices[0]))
+
+    def add_dependencies(self, gizmo):
+        super().add_dependencies(gizmo)
+        gizmo._relative_js(VIRTUAL_STACK_JS)
+        gizmo._relative_js(DATA_GRID_JS)
+        gizmo._initial_reference("H5Gizmos_data_grid")
+
+    def configure_jQuery_element(self, element):
+        super().configure_jQuery_element(element)
+        gizmo = self.gizmo
+        options = dict(
+            columns=self.names,
+            sort_column=self.sort_column,
+            ascending=self.ascending,
+            column_width=self.column_width,
+            count=self.view_count(),
+            nrows=self.nrows,
+            row_height=self.row_height,
+            window_size=self.window_size,
+            overscan=self.overscan,
+            max_windows=self.max_windows,
+            version=self.version,
+        )
+        self.controller = self.cache(
+            "data_grid", gizmo.H5Gizmos_data_grid(element, self.getter_name, options))
+        do(self.controller.set_handlers(self.header_clicked, self.filter_changed, self.row_clicked))
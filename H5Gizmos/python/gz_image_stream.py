@@ -0,0 +1,224 @@
+"""
+A canvas image component for high rate image streams (camera views, live simulations).
+
+The browser long polls a getter for the newest frame, so frames which arrive while the
+browser is busy are skipped (latest frame wins) and are never encoded.  Frames are sent
+as binary HTTP bodies (no base64) in one of the FRAME_FORMATS, encoded in an executor
+thread so the event loop is not blocked, optionally as the changed rectangle only.
+"""
+
+from . import gz_jQuery
+from . import gizmo_server
+import collections
+import asyncio
+import json
+import io
+import numpy as np
+
+IMAGE_STREAM_JS = "GIZMO_STATIC/image_stream.js"
+
+# raw: uint8 gray, RGB or RGBA pixels.  quantized: one byte per pixel, 3-3-2 bit RGB.
+# jpeg and webp: compressed with PIL at the stream quality.
+FRAME_FORMATS = ("raw", "quantized", "jpeg", "webp")
+
+# seconds a frame request waits for a new frame before the browser asks again.
+LONG_POLL_SECONDS = 20
+
+# frames kept to compute changed rectangles against the frame the browser has.
+DELTA_HISTORY = 4
+
+class ImageStreamError(ValueError):
+    "The frame cannot be streamed."
+
+def frame_array(array, scale=False, epsilon=1e-12):
+    "Convert the array to uint8 pixels of shape (h, w), (h, w, 3) or (h, w, 4)."
+    array = np.asarray(array)
+    if array.ndim not in (2, 3) or (array.ndim == 3 and array.shape[2] not in (1, 3, 4)):
+        raise ImageStreamError("Frames should be (h, w), (h, w, 3) or (h, w, 4): " + repr(array.shape))
+    if array.ndim == 3 and array.shape[2] == 1:
+        array = array[:, :, 0]
+    if scale:
+        m = array.min()
+        M = array.max()
+        if (M - m) > epsilon:
+            array = (255 * (array.astype(np.float64) - m) / (M - m)).astype(np.uint8)
+        else:
+            array = np.full(array.shape, 128, dtype=np.uint8)
+    elif array.dtype != np.uint8:
+        array = np.clip(array, 0, 255).astype(np.uint8)
+    return np.ascontiguousarray(array)
+
+def changed_rectangle(old, new):
+    "Return (x, y, w, h) bounding the pixels which differ, or None if the shapes differ."
+    if old.shape != new.shape:
+        return None
+    diff = (old != new)
+    if diff.ndim == 3:
+        diff = diff.any(axis=2)
+    rows = np.flatnonzero(diff.any(axis=1))
+    if not len(rows):
+        return (0, 0, 0, 0)
+    columns = np.flatnonzero(diff.any(axis=0))
+    (y, x) = (int(rows[0]), int(columns[0]))
+    return (x, y, int(columns[-1]) + 1 - x, int(rows[-1]) + 1 - y)
+
+def quantize(pixels):
+    "Pack RGB(A) pixels to one byte each as 3 bits red, 3 bits green, 2 bits blue."
+    return (pixels[:, :, 0] & 0xE0) | ((pixels[:, :, 1] & 0xE0) >> 3) | (pixels[:, :, 2] >> 6)
+
+def encode_pixels(pixels, format, quality):
+    "Return (payload bytes, channels) for the uint8 pixels in the format."
+    channels = 1 if pixels.ndim == 2 else pixels.shape[2]
+    if format == "raw":
+        return (np.ascontiguousarray(pixels).tobytes(), channels)
+    if format == "quantized":
+        if channels == 1:
+            return (np.ascontiguousarray(pixels).tobytes(), 1)
+        return (np.ascontiguousarray(quantize(pixels)).tobytes(), 0)
+    from PIL import Image
+    if format == "jpeg" and channels == 4:
+        pixels = pixels[:, :, :3]  # no alpha in jpeg
+    f = io.BytesIO()
+    Image.fromarray(np.ascontiguousarray(pixels)).save(f, format=format.upper(), quality=quality)
+    return (f.getvalue(), channels)
+
+def encode_frame(seq, pixels, previous, format, quality):
+    """
+    Encode a binary frame: a little endian uint32 header length, the JSON header,
+    then the payload for the rectangle (x, y, w, h) of the full (width, height) frame.
+    If previous pixels of the same size are given only the changed rectangle is sent
+    and the header delta flag is set.
+    """
+    (height, width) = pixels.shape[:2]
+    rectangle = None
+    if previous is not None:
+        rectangle = changed_rectangle(previous, pixels)
+    delta = rectangle is not None
+    if rectangle is None:
+        rectangle = (0, 0, width, height)
+    (x, y, w, h) = rectangle
+    payload = b""
+    channels = 1 if pixels.ndim == 2 else pixels.shape[2]
+    if w and h:
+        (payload, channels) = encode_pixels(pixels[y:y + h, x:x + w], format, quality)
+    header = dict(
+        seq=seq, width=width, height=height, x=x, y=y, w=w, h=h,
+        format=format, channels=channels, delta=delta,
+    )
+    header_bytes = json.dumps(header).encode("utf8")
+    return np.array([len(header_bytes)], dtype="<u4").tobytes() + header_bytes + payload
+
+class FrameGetter(gizmo_server.QueryGetter):
+
+    "Long poll for the newest frame: GET ...?after=SEQ waits for a frame newer than SEQ."
+
+    description = "Frame stream"
+    query_defaults = dict(after=-1)
+
+    async def respond_query(self, values, interface):
+        body = await self.component.next_frame_bytes(values["after"], LONG_POLL_SECONDS)
+        if body is None:
+            # no new frame: the browser asks again.
+            return interface.respond(status=204, headers=self.headers)
+        return self.respond_body(body, interface)
+
+class ImageStream(gz_jQuery.FetchingComponent):
+
+    """
+    A canvas showing a stream of image frames sent by send_frame(array).
+    Arrays are (h, w) gray, (h, w, 3) RGB or (h, w, 4) RGBA, uint8 or scaled if scale is set.
+    format is one of FRAME_FORMATS; quality (1..100) applies to jpeg and webp.
+    With delta set, frames of unchanged size only send the rectangle which changed.
+    send_frame must be called in the gizmo event loop (use loop.call_soon_threadsafe from other threads).
+    """
+
+    getter_class = FrameGetter
+    getter_prefix = "image_frames"
+
+    def __init__(
+        self,
+        array=None,
+        format="raw",
+        quality=80,
+        delta=False,
+        scale=False,
+        height=None,
+        width=None,
+        pixelated=False,
+        title=None,
+        ):
+        if format not in FRAME_FORMATS:
+            raise ImageStreamError("Frame format should be one of %s: %s" % (FRAME_FORMATS, repr(format)))
+        super().__init__(init_text=None, tag="<canvas/>", title=title)
+        self.format = format
+        self.quality = quality
+        self.delta = delta
+        self.scale = scale
+        self.height = height
+        self.width = width
+        self.seq = 0
+        self.pixels = None
+        self.history = collections.OrderedDict()   # seq --> pixels, for changed rectangles
+        self.encoded = {}   # (browser seq, seq) --> future for the encoded frame bytes
+        self.new_frame = None
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        if pixelated:
+            self.css({"image-rendering": "pixelated"})
+        if array is not None:
+            self.send_frame(array)
+
+    def send_frame(self, array):
+        "Show the array as the next frame (frames the browser has not fetched yet are skipped)."
+        pixels = frame_array(array, self.scale)
+        if isinstance(array, np.ndarray) and np.may_share_memory(pixels, array):
+            pixels = pixels.copy()  # the caller may reuse the array for the next frame.
+        self.seq += 1
+        self.pixels = pixels
+        if self.delta:
+            self.history[self.seq] = pixels
+            while len(self.history) > DELTA_HISTORY:
+                self.history.popitem(last=False)
+        self.encoded = {}
+        if self.new_frame is not None:
+            self.new_frame.set()
+            self.new_frame = None
+
+    async def next_frame_bytes(self, after, timeout):
+        "Wait for a frame newer than after and return its encoding, or None on timeout."
+        if self.seq <= after or self.pixels is None:
+            if self.new_frame is None:
+                self.new_frame = asyncio.Event()
+            try:
+                await asyncio.wait_for(self.new_frame.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        seq = self.seq
+        previous = self.history.get(after) if self.delta else None
+        key = (after if previous is not None else None, seq)
+        future = self.encoded.get(key)
+        if future is None:
+            # encode off the event loop, once per (browser frame, frame).
+            loop = asyncio.get_event_loop()
+            future = loop.run_in_executor(
+                None, encode_frame, seq, self.pixels, previous, self.format, self.quality)
+            self.encoded[key] = future
+        result = await future
+        self.frames_sent += 1
+        if after > 0:
+            self.frames_skipped += max(0, seq - after - 1)
+        return result
+
+    def stats(self):
+        return dict(seq=self.seq, sent=self.frames_sent, skipped=self.frames_skipped)
+
+    def add_dependencies(self, gizmo):
+        super().add_dependencies(gizmo)
+        gizmo._relative_js(IMAGE_STREAM_JS)
+        gizmo._initial_reference("H5Gizmos_image_stream")
+
+    def configure_jQuery_element(self, element):
+        super().configure_jQuery_element(element)
+        gizmo = self.gizmo
+        self.resize(height=self.height, width=self.width)
+        self.controller = self.cache("image_stream", gizmo.H5Gizmos_image_stream(element, self.getter_name))
@@ -9,7 +9,9 @@ from .gz_parent_protocol import do, get, schedule_task
 import html
 import io
 import asyncio
+import collections
 import math
+import re
 
 # add Markdown(...)
 # new method jqc.append(other_jqc)
@@ -111,6 +113,7 @@ class jQueryComponent(gz_components.Component):
         self.cached_dom_element_reference = None
         self.class_list = []
         self.event_name_to_callback_and_depth = {}
+        self.static_id = None
 
     def __repr__(self):
         def truncate(x):
@@ -134,15 +137,29 @@ class jQueryComponent(gz_components.Component):
         schedule_task(task())
 
     def set_on_click(self, on_click):
+        old_on_click = self.on_click
         self.on_click = on_click
         if self.element is None:
             return  # not yet configured.
         if on_click is not None:
+            if old_on_click is not None and old_on_click != on_click:
+                do(self.element.off("click"))
+            self.hold_callback(on_click)
             do(self.element.on("click", on_click), to_depth=self.on_click_depth)
         else:
             do(self.element.off("click"))
+        self.release_replaced_callback(old_on_click, on_click)
         return self
 
+    def release_replaced_callback(self, old_callback, new_callback):
+        "Release a callback replaced by new_callback unless another event of this component still uses it."
+        if old_callback is None or old_callback == new_callback:
+            return
+        in_use = [callback for (callback, to_depth) in self.event_name_to_callback_and_depth.values()]
+        in_use.append(self.on_click)
+        if old_callback not in in_use:
+            self.drop_callback(old_callback)
+
     def add_dependencies(self, gizmo):
         super().add_dependencies(gizmo)
         gizmo._relative_css("GIZMO_STATIC/jquery-ui-1.12.1/jquery-ui.css")
@@ -190,6 +207,17 @@ class jQueryComponent(gz_components.Component):
             do(self.get_element().detach())
         self.call_when_started(action)
 
+    def release(self):
+        super().release()
+        # the element is removed from the DOM with the object cache.
+        self.container = None
+        self.element = None
+        self.info_div = None
+        self.cached_dom_element_reference = None
+        # drop the callback references too.
+        self.on_click = None
+        self.event_name_to_callback_and_depth = {}
+
     def enable_tooltips(self):
         "Enable jQueryUI tool tips for the whole gizmo document."
         self.tooltips_enabled = True
@@ -212,22 +240,27 @@ class jQueryComponent(gz_components.Component):
             #("   ... reference is cached", result)
             return result
         super().dom_element_reference(gizmo)
-        self.container = self.cache("container", gizmo.jQuery("<div/>"))
         # Convenience access to jQuery reference:
         self.jQuery = gizmo.jQuery
-        self.element = self.cache("element", gizmo.jQuery(self.tag))
-        self.resize(width=self.width, height=self.height)
-        classes = " ".join(self.class_list)
-        if classes:
-            do(self.element.addClass(classes))
-        css = self.initial_css
-        if css:
-            do(self.element.css(css))
-        if self.init_text:
-            do(self.element.html(self.init_text))
-        if self.title_string:
-            do(self.element.prop("title", self.title_string))
-        do(self.element.appendTo(self.container))
+        if self.rendered_on_server:
+            # The element is already in the page: just find it.
+            self.container = self.cache("container", gizmo.jQuery("#" + self.static_id))
+            self.element = self.cache("element", self.container.children())
+        else:
+            self.container = self.cache("container", gizmo.jQuery("<div/>"))
+            self.element = self.cache("element", gizmo.jQuery(self.tag))
+            self.resize(width=self.width, height=self.height)
+            classes = " ".join(self.class_list)
+            if classes:
+                do(self.element.addClass(classes))
+            css = self.initial_css
+            if css:
+                do(self.element.css(css))
+            if self.init_text:
+                do(self.element.html(self.init_text))
+            if self.title_string:
+                do(self.element.prop("title", self.title_string))
+            do(self.element.appendTo(self.container))
         self.configure_jQuery_element(self.element)
         # handle deferred event callbacks
         # Set on_click after element has been configured -- order important for Button
@@ -240,6 +273,21 @@ class jQueryComponent(gz_components.Component):
         self.cached_dom_element_reference = result
         return result
 
+    def static_html(self):
+        element_html = self.static_element_html()
+        if element_html is None:
+            return None
+        if self.static_id is None:
+            self.static_id = H5Gizmos.new_identifier("gzStatic")
+        size_style = style_attribute(size_css(self.width, self.height))
+        return '<div id="%s"%s>%s</div>' % (self.static_id, size_style, element_html)
+
+    def static_element_html(self):
+        "HTML for the element (without the container), or None."
+        css = dict(self.initial_css)
+        css.update(size_css(self.width, self.height))
+        return static_tag_html(self.tag, self.init_text, self.class_list, css, self.title_string)
+
     def add(self, component, title=None):
         """
         Append a JQuery component after a started gizmo.
@@ -420,19 +468,25 @@ class jQueryComponent(gz_components.Component):
         return self
 
     def on(self, event_name, callback, to_depth=1):
-        "When an event of this type happens to this object, invoke the callback."
-        self.event_name_to_callback_and_depth[event_name] = (callback, to_depth)
+        "When an event of this type happens to this object, invoke the callback (replacing any previous one)."
+        e2c = self.event_name_to_callback_and_depth
+        (old_callback, old_depth) = e2c.get(event_name, (None, None))
+        e2c[event_name] = (callback, to_depth)
         if self.element is not None:
+            if old_callback is not None and old_callback != callback:
+                do(self.element.off(event_name))
+            self.hold_callback(callback)
             do(self.element.on(event_name, callback), to_depth=to_depth)
+            self.release_replaced_callback(old_callback, callback)
         return self
 
     def off(self, event_name):
         "Cancel event callbacks of this type for this object."
         e2c = self.event_name_to_callback_and_depth
-        if event_name in e2c:
-            del e2c[event_name]
+        (old_callback, old_depth) = e2c.pop(event_name, (None, None))
         if self.element is not None:
             do(self.element.off(event_name))
+            self.release_replaced_callback(old_callback, None)
         return self
 
     def empty(self):
@@ -449,6 +503,32 @@ class jQueryComponent(gz_components.Component):
         self.call_when_started(action)
         return self
 
+class FetchingComponent(jQueryComponent):
+
+    """
+    A component whose browser controller fetches its content from a query getter
+    (a gizmo_server.QueryGetter subclass) instead of receiving it in messages.
+    """
+
+    getter_class = None  # defined in subclass
+    getter_prefix = "component_query"
+    getter_name = None
+    controller = None
+
+    def configure_jQuery_element(self, element):
+        super().configure_jQuery_element(element)
+        self.getter_name = H5Gizmos.new_identifier(self.getter_prefix)
+        getter = self.getter_class(self.getter_name, self, self.gizmo._manager)
+        self.add_getter(self.getter_name, getter)
+
+    def release(self):
+        super().release()
+        self.controller = None
+
+    def static_html(self):
+        # The content is only sent on request.
+        return None
+
 class jQueryButton(jQueryComponent):
 
     options = None  # default
@@ -473,13 +553,18 @@ class jQueryButton(jQueryComponent):
         #self.set_on_click(self.on_click) # called in super()
 
     def set_on_click(self, on_click):
+        old_on_click = self.on_click
         self.on_click = on_click
         if self.element is None:
             return  self # not yet configured.
         if on_click is not None:
+            if old_on_click is not None and old_on_click != on_click:
+                do(self.element.off("click"))
+            self.hold_callback(on_click)
             do(self.element.on("click", on_click), to_depth=self.on_click_depth)
         else:
             do(self.element.off("click"))
+        self.release_replaced_callback(old_on_click, on_click)
         enable = (on_click is not None)
         if self.enable_override is not None:
             enable = self.enable_override
@@ -1047,6 +1132,11 @@ class ChildContainerSuper(jQueryComponent):
     def configure_jQuery_element(self, element):
         #(self, "configuring element")
         self.attach_children(self.initial_children)
+
+    def sub_components(self):
+        if self.element is None:
+            return list(self.initial_children)
+        return list(self.children)
         
     def attach_children(self, children):
         raise NotImplementedError("this must be defined in a subclass.")
@@ -1067,6 +1157,9 @@ class Template(ChildContainerSuper):
         super().__init__(init_text=None, tag=html_template, title=title)
         self.empty_targets = empty_targets
 
+    def sub_components(self):
+        return [component for (at_class, component) in self.class_child_pairs]
+
     def put(self, child_component, at_class):
         assert self.gizmo is None, "Cannot attach after gizmo is started."
         assert at_class in self.html_template, "class string not found in template: " + repr(at_class)
@@ -1115,6 +1208,42 @@ class Template(ChildContainerSuper):
             ln = await get(class_ref.length)
             assert ln > 0, "Class ref not found: " + repr(class_ref)
 
+def longest_increasing_subsequence(values):
+    "Return a longest strictly increasing subsequence of the values (as a list)."
+    # patience sorting: tails[k] is the index of the smallest tail of an increasing run of length k+1.
+    tails = []
+    previous = [None] * len(values)
+    for (index, value) in enumerate(values):
+        (low, high) = (0, len(tails))
+        while low < high:
+            middle = (low + high) // 2
+            if values[tails[middle]] < value:
+                low = middle + 1
+            else:
+                high = middle
+        if low > 0:
+            previous[index] = tails[low - 1]
+        if low == len(tails):
+            tails.append(index)
+        else:
+            tails[low] = index
+    result = []
+    index = tails[-1] if tails else None
+    while index is not None:
+        result.append(values[index])
+        index = previous[index]
+    result.reverse()
+    return result
+
+class ChildWrapper:
+
+    "The browser side div holding one container child, with the style last sent for it."
+
+    def __init__(self, name, reference, css):
+        self.name = name
+        self.reference = reference
+        self.css = css
+
 class GridStack(ChildContainerSuper):
 
     default_class = "H5Gizmo-stack"
@@ -1152,34 +1281,134 @@ class GridStack(ChildContainerSuper):
     def listChild(self, seq):
         return GridShelf(seq)
 
+    children_rendered_on_server = False
+    child_wrappers = ()
+    sent_css = None  # container style last sent to the browser
+
+    def static_element_html(self):
+        children = self.initial_children
+        parts = []
+        for (index, child) in enumerate(children):
+            child_html = child.static_html()
+            if child_html is None:
+                return None
+            child_css = self.child_wrapper_css(index)
+            parts.append("<div%s>%s</div>" % (style_attribute(child_css), child_html))
+        css = dict(self.initial_css)
+        css.update(size_css(self.width, self.height))
+        css.update(self.main_css(children))
+        css.update(self._css)
+        return static_tag_html(self.tag, "".join(parts), self.class_list, css, self.title_string)
+
+    def mark_rendered_on_server(self):
+        super().mark_rendered_on_server()
+        self.children_rendered_on_server = True
+        for child in self.initial_children:
+            child.mark_rendered_on_server()
+
     def attach_children(self, children):
+        """
+        Show the new list of children, reconciling it with the children shown now.
+        Children already shown keep their elements (and their state): only the inserts,
+        removals, moves and changed styles are sent to the browser.
+        """
         gizmo = self.gizmo
         assert gizmo is not None, "gizmo must be attached."
-        # detach all current children
-        current_children = self.children
-        if current_children:
-            for child in current_children:
-                child.detach()
-                pass
-        do(self.element.empty())
-        children = self.children = self.check_children(children)
-        # xxxx maybe use child.element?
-        references = [self.child_reference(child, gizmo) for child in children]
+        children = self.check_children(children)
+        child_ids = [id(child) for child in children]
+        assert len(set(child_ids)) == len(child_ids), "A child may only appear once: " + repr(self)
+        if self.children_rendered_on_server:
+            # The initial children are already in place in the page: just bind them.
+            self.children_rendered_on_server = False
+            wrappers = []
+            for (index, child) in enumerate(children):
+                self.child_reference(child, gizmo)
+                name = self.get_cache_name()
+                reference = self.cache(name, child.container.parent())
+                wrappers.append(ChildWrapper(name, reference, self.child_wrapper_css(index)))
+            self.children = children
+            self.child_wrappers = wrappers
+            self.sent_css = self.container_css(children)
+            return
+        old_children = self.children
+        old_wrappers = self.child_wrappers
+        id_to_position = {id(child): position for (position, child) in enumerate(old_children)}
+        # remove the children that are not kept
+        kept = set(child_ids)
+        for (child, wrapper) in zip(old_children, old_wrappers):
+            if id(child) not in kept:
+                # detach (not remove) the child to preserve event handlers for reuse elsewhere.
+                do(wrapper.reference.children().detach())
+                do(wrapper.reference.remove())
+                self.uncache(wrapper.name)
+        css = self.container_css(children)
+        if css != self.sent_css:
+            do(self.element.css(css))
+            self.sent_css = css
+        # Kept children in the longest run of increasing old positions stay in place; others move.
+        old_positions = [id_to_position[i] for i in child_ids if i in id_to_position]
+        stay = set(longest_increasing_subsequence(old_positions))
+        wrappers = [None] * len(children)
+        next_wrapper = None
+        for index in reversed(range(len(children))):
+            child = children[index]
+            child_css = self.child_wrapper_css(index)
+            position = id_to_position.get(id(child))
+            if position is None:
+                wrapper = self.new_child_wrapper(child, child_css)
+                place = True
+            else:
+                wrapper = old_wrappers[position]
+                if wrapper.css != child_css:
+                    do(wrapper.reference.css(child_css))
+                    wrapper.css = child_css
+                place = position not in stay
+            if place:
+                if next_wrapper is None:
+                    do(wrapper.reference.appendTo(self.element))
+                else:
+                    do(wrapper.reference.insertBefore(next_wrapper.reference))
+            wrappers[index] = wrapper
+            next_wrapper = wrapper
+        self.children = children
+        self.child_wrappers = wrappers
+
+    def new_child_wrapper(self, child, child_css):
+        gizmo = self.gizmo
+        name = self.get_cache_name()
+        reference = self.cache(name, gizmo.jQuery("<div/>").css(child_css))
+        childref = self.child_reference(child, gizmo)
+        if childref is not None:
+            do(childref.appendTo(reference))
+        return ChildWrapper(name, reference, child_css)
+
+    def insert_child(self, child, index=None):
+        "Insert the child at index (default at the end)."
+        children = list(self.children)
+        if index is None:
+            index = len(children)
+        children.insert(index, child)
+        self.attach_children(children)
+
+    def remove_child(self, child):
+        children = [c for c in self.children if c is not child]
+        self.attach_children(children)
+
+    def move_child(self, child, index):
+        children = [c for c in self.children if c is not child]
+        assert len(children) < len(self.children), "Not a child: " + repr(child)
+        children.insert(index, child)
+        self.attach_children(children)
+
+    def container_css(self, children):
         css = self.main_css(children)
-        #css.update(self.element_css_defaults)
         css.update(self._css)
-        do(self.element.css(css))
-        for (index, childref) in enumerate(references):
-            child_css = self.element_css(index)
-            #child_css.update(self.child_css_defaults)
-            child_css.update(self.child_css)
-            child_container = gizmo.jQuery("<div/>").css(child_css).appendTo(self.element)
-            if childref is not None:
-                #("appending", childref)
-                do(childref.appendTo(child_container))
-            else:
-                #do(child_container)  # ???? is this needed?
-                pass
+        return css
+
+    def child_wrapper_css(self, index):
+        child_css = self.element_css(index)
+        child_css.update(self.child_css)
+        return child_css
 
     def main_css(self, children):
         row_template = "auto"
@@ -1301,6 +1530,7 @@ class LazyExpander(Template):
         self.is_open = auto_open
         #self.toggle_text = ClickableText(self.more_text, "open", on_click=self.toggle)
         self.content_area = Html("<div/>")
+        self.content = None
         self.put(self.toggle_text, 'TOGGLE')
         self.put(self.content_area, "CONTENT")
 
@@ -1332,9 +1562,20 @@ class LazyExpander(Template):
             content = self.preview_maker()
         self.toggle_text.html(txt)
         content_element = self.content_area.get_element(gizmo)
+        old_content = self.content
+        self.content = content
+        if old_content is not None:
+            # discard the replaced content and everything it holds.
+            old_content.destroy()
         do(content_element.empty())
         do(content.get_element(gizmo).appendTo(content_element))
 
+    def sub_components(self):
+        result = super().sub_components()
+        if self.content is not None:
+            result.append(self.content)
+        return result
+
 
 SMALL_PNG_BYTES = (
     b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x01\x03\x00\x00'
@@ -1487,12 +1728,20 @@ class jQueryImage(jQueryComponent):
         assert result is not None, "getter not created."
         return result
 
+    def release(self):
+        super().release()
+        self.pixel_click_callbacks = {}
+
+    def static_html(self):
+        # The image content is not served until the element is configured.
+        return None
+
     def configure_jQuery_element(self, element):
         gizmo = self.gizmo
         mgr = gizmo._manager
         self._getter = gizmo_server.BytesGetter(self.filename, self.bytes_content, mgr, self.content_type)
         #mgr.add_http_handler(self.filename, self.getter)
-        gizmo._add_getter(self.filename, self._getter)
+        self.add_getter(self.filename, self._getter)
         self.resize(height=self.height, width=self.width)
         if self.array is not None:
             self.change_array(self.array, scale=self.scaled)
@@ -1504,13 +1753,33 @@ def content_url(bytes_content, mime_type):
     url = prefix + b64.decode("utf8")
     return url
 
+_plot_executor = None
+
+def plot_executor():
+    "The single thread used for background plot rendering (renders run one at a time)."
+    global _plot_executor
+    if _plot_executor is None:
+        import concurrent.futures
+        _plot_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="gizmo_plot")
+    return _plot_executor
+
+def figure_png(figure):
+    figfile = io.BytesIO()
+    figure.savefig(figfile, format='png')
+    return figfile.getvalue()
+
 class Plotter(jQueryImage):
 
     """
     Context manager to capture matplotlib output.
+
+    With background=True the figure is rendered to PNG in a worker thread instead of in the
+    event loop, and renders which are superseded by a newer plot before they start are dropped
+    (only the latest plot is shown).  With cache_size > 0, plot(draw, key) remembers the
+    rendered PNG for the last cache_size keys and shows a remembered plot without drawing it.
     """
 
-    def __init__(self, alt="matplotlib plot"):
+    def __init__(self, alt="matplotlib plot", background=False, cache_size=0):
         super().__init__(
             filename=None,
             bytes_content=SMALL_PNG_BYTES,  # initial default
@@ -1518,22 +1787,81 @@ class Plotter(jQueryImage):
             alt=alt
         )
         self.png_content = None
+        self.background = background
+        self.cache_size = cache_size
+        self.png_cache = collections.OrderedDict()  # key --> png bytes, least recently used first
+        self.generation = 0         # number of the latest plot requested
+        self.shown_generation = 0   # number of the plot shown
+        self.pending_render = None  # (generation, figure, key) waiting for the render thread
+        self.render_task = None
 
     def __enter__(self):
         pass
 
     def __exit__(self, type, value, traceback):
-        # https://stackoverflow.com/questions/47816175/pandas-dataframe-and-seaborn-graph-interaction-with-html-webpage
-        import matplotlib.pyplot as plt
         if type is None:
             # no error
-            figfile = io.BytesIO()
-            plt.savefig(figfile, format='png')
-            figfile.seek(0)
-            figbytes = figfile.getvalue()
-            self.change_content_url(figbytes, mime_type="image/png")
-            plt.close()  # don't display the figure anywhere else (?)
-            self.png_content = figbytes
+            self.capture_figure()
+
+    def capture_figure(self, key=None):
+        "Show the current matplotlib figure (and remember it under the key if the cache is enabled)."
+        # https://stackoverflow.com/questions/47816175/pandas-dataframe-and-seaborn-graph-interaction-with-html-webpage
+        import matplotlib.pyplot as plt
+        figure = plt.gcf()
+        self.generation += 1
+        if not self.background:
+            figbytes = figure_png(figure)
+            plt.close(figure)  # don't display the figure anywhere else (?)
+            self.show_png(figbytes, self.generation, key)
+            return
+        # detach the figure from pyplot so the next plot can start while this one renders.
+        plt.close(figure)
+        # a plot still waiting for the render thread is superseded and never rendered.
+        self.pending_render = (self.generation, figure, key)
+        if self.render_task is None:
+            self.render_task = schedule_task(self.render_pending())
+
+    async def render_pending(self):
+        loop = asyncio.get_event_loop()
+        try:
+            while self.pending_render is not None:
+                (generation, figure, key) = self.pending_render
+                self.pending_render = None
+                figbytes = await loop.run_in_executor(plot_executor(), figure_png, figure)
+                self.show_png(figbytes, generation, key)
+        finally:
+            self.render_task = None
+
+    def show_png(self, figbytes, generation, key=None):
+        if key is not None and self.cache_size:
+            cache = self.png_cache
+            cache[key] = figbytes
+            cache.move_to_end(key)
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        if generation < self.shown_generation or generation < self.generation:
+            # a newer plot was requested while this one rendered.
+            return
+        self.shown_generation = generation
+        self.change_content_url(figbytes, mime_type="image/png")
+        self.png_content = figbytes
+
+    def plot(self, draw, key=None):
+        """
+        Call draw() to make a matplotlib plot and show it.
+        If the key (for example the tuple of parameters for the plot) was plotted recently
+        and the cache is enabled the remembered plot is shown without calling draw.
+        """
+        if key is not None:
+            figbytes = self.png_cache.get(key)
+            if figbytes is not None:
+                self.png_cache.move_to_end(key)
+                self.generation += 1
+                self.pending_render = None
+                self.show_png(figbytes, self.generation)
+                return
+        draw()
+        self.capture_figure(key)
 
 def show_matplotlib_plt(link=False, title="Plot"):
     """
@@ -1625,6 +1953,72 @@ def ClickableText(content, title=None, on_click=None, color="blue"):
     return result
 
 # utilities
+
+# Elements which have no content or end tag.
+VOID_ELEMENTS = frozenset("area base br col embed hr img input link meta source track wbr".split())
+
+START_TAG_PATTERN = re.compile(
+    r"""^<([A-Za-z][\w:-]*)((?:\s+[^\s/>=]+(?:\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>]+))?)*)\s*(/?)>""")
+
+# CSS properties which jQuery does not give a "px" unit for numeric values.
+UNITLESS_CSS = frozenset(
+    "column-count fill-opacity flex-grow flex-shrink font-weight line-height opacity order orphans widows z-index zoom".split())
+
+def css_property_text(name, value):
+    # jQuery accepts camelCase names and adds px to plain numbers.
+    name = re.sub("([A-Z])", lambda m: "-" + m.group(1).lower(), name)
+    if type(value) in (int, float) and name not in UNITLESS_CSS:
+        value = "%spx" % value
+    return "%s: %s" % (name, value)
+
+def size_css(width=None, height=None):
+    css = {}
+    if width is not None:
+        css["width"] = width
+    if height is not None:
+        css["height"] = height
+    return css
+
+def style_attribute(css):
+    if not css:
+        return ""
+    text = "; ".join(css_property_text(name, value) for (name, value) in css.items())
+    return ' style="%s"' % html.escape(text, quote=True)
+
+def static_tag_html(tag, content, classes, css, title):
+    """
+    HTML for a jQuery tag string like "<div/>" with content, classes, styles and title added,
+    or None if the tag is too complex to render statically.
+    """
+    match = START_TAG_PATTERN.match(tag)
+    if match is None:
+        return None
+    (name, attributes, slash) = match.groups()
+    rest = tag[match.end():]
+    void = name.lower() in VOID_ELEMENTS
+    empty = bool(slash or void)
+    if empty and rest.strip():
+        return None
+    if content and (void or not (empty or rest.strip().lower() == "</%s>" % name.lower())):
+        return None
+    added = []
+    for (attribute, value) in [("class", " ".join(classes)), ("style", style_attribute(css)), ("title", title)]:
+        if not value:
+            continue
+        if re.search(r"\s%s\s*=" % attribute, attributes, re.IGNORECASE):
+            # merging with an existing attribute is not supported.
+            return None
+        if attribute == "style":
+            added.append(value)
+        else:
+            added.append(' %s="%s"' % (attribute, html.escape(value, quote=True)))
+    start = "<%s%s%s>" % (name, attributes, "".join(added))
+    if void:
+        return start
+    if empty or content:
+        return "%s%s</%s>" % (start, content or "", name)
+    return start + rest
+
 def html_escape(txt, break_spaces=False):
     "Escape html with option to not break spaces."
     result = html.escape(txt)
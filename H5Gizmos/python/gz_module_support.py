@@ -90,6 +90,15 @@ class Module_context:
             set_references="\n".join(set_references),
         )
 
+    def module_preload_html(self):
+        "modulepreload hints for loaded modules so the browser fetches them in parallel."
+        links = []
+        for param in sorted(self.parameter_to_identifier):
+            url = self.import_mapping.get(param, param)
+            if url.startswith(("./", "../", "/", "http:", "https:")):
+                links.append('<link rel="modulepreload" href="%s"/>' % (url,))
+        return "\n".join(links)
+
     def get_import_map_json(self):
         return {"imports": self.import_mapping}
     
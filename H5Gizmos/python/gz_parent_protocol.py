@@ -124,6 +124,7 @@ class Gizmo:
         self._default_depth = default_depth
         self._call_backs = {}
         self._callable_to_oid = {}
+        self._callback_holders = {}   # callable --> number of components holding it (see Component.destroy)
         self._counter = 0
         self._oid_to_get_futures = {}
         self._initial_references = {}
@@ -191,6 +192,8 @@ class Gizmo:
             identifier=self._identifier,
             log_messages=self._log_messages,
             )
+        if os.environ.get(gz_resources.BUNDLE_ENV_VAR):
+            handler.bundler = gz_resources.ResourceBundler(mgr)
         mgr.add_http_handler(filename, handler)
         self._js_file("../../H5Gizmos/js/H5Gizmos.js")
         #self._entry_url = mgr.local_url(for_gizmo=self, method="http", filename=filename)
@@ -628,7 +631,25 @@ class Gizmo:
         o2f = self._oid_to_get_futures
         self._oid_to_get_futures = {}
         for fut in o2f.values():
-            fut.set_exception(exception)
+            if not fut.done():
+                fut.set_exception(exception)
+
+    _polling_exceptions = True
+    _torn_down = False
+
+    def _teardown(self, reason="Gizmo session closed."):
+        """
+        Release callbacks, pending gets and background tasks
+        so the gizmo and its resources can be garbage collected.
+        """
+        self._torn_down = True
+        self._keep_heart_beating = False
+        self._polling_exceptions = False
+        self._fail_all_gets(WebSocketIsClosed(reason))
+        self._call_backs.clear()
+        self._callable_to_oid.clear()
+        self._callback_holders.clear()
+        self._html_page = None
 
     def _resolve_get(self, payload):
         [oid, json_value] = payload
@@ -693,7 +714,7 @@ class Gizmo:
             print("Aborting redundant exception polling task.")
             raise RuntimeError("Exception loop seems already to be running.")
         count = 0
-        while (limit is None) or (count < limit):
+        while self._polling_exceptions and ((limit is None) or (count < limit)):
             #("DEBUG:: polling for exceptions", count)
             count += 1
             self._exception_loop_test_flag = True
@@ -1369,6 +1390,7 @@ class GZPipeline:
         self.last_receive_error = None
         self.ws_error_message = None
         self.reconnect_id = None
+        self.last_activity = time.time()
         self.clear()
 
     def check_last_flush_queue_task(self):
@@ -1458,8 +1480,20 @@ class GZPipeline:
             await self._send(chunk)
         await self.listen_to_websocket(ws)
 
+    def is_connected(self):
+        ws = self.web_socket
+        return (ws is not None) and not ws.closed
+
+    async def close(self, code=aiohttp.WSCloseCode.GOING_AWAY, message=b"Gizmo session closed."):
+        ws = self.web_socket
+        if ws is not None and not ws.closed:
+            await ws.close(code=code, message=message)
+        self.packer.cancel_all_flushes()
+        self.waiting_chunks = []
+
     async def sender(self, data):
         #p("   sender", repr(data[:20]))
+        self.last_activity = time.time()
         await self.web_socket.send_str(data)
         # after every send, give the other side a chance to send (?)
         await self.web_socket.drain()
@@ -1477,6 +1511,7 @@ class GZPipeline:
         ##pr("listening to", ws)
         async for msg in ws:
             assert not got_exception, "Web socket should terminate after an exception."
+            self.last_activity = time.time()
             typ = msg.type
             #pr("got message", typ, msg.data)
             if typ == self.MSG_TYPE_TEXT:
@@ -1,15 +1,72 @@
-
 from . import gz_jQuery
 from .gz_parent_protocol import do, get, schedule_task
+import numpy as np
+
+# dtypes sent to plotly as javascript typed arrays unchanged; other numeric columns are sent as float64
+# (plotly cannot plot BigInt64Array values).
+PLOTLY_TYPED_DTYPES = ("int8", "uint8", "int32", "uint32", "float32", "float64")
+
+def plotly_column(values):
+    """
+    Convert a 1d numeric column (numpy array or list of numbers) to a numpy array
+    which is sent as a javascript typed array.  Other values are returned unchanged.
+    """
+    if isinstance(values, list):
+        if not values or not all(type(x) in (int, float) for x in values):
+            return values
+        return np.array(values, dtype=np.float64)
+    if isinstance(values, np.ndarray) and values.ndim == 1 and values.dtype.kind in "iufb":
+        if values.dtype.name not in PLOTLY_TYPED_DTYPES:
+            values = values.astype(np.float64)
+        return np.ascontiguousarray(values)
+    return values
+
+# trace attributes (dotted for nested ones) which hold numeric data arrays.  Other attributes
+# like text, ids, selectedpoints or customdata are sent as given.
+PLOTLY_DATA_KEYS = set("x y z open high low close values marker.color marker.size".split())
+
+def plotly_attribute(path, value):
+    "Convert the value of the (dotted) trace attribute path if it is a data array."
+    if path in PLOTLY_DATA_KEYS:
+        return plotly_column(value)
+    return value
+
+def plotly_trace(trace, prefix=""):
+    "Convert the data array columns of a trace dictionary (including nested ones like marker.color)."
+    result = {}
+    for (key, value) in trace.items():
+        path = prefix + key
+        if isinstance(value, dict):
+            value = plotly_trace(value, path + ".")
+        else:
+            value = plotly_attribute(path, value)
+        result[key] = value
+    return result
+
+def extension_column(key, values):
+    "New points for Plot.extend: a flat array for data array keys, otherwise a list."
+    if key in PLOTLY_DATA_KEYS:
+        return np.asarray(values).ravel()
+    return list(values)
+
+def plotly_traces(data):
+    if isinstance(data, dict):
+        return plotly_trace(data)
+    return [plotly_trace(trace) if isinstance(trace, dict) else trace for trace in data]
 
 class Plot(gz_jQuery.jQueryComponent):
 
+    """
+    A plotly.js plot of the data traces with the layout and config.
+    Use update to change the plot in place and extend to stream new points into traces.
+    """
+
     def __init__(self, data, layout=None, config=None, width=None, height=None, title=None):
         super().__init__(title=title)
         data = data or {}
         config = config or {}
         self.resize(width, height)
-        self.plotly_data = data
+        self.plotly_data = plotly_traces(data)
         self.plotly_layout = layout
         self.plotly_config = config
 
@@ -26,8 +83,61 @@ class Plot(gz_jQuery.jQueryComponent):
         assert self.element is not None
         do(self.element.empty())
         do(gizmo.Plotly.newPlot(
-            self.element[0], 
-            self.plotly_data, 
-            self.plotly_layout, 
+            self.element[0],
+            self.plotly_data,
+            self.plotly_layout,
             self.plotly_config))
-        return result
\ No newline at end of file
+        return result
+
+    def update(self, data=None, layout=None, config=None):
+        "Change the plot in place using Plotly.react (None arguments are unchanged)."
+        if data is not None:
+            self.plotly_data = plotly_traces(data)
+        if layout is not None:
+            self.plotly_layout = layout
+        if config is not None:
+            self.plotly_config = config
+        if self.element is not None:
+            do(self.gizmo.Plotly.react(
+                self.element[0],
+                self.plotly_data,
+                self.plotly_layout,
+                self.plotly_config))
+
+    def extend(self, traces, max_points=None):
+        """
+        Append points to traces using Plotly.extendTraces, only sending the new points.
+        traces maps trace indices to dictionaries of new column values, for example
+            plot.extend({0: dict(x=[t], y=[v0]), 1: dict(x=[t], y=[v1])}, max_points=1000)
+        All the traces must extend the same columns.  With max_points only the last
+        max_points points of each trace are kept.
+        """
+        indices = sorted(traces)
+        keys = set(traces[indices[0]]) if indices else set()
+        for index in indices:
+            assert set(traces[index]) == keys, "Extended traces must have the same columns: " + repr(traces)
+        columns = {index: {key: extension_column(key, values) for (key, values) in traces[index].items()} for index in indices}
+        # keep the Python side copy of the data up to date for later redraws.
+        data = self.plotly_data
+        if isinstance(data, dict):
+            assert indices == [0], "Only trace 0 of a single trace plot can be extended: " + repr(indices)
+            data = [data]
+        for index in indices:
+            trace = data[index]
+            for (key, values) in columns[index].items():
+                old = trace.get(key)
+                if old is None:
+                    combined = values
+                elif key in PLOTLY_DATA_KEYS:
+                    combined = np.concatenate([np.asarray(old), values])
+                else:
+                    combined = list(old) + values
+                if max_points is not None:
+                    combined = combined[-max_points:]
+                trace[key] = plotly_attribute(key, combined)
+        if self.element is not None:
+            update = {key: [plotly_attribute(key, columns[index][key]) for index in indices] for key in sorted(keys)}
+            if max_points is None:
+                do(self.gizmo.Plotly.extendTraces(self.element[0], update, indices))
+            else:
+                do(self.gizmo.Plotly.extendTraces(self.element[0], update, indices, max_points))
@@ -4,6 +4,18 @@ HTML/HTTP Resource access, such as javascript scripts and CSS files.
 
 from . import gizmo_server
 import os
+import contextlib
+import re
+import hashlib
+
+# Set to a non-empty value to emit <link rel=preload> hints for page scripts and styles.
+PRELOAD_ENV_VAR = "GIZMO_PRELOAD_HINTS"
+
+# Set to a non-empty value to combine local page scripts and style sheets into bundles.
+BUNDLE_ENV_VAR = "GIZMO_BUNDLE"
+
+# Bytes of bundle files kept in the cache folder (least recently used bundles are removed).
+BUNDLE_CACHE_BYTES = 1 << 26
 
 my_dir = os.path.dirname(__file__)
 
@@ -62,9 +74,18 @@ class HTMLPage(DelegatePOSTtoGETMixin):
         embed_gizmo=True, 
         template=None, 
         message_delay=1000, # milliseconds
-        identifier=None
+        identifier=None,
+        preload_hints=None,
+        bundler=None,
         ):
         self.identifier = identifier or title
+        if preload_hints is None:
+            preload_hints = bool(os.environ.get(PRELOAD_ENV_VAR))
+        self.preload_hints = preload_hints
+        # optional ResourceBundler combining local head scripts and style sheets
+        self.bundler = bundler
+        # cached (bytes, etag, gzip bytes or None) for the rendered page
+        self.rendered = None
         self.message_delay = message_delay
         self.log_messages = log_messages
         #self.ws_url = ws_url
@@ -84,16 +105,44 @@ class HTMLPage(DelegatePOSTtoGETMixin):
     def link_reference(self, identity, js_expression):
         assert self.embed_gizmo, "Embed gizmo must be enabled for standard link references."
         self.ref_id_and_js_expression.append([identity, js_expression])
+        self.rendered = None
 
     async def handle_get(self, info, request, interface=None):
         interface = interface or gizmo_server.STDInterface
-        bytes = self.as_string().encode("utf-8")
+        (bytes, etag, gzipped) = self.render()
         self.materialized = True
-        return interface.respond(body=bytes, content_type="text/html")
+        gizmo_server.startup_mark("entry page served")
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if etag_matches(request, etag):
+            return interface.respond(status=304, headers=headers)
+        content_type = "text/html"
+        if gzipped is not None and gizmo_server.negotiate_encoding(request, content_type, ["gzip"]):
+            headers["Content-Encoding"] = "gzip"
+            bytes = gzipped
+        return interface.respond(body=bytes, content_type=content_type, headers=headers)
+
+    def render(self):
+        "Return (bytes, etag, gzip bytes or None) for the page, rendering only if the page changed."
+        rendered = self.rendered
+        if rendered is None:
+            bytes = self.as_string().encode("utf-8")
+            etag = '"%s"' % hashlib.sha1(bytes).hexdigest()
+            gzipped = None
+            if len(bytes) >= gizmo_server.COMPRESSION_MIN_SIZE:
+                gzipped = gizmo_server.compress_bytes(bytes, "gzip")
+            rendered = self.rendered = (bytes, etag, gzipped)
+        return rendered
 
     def as_string(self):
         template = self.template
-        head_string = self.resource_strings(self.head_resources)
+        head_resources = self.head_resources
+        if self.bundler is not None:
+            head_resources = self.bundler.bundle(head_resources)
+        head_string = self.resource_strings(head_resources)
+        if self.preload_hints:
+            hints = self.preload_strings(head_resources + self.body_resources)
+            if hints:
+                head_string = "%s\n%s" % (hints, head_string)
         body_string = self.resource_strings(self.body_resources)
         if self.embed_gizmo:
             #std_init = standard_embedded_initialization_code(self.ref_id_and_js_expression)
@@ -105,15 +154,23 @@ class HTMLPage(DelegatePOSTtoGETMixin):
 
     def add_head_resource(self, resource):
         self.head_resources.append(resource)
+        self.rendered = None
 
     def add_body_resource(self, resource):
         self.body_resources.append(resource)
+        self.rendered = None
 
     def resource_strings(self, resource_list):
         embeddings = [resource.html_embedding() for resource in resource_list]
         embed_list = [x for x in embeddings if x is not None]
         return "\n".join(embed_list)
 
+    def preload_strings(self, resource_list):
+        "Preload hints so the browser fetches all scripts and styles in parallel."
+        hints = [resource.preload_hint() for resource in resource_list]
+        hint_list = [x for x in hints if x is not None]
+        return "\n".join(hint_list)
+
     def remote_js(self, url, in_body=False, init=None):
         if init is None:
             init = RemoteJavascript
@@ -193,6 +250,22 @@ PIPELINE_WEBSOCKET_TEMPLATE = """
         tr.pipeline_websocket({ws_url})
 """
 
+def etag_matches(request, etag):
+    "Test whether the request If-None-Match header matches the etag."
+    headers = getattr(request, "headers", None)
+    if not headers:
+        return False
+    header = headers.get("If-None-Match")
+    if not header:
+        return False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == "*" or tag == etag:
+            return True
+    return False
+
 class Resource:
 
     "Superclass for resources."
@@ -200,6 +273,9 @@ class Resource:
     def html_embedding(self):
         return None
 
+    def preload_hint(self):
+        return None
+
     #def configure_in_gizmo_manager(self):  # xxxx not used ???
     #    "Configure the GizmoManager to serve this resource if needed."
     #    return None
@@ -220,11 +296,17 @@ class RemoteJavascript(Resource):
     def html_embedding(self):
         return '<script src="%s"></script>' % (self.url,)
 
+    def preload_hint(self):
+        return '<link rel="preload" href="%s" as="script"/>' % (self.url,)
+
 class RemoteCSS(RemoteJavascript):
 
     def html_embedding(self):
         return '<link rel="stylesheet" href="%s"/>' % (self.url,)
 
+    def preload_hint(self):
+        return '<link rel="preload" href="%s" as="style"/>' % (self.url,)
+
 
 HTML_EMBED_SCRIPT_TEMPLATE = """
 <script>
@@ -264,3 +346,205 @@ class InsertHTML(Resource):
     def html_embedding(self):
         return self.text
 
+
+
+def cache_folder():
+    "Folder for files cached across process restarts, like ~/.cache/H5Gizmos."
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "H5Gizmos")
+
+def minify_javascript(text):
+    "Minify if rjsmin is installed, otherwise return the text unchanged."
+    try:
+        import rjsmin
+    except ImportError:
+        return text
+    return rjsmin.jsmin(text)
+
+def minify_css(text):
+    "Minify if rcssmin is installed, otherwise return the text unchanged."
+    try:
+        import rcssmin
+    except ImportError:
+        return text
+    return rcssmin.cssmin(text)
+
+CSS_URL_PATTERN = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+def rebase_css_urls(text, url):
+    "Make relative url(...) references in a style sheet from url work from the page folder."
+    folder = url.rsplit("/", 1)[0] if "/" in url else "."
+    def rebase(match):
+        (quote, target) = match.groups()
+        if target.startswith(("data:", "http:", "https:", "/", "#")):
+            return match.group(0)
+        return "url(%s%s/%s%s)" % (quote, folder, target, quote)
+    return CSS_URL_PATTERN.sub(rebase, text)
+
+class ResourceBundler:
+
+    """
+    Combine runs of local scripts and style sheets in the page head into single
+    content hashed files to reduce the number of requests needed to start the page.
+    Bundles are cached on disk keyed by the source paths and modification times,
+    keeping at most max_bytes of the most recently used bundles.
+    """
+
+    def __init__(self, mgr, folder=None, minify=True, max_bytes=BUNDLE_CACHE_BYTES):
+        self.mgr = mgr
+        if folder is None:
+            folder = cache_folder()
+        self.folder = folder
+        self.minify = minify
+        self.max_bytes = max_bytes
+        # last bundle statistics: number of sources combined and number of bundles
+        self.sources_bundled = 0
+        self.bundles_served = 0
+
+    def local_path(self, url):
+        "File system path for a relative url served from a file, or None."
+        if not url.startswith("./") and "://" in url:
+            return None
+        if url.startswith("./"):
+            url = url[2:]
+        components = url.split("/")
+        handler = self.mgr.filename_to_http_handler.get(components[0])
+        fs_path = getattr(handler, "fs_path", None)
+        if fs_path is None:
+            return None
+        if isinstance(handler, gizmo_server.FolderGetter):
+            if len(components) < 2:
+                return None
+            fs_path = "/".join([fs_path] + components[1:])
+        elif len(components) > 1:
+            return None
+        if not os.path.isfile(fs_path):
+            return None
+        return fs_path
+
+    def bundle(self, resources):
+        "Return resources with runs of local scripts and runs of local style sheets bundled."
+        result = list(resources)
+        for kind in ("css", "js"):
+            result = self.bundle_runs(result, kind)
+        return result
+
+    def bundle_runs(self, resources, kind):
+        # Resources which do not affect the ordering of this kind stay in place
+        # and the bundle for a run goes where the first member of the run was.
+        result = []
+        run = []
+        run_index = None
+        for resource in resources:
+            resource_kind = self.bundle_kind(resource)
+            if resource_kind == kind:
+                if not run:
+                    run_index = len(result)
+                run.append(resource)
+                continue
+            if run and self.breaks_run(resource, kind):
+                result[run_index:run_index] = self.bundle_run(run, kind)
+                run = []
+            result.append(resource)
+        if run:
+            result[run_index:run_index] = self.bundle_run(run, kind)
+        return result
+
+    def breaks_run(self, resource, kind):
+        if isinstance(resource, InsertHTML):
+            return True
+        if kind == "css":
+            return isinstance(resource, (RemoteCSS, EmbeddedStyle))
+        return isinstance(resource, EmbeddedScript) or type(resource) is RemoteJavascript
+
+    def bundle_kind(self, resource):
+        if type(resource) not in (RemoteJavascript, RemoteCSS):
+            return None
+        if self.local_path(resource.url) is None:
+            return None
+        if type(resource) is RemoteCSS:
+            return "css"
+        return "js"
+
+    def bundle_run(self, run, kind):
+        if len(run) < 2:
+            return run
+        sources = [(r.url, self.local_path(r.url)) for r in run]
+        (filename, path, content) = self.bundle_content(sources, kind)
+        self.sources_bundled += len(sources)
+        self.bundles_served += 1
+        if filename not in self.mgr.filename_to_http_handler:
+            content_type = "text/css" if kind == "css" else "text/javascript"
+            if path is not None:
+                self.mgr.add_file(path, filename, content_type=content_type)
+            else:
+                getter = gizmo_server.BytesGetter(filename, content, self.mgr, content_type)
+                self.mgr.add_http_handler(filename, getter)
+        init = RemoteCSS if kind == "css" else RemoteJavascript
+        return [init("./" + filename)]
+
+    def bundle_content(self, sources, kind):
+        "Return (filename, cached path or None, bytes) for the bundle of (url, path) sources."
+        key_parts = [kind, repr(self.minify)]
+        for (url, path) in sources:
+            key_parts.append("%s %s %s %s" % (url, path, os.path.getmtime(path), os.path.getsize(path)))
+        key = hashlib.sha1("\n".join(key_parts).encode("utf-8")).hexdigest()
+        index_path = os.path.join(self.folder, "bundle_%s.%s" % (key, kind))
+        if os.path.isfile(index_path):
+            with open(index_path, "rb") as f:
+                content = f.read()
+            # mark the bundle as recently used.
+            with contextlib.suppress(OSError):
+                os.utime(index_path)
+        else:
+            content = self.combine(sources, kind)
+            if os.path.isdir(self.folder) or self.make_folder():
+                gizmo_server.write_sibling(index_path, content)
+                self.remove_stale_bundles(keep=index_path)
+        if not os.path.isfile(index_path):
+            index_path = None
+        digest = hashlib.sha1(content).hexdigest()[:16]
+        filename = "gizmo_bundle_%s.%s" % (digest, kind)
+        return (filename, index_path, content)
+
+    def remove_stale_bundles(self, keep=None):
+        "Remove the least recently used bundle files beyond max_bytes (except keep)."
+        entries = []
+        with contextlib.suppress(OSError):
+            for filename in os.listdir(self.folder):
+                if filename.startswith("bundle_") and filename.endswith((".js", ".css")):
+                    path = os.path.join(self.folder, filename)
+                    with contextlib.suppress(OSError):
+                        entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+        total = sum(size for (mtime, size, path) in entries)
+        for (mtime, size, path) in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            with contextlib.suppress(OSError):
+                os.remove(path)
+                total -= size
+
+    def make_folder(self):
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+        except OSError:
+            return False
+        return True
+
+    def combine(self, sources, kind):
+        texts = []
+        for (url, path) in sources:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            if kind == "css":
+                text = rebase_css_urls(text, url)
+                if self.minify:
+                    text = minify_css(text)
+            elif self.minify:
+                text = minify_javascript(text)
+            texts.append("/* %s */\n%s" % (url, text))
+        # semicolons protect against scripts which omit a final semicolon.
+        separator = "\n" if kind == "css" else "\n;\n"
+        return separator.join(texts).encode("utf-8")
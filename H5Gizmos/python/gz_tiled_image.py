@@ -0,0 +1,231 @@
+"""
+A deep zoom image viewer for very large 2 dimensional arrays (mosaics, slides, maps).
+
+The browser only loads the tiles covering the view at the resolution being shown.
+Lower resolution levels of the image pyramid are strided views of the array, so no
+downsampled copies are made and memory mapped arrays are only read where a tile is needed.
+Encoded tiles are kept in a least recently used cache and the neighbors of requested
+tiles are encoded ahead of time in an executor thread.
+"""
+
+from . import gz_jQuery
+from . import gizmo_server
+from . import gz_parent_protocol as H5Gizmos
+from .gz_parent_protocol import do
+import collections
+import asyncio
+import io
+import numpy as np
+
+TILED_IMAGE_JS = "GIZMO_STATIC/tiled_image.js"
+
+# array values sampled to choose the display range of non uint8 arrays.
+RANGE_SAMPLES = 1000000
+
+class TiledImageError(ValueError):
+    "The array cannot be shown as a tiled image."
+
+def pyramid_levels(height, width, tile_size):
+    "Number of pyramid levels: level L samples every 2**L pixels and the last level fits in one tile."
+    levels = 1
+    while max(height, width) > tile_size * 2 ** (levels - 1):
+        levels += 1
+    return levels
+
+def estimate_value_range(array):
+    "Estimate (low, high) display values from a strided sample of the array."
+    (height, width) = array.shape[:2]
+    step = max(1, int(np.sqrt(height * width / RANGE_SAMPLES)))
+    sample = np.asarray(array[::step, ::step])
+    return (float(np.nanmin(sample)), float(np.nanmax(sample)))
+
+def tile_pixels(array, level, tx, ty, tile_size, low=None, high=None):
+    "The uint8 pixels of tile (tx, ty) at the level, scaled from low..high if given."
+    stride = 2 ** level
+    span = tile_size * stride
+    (y0, x0) = (ty * span, tx * span)
+    pixels = np.asarray(array[y0: y0 + span: stride, x0: x0 + span: stride])
+    if low is not None:
+        scale = 255.0 / (high - low) if high > low else 0.0
+        pixels = np.clip((pixels.astype(np.float64) - low) * scale, 0, 255)
+        pixels = np.nan_to_num(pixels)
+    return np.ascontiguousarray(pixels, dtype=np.uint8)
+
+def encode_png(pixels):
+    from PIL import Image
+    f = io.BytesIO()
+    Image.fromarray(pixels).save(f, format="PNG")
+    return f.getvalue()
+
+class TileGetter(gizmo_server.QueryGetter):
+
+    "Serve PNG tiles for GET ...?level=L&x=TX&y=TY."
+
+    description = "Tile source"
+    content_type = "image/png"
+    query_defaults = dict(level=0, x=0, y=0)
+    bad_query_status = 404
+    # tile urls include the image version so tiles never change.
+    headers = {"Cache-Control": "max-age=3600"}
+
+    async def respond_query(self, values, interface):
+        image = self.component
+        key = (values["level"], values["x"], values["y"])
+        if not image.valid_tile(*key):
+            return interface.respond(status=404, body=b"no such tile", content_type="text/plain")
+        body = await image.tile_bytes(*key)
+        image.prefetch_neighbors(*key)
+        return self.respond_body(body, interface)
+
+class TiledImage(gz_jQuery.FetchingComponent):
+
+    """
+    A pan and zoom view of a large (h, w) gray, (h, w, 3) RGB or (h, w, 4) RGBA array.
+    Drag to pan and use the mouse wheel to zoom.  Arrays which are not uint8 are scaled
+    from value_range=(low, high) (estimated from a sample if not given).
+    on_pixel callbacks get full resolution pixel_row, pixel_column and pixel_data as for Image.
+    """
+
+    getter_class = TileGetter
+    getter_prefix = "image_tiles"
+
+    def __init__(
+        self,
+        array,
+        height=512,
+        width=512,
+        tile_size=256,
+        value_range=None,
+        cache_tiles=256,   # encoded tiles kept on the Python side
+        prefetch=True,     # encode neighbors of requested tiles ahead of time
+        title=None,
+        ):
+        super().__init__(init_text=None, title=title)
+        self.height = height
+        self.width = width
+        self.tile_size = tile_size
+        self.cache_tiles = cache_tiles
+        self.prefetch = prefetch
+        self.version = 0
+        self.pixel_click_callbacks = {}
+        self.set_array(array, value_range, refresh=False)
+        self.addClass("H5Gizmo-tiled-image")
+
+    def set_array(self, array, value_range=None, refresh=True):
+        "Show a new array (with the same or different shape)."
+        if array.ndim not in (2, 3) or (array.ndim == 3 and array.shape[2] not in (3, 4)):
+            raise TiledImageError("Tiled images should be (h, w), (h, w, 3) or (h, w, 4): " + repr(array.shape))
+        self.array = array
+        (self.img_height, self.img_width) = array.shape[:2]
+        self.levels = pyramid_levels(self.img_height, self.img_width, self.tile_size)
+        self.low = self.high = None
+        if array.dtype != np.uint8:
+            if value_range is None:
+                value_range = estimate_value_range(array)
+            (self.low, self.high) = value_range
+        self.tiles = collections.OrderedDict()   # (level, tx, ty) --> PNG bytes, least recent first
+        self.pending = {}    # (level, tx, ty) --> future for tiles being encoded
+        self.version += 1
+        if refresh and self.controller is not None:
+            do(self.controller.set_image(self.image_options()))
+        return self
+
+    def image_options(self):
+        return dict(
+            img_height=self.img_height,
+            img_width=self.img_width,
+            tile_size=self.tile_size,
+            levels=self.levels,
+            version=self.version,
+        )
+
+    def valid_tile(self, level, tx, ty):
+        if not 0 <= level < self.levels:
+            return False
+        span = self.tile_size * 2 ** level
+        return 0 <= tx * span < self.img_width and 0 <= ty * span < self.img_height
+
+    def encode_tile(self, level, tx, ty):
+        pixels = tile_pixels(self.array, level, tx, ty, self.tile_size, self.low, self.high)
+        return encode_png(pixels)
+
+    async def tile_bytes(self, level, tx, ty):
+        "The PNG bytes for the tile from the cache or encoded in an executor thread."
+        key = (level, tx, ty)
+        tiles = self.tiles
+        result = tiles.get(key)
+        if result is not None:
+            tiles.move_to_end(key)
+            return result
+        future = self.pending.get(key)
+        if future is None:
+            future = self.pending[key] = asyncio.get_event_loop().run_in_executor(None, self.encode_tile, *key)
+        pending = self.pending
+        try:
+            result = await future
+        finally:
+            if pending.get(key) is future:
+                del pending[key]
+        if pending is self.pending:
+            # (otherwise set_array replaced the image while encoding.)
+            tiles[key] = result
+            while len(tiles) > self.cache_tiles:
+                tiles.popitem(last=False)
+        return result
+
+    def prefetch_neighbors(self, level, tx, ty):
+        "Start encoding the uncached tiles beside the tile."
+        if not self.prefetch:
+            return
+        for (dx, dy) in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            key = (level, tx + dx, ty + dy)
+            if self.valid_tile(*key) and key not in self.tiles and key not in self.pending:
+                H5Gizmos.schedule_task(self.tile_bytes(*key))
+
+    def on_pixel(self, callback, type="click", delay=0.1):
+        """
+        When the image is clicked call the callback with the full resolution pixel_row, pixel_column
+        and pixel_data (the array entry at array[row, column]) added to the event.
+        """
+        if delay:
+            callback = gz_jQuery.DeJitterCallback(callback, delay)
+        self.pixel_click_callbacks[type] = callback
+        if self.controller is not None:
+            do(self.controller.on_pixel(type, self._pixel_callback), to_depth=1)
+
+    def _pixel_callback(self, event):
+        cb = self.pixel_click_callbacks.get(event["type"])
+        assert cb is not None, "No pixel callback defined for type: " + repr(event["type"])
+        row = min(max(0, int(event["pixel_row"])), self.img_height - 1)
+        column = min(max(0, int(event["pixel_column"])), self.img_width - 1)
+        event["pixel_row"] = row
+        event["pixel_column"] = column
+        event["pixel_data"] = self.array[row, column]
+        return cb(event)
+
+    def zoom_to_fit(self):
+        if self.controller is not None:
+            do(self.controller.fit())
+
+    def center_on(self, row, column, zoom=None):
+        "Center the view on the full resolution pixel, optionally at zoom screen pixels per array pixel."
+        if self.controller is not None:
+            do(self.controller.center_on(row, column, zoom))
+
+    def add_dependencies(self, gizmo):
+        super().add_dependencies(gizmo)
+        gizmo._relative_js(TILED_IMAGE_JS)
+        gizmo._initial_reference("H5Gizmos_tiled_image")
+
+    def configure_jQuery_element(self, element):
+        super().configure_jQuery_element(element)
+        gizmo = self.gizmo
+        self.resize(height=self.height, width=self.width)
+        self.controller = self.cache(
+            "tiled_image", gizmo.H5Gizmos_tiled_image(element, self.getter_name, self.image_options()))
+        for type in self.pixel_click_callbacks:
+            do(self.controller.on_pixel(type, self._pixel_callback), to_depth=1)
+
+    def release(self):
+        super().release()
+        self.pixel_click_callbacks = {}
@@ -0,0 +1,278 @@
+"""
+A streaming time series chart for high rate data (sensor dashboards and the like).
+
+append(t, values) only writes to a fixed size numpy ring buffer.  A frame task sends the
+points which arrived since the last frame, decimated to about one min/max pair per pixel
+column, as plotly extendTraces updates.  When the user zooms in the whole visible range is
+decimated again from the buffer, and double clicking resumes following the newest data.
+"""
+
+from . import gz_plotly
+from .gz_parent_protocol import do, schedule_task, WebSocketIsClosed
+import asyncio
+import numpy as np
+
+DECIMATION_METHODS = ("minmax", "lttb")
+
+class RingBuffer:
+
+    """
+    Fixed capacity buffer of rows, overwriting the oldest rows when full.
+    Rows are numbered by append order: row numbers total - len(self) ... total - 1 are available.
+    """
+
+    def __init__(self, capacity, columns=None, dtype=np.float64):
+        shape = (capacity,) if columns is None else (capacity, columns)
+        self.data = np.zeros(shape, dtype=dtype)
+        self.capacity = capacity
+        self.total = 0
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, rows):
+        "Append an array of rows (the last capacity rows are kept)."
+        rows = np.asarray(rows, dtype=self.data.dtype)
+        n = len(rows)
+        capacity = self.capacity
+        if n >= capacity:
+            rows = rows[-capacity:]
+            self.total += n - capacity
+            n = capacity
+        start = self.total % capacity
+        end = start + n
+        if end <= capacity:
+            self.data[start:end] = rows
+        else:
+            split = capacity - start
+            self.data[start:] = rows[:split]
+            self.data[:end - capacity] = rows[split:]
+        self.total += n
+
+    def since(self, row_number):
+        "The available rows numbered row_number or later, in append order."
+        first = max(row_number, self.total - len(self))
+        count = self.total - first
+        if count <= 0:
+            return self.data[:0]
+        start = first % self.capacity
+        end = start + count
+        if end <= self.capacity:
+            return self.data[start:end]
+        return np.concatenate([self.data[start:], self.data[:end - self.capacity]])
+
+    def first_row_number(self):
+        return self.total - len(self)
+
+    def values(self):
+        return self.since(0)
+
+def first_index(group, hit):
+    "Index of the first hit in each group (groups are sorted)."
+    positions = np.flatnonzero(hit)
+    (ignored, first) = np.unique(group[positions], return_index=True)
+    return positions[first]
+
+def min_max_decimate(t, y, bins):
+    """
+    Keep the minimum and maximum point of each run of equal (sorted) bin numbers, in time order.
+    """
+    if not len(t):
+        return (t, y)
+    starts = np.flatnonzero(np.concatenate([[True], bins[1:] != bins[:-1]]))
+    lengths = np.diff(np.concatenate([starts, [len(t)]]))
+    group = np.repeat(np.arange(len(starts)), lengths)
+    mins = np.minimum.reduceat(y, starts)
+    maxes = np.maximum.reduceat(y, starts)
+    keep = np.unique(np.concatenate([
+        first_index(group, y == mins[group]),
+        first_index(group, y == maxes[group]),
+    ]))
+    return (t[keep], y[keep])
+
+def lttb(t, y, n_out):
+    "Largest triangle three buckets: choose n_out points preserving the visual shape of the curve."
+    n = len(t)
+    if n_out >= n or n_out < 3:
+        return (t, y)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.zeros((n_out,), dtype=np.int64)
+    keep[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        (low, high) = (edges[i], edges[i + 1])
+        if i + 2 < len(edges):
+            following = slice(edges[i + 1], edges[i + 2])
+        else:
+            following = slice(n - 1, n)
+        (tc, yc) = (t[following].mean(), y[following].mean())
+        area = np.abs((t[a] - tc) * (y[low:high] - y[a]) - (t[a] - t[low:high]) * (yc - y[a]))
+        a = low + int(np.argmax(area))
+        keep[i + 1] = a
+    return (t[keep], y[keep])
+
+class TimeSeries(gz_plotly.Plot):
+
+    """
+    A plotly line chart of one or more series sharing a time axis, for data appended at high rates.
+    The chart follows the last window seconds of data, showing about one min/max pair (or for
+    method="lttb" about 2 LTTB points) per pixel of the width.  capacity limits the points kept.
+    Times must be appended in increasing order.
+    """
+
+    def __init__(
+        self,
+        series=("value",),
+        capacity=1000000,
+        window=10.0,
+        width=800,
+        height=300,
+        method="minmax",
+        fps=30,
+        layout=None,
+        config=None,
+        title=None,
+        ):
+        assert method in DECIMATION_METHODS, "method should be one of %s: %s" % (DECIMATION_METHODS, repr(method))
+        self.series = list(series)
+        self.times = RingBuffer(capacity)
+        self.samples = RingBuffer(capacity, len(self.series))
+        self.window = window
+        self.pixels = width
+        self.bin_width = window / width
+        self.method = method
+        self.fps = fps
+        self.base_layout = dict(layout or {})
+        self.base_layout.setdefault("xaxis", {})
+        self.following = True
+        self.unsent = 0   # row number of the first point not yet sent
+        self.frame_total = 0   # points appended at the last frame
+        self.stopped = False
+        self.frame_task = None
+        # extended traces are trimmed to about the follow window.
+        self.max_points = 4 * width
+        data = [dict(x=[], y=[], name=name, mode="lines") for name in self.series]
+        super().__init__(data, self.base_layout, config, width=width, height=height, title=title)
+
+    def append(self, t, values):
+        """
+        Append points: a scalar time with one value per series,
+        or an array of n times with an (n,) array (one series) or an (n, nseries) array.
+        """
+        t = np.atleast_1d(np.asarray(t, dtype=np.float64))
+        values = np.asarray(values, dtype=np.float64).reshape((len(t), len(self.series)))
+        self.times.append(t)
+        self.samples.append(values)
+
+    def bins(self, t):
+        return np.floor(t / self.bin_width).astype(np.int64)
+
+    def decimate(self, t, values, bins):
+        "Return (t, y) for each series with about one min/max pair (or 2 LTTB points) per bin."
+        nbins = 1 + int(np.count_nonzero(bins[1:] != bins[:-1])) if len(bins) else 0
+        result = []
+        for index in range(len(self.series)):
+            y = values[:, index]
+            if self.method == "lttb":
+                result.append(lttb(t, y, 2 * nbins))
+            else:
+                result.append(min_max_decimate(t, y, bins))
+        return result
+
+    def traces(self, decimated):
+        return [dict(x=t, y=y, name=name, mode="lines") for ((t, y), name) in zip(decimated, self.series)]
+
+    def completed_points(self, first, flush=False):
+        """
+        Times, values and bins of the points from row number first in completed bins.
+        The points in the last (still filling) bin are held back until the bin is complete
+        unless flush is set.
+        """
+        t = self.times.since(first)
+        values = self.samples.since(first)
+        bins = self.bins(t)
+        if flush or not len(t):
+            return (t, values, bins)
+        done = int(np.searchsorted(bins, bins[-1]))
+        return (t[:done], values[:done], bins[:done])
+
+    def send_frame(self):
+        "Send the points which arrived since the last frame (when following the newest data)."
+        if not self.following:
+            return
+        first = max(self.unsent, self.times.first_row_number())
+        # if no data arrived since the last frame also send the last bin.
+        flush = (self.times.total == self.frame_total)
+        self.frame_total = self.times.total
+        (t, values, bins) = self.completed_points(first, flush)
+        if not len(t):
+            return
+        self.unsent = first + len(t)
+        decimated = self.decimate(t, values, bins)
+        self.extend({index: dict(x=tx, y=ty) for (index, (tx, ty)) in enumerate(decimated)}, max_points=self.max_points)
+
+    def follow(self):
+        "Show the newest window seconds of data and keep following new data."
+        self.following = True
+        last = self.times.since(self.times.total - 1)
+        first = self.times.first_row_number()
+        if len(last):
+            all_times = self.times.values()
+            first += int(np.searchsorted(all_times, last[0] - self.window))
+        (t, values, bins) = self.completed_points(first)
+        self.unsent = first + len(t)
+        layout = dict(self.base_layout, xaxis=dict(self.base_layout["xaxis"], autorange=True))
+        self.update(data=self.traces(self.decimate(t, values, bins)), layout=layout)
+
+    def zoom(self, low, high):
+        "Show the data between times low and high decimated to the chart width (stop following)."
+        self.following = False
+        all_times = self.times.values()
+        start = int(np.searchsorted(all_times, low))
+        end = int(np.searchsorted(all_times, high, side="right"))
+        t = all_times[start:end]
+        values = self.samples.values()[start:end]
+        decimated = [(t, values[:, i]) for i in range(len(self.series))]
+        if len(t) > 2 * self.pixels and high > low:
+            bins = np.floor((t - low) * (self.pixels / (high - low))).astype(np.int64)
+            bins = np.minimum(bins, self.pixels - 1)
+            decimated = self.decimate(t, values, bins)
+        layout = dict(self.base_layout, xaxis=dict(self.base_layout["xaxis"], range=[low, high], autorange=False))
+        self.update(data=self.traces(decimated), layout=layout)
+
+    def relayout(self, event):
+        "Plotly relayout callback: zoom on x axis range changes, follow on autorange."
+        if not isinstance(event, dict):
+            return
+        if event.get("xaxis.autorange"):
+            self.follow()
+            return
+        (low, high) = (event.get("xaxis.range[0]"), event.get("xaxis.range[1]"))
+        if low is not None and high is not None:
+            self.zoom(float(low), float(high))
+
+    async def send_frames(self):
+        try:
+            while not self.stopped:
+                self.send_frame()
+                await asyncio.sleep(1.0 / self.fps)
+        except WebSocketIsClosed:
+            # the browser went away.
+            self.stopped = True
+        finally:
+            self.frame_task = None
+
+    def stop(self):
+        self.stopped = True
+
+    def release(self):
+        self.stop()
+        super().release()
+
+    def dom_element_reference(self, gizmo):
+        result = super().dom_element_reference(gizmo)
+        do(self.element[0].on("plotly_relayout", self.relayout), to_depth=2)
+        self.stopped = False
+        if self.frame_task is None:
+            self.frame_task = schedule_task(self.send_frames())
+        return result
@@ -0,0 +1,142 @@
+"""
+A virtualized list container for very long lists of rows.
+
+Only the rows in or near the viewport are in the browser DOM.  The browser fetches
+row HTML from the Python side in windows as the list scrolls, so memory use and
+start up time do not depend on the number of rows.
+"""
+
+from . import gz_jQuery
+from . import gizmo_server
+from .gz_parent_protocol import do
+import html
+import json
+
+VIRTUAL_STACK_JS = "GIZMO_STATIC/virtual_stack.js"
+
+def text_row(item):
+    "Default row HTML: the escaped text of the item."
+    return html.escape(str(item))
+
+class RowWindowGetter(gizmo_server.QueryGetter):
+
+    "Serve a window of row HTML strings as JSON for GET ...?start=S&count=N."
+
+    description = "Row window"
+    content_type = "application/json"
+    query_defaults = dict(start=0, count=0)
+
+    async def respond_query(self, values, interface):
+        stack = self.component
+        start = values["start"]
+        # never render more than a window of rows per request.
+        count = min(values["count"], stack.window_size)
+        data = dict(start=start, version=stack.version, rows=stack.rows(start, count))
+        return self.respond_body(json.dumps(data).encode("utf8"), interface)
+
+class VirtualStack(gz_jQuery.FetchingComponent):
+
+    """
+    A scrolling list which only materializes the rows in or near the view.
+    Rows are HTML strings made by row_maker(index) for index in range(row_count),
+    or by row_maker(items[index]) if items is given (default: the escaped item text).
+    All rows have the same height in pixels.
+    """
+
+    getter_class = RowWindowGetter
+    getter_prefix = "virtual_rows"
+
+    def __init__(
+        self,
+        items=None,
+        row_maker=None,
+        row_count=None,
+        row_height=24,
+        height=400,
+        width=None,
+        window_size=100,   # rows fetched by the browser per request
+        overscan=10,       # extra rows kept above and below the view
+        max_windows=20,    # fetched windows cached in the browser
+        on_row_click=None,
+        title=None,
+        ):
+        super().__init__(init_text=None, title=title)
+        self.row_height = row_height
+        self.window_size = window_size
+        self.overscan = overscan
+        self.max_windows = max_windows
+        self.on_row_click = on_row_click
+        self.version = 0
+        self.set_rows(items, row_maker, row_count, refresh=False)
+        self.resize(width=width, height=height)
+        self.addClass("H5Gizmo-virtual-stack")
+
+    def set_rows(self, items=None, row_maker=None, row_count=None, refresh=True):
+        "Replace the rows (and update the browser if refresh is set)."
+        if items is not None:
+            if row_maker is None:
+                row_maker = text_row
+            item_maker = row_maker
+            def row_maker(index):
+                return item_maker(items[index])
+            if row_count is None:
+                row_count = len(items)
+        assert row_maker is not None, "items or row_maker is required."
+        assert row_count is not None, "row_count is required with a row_maker."
+        self.row_maker = row_maker
+        self.row_count = row_count
+        if refresh:
+            self.refresh()
+        return self
+
+    def rows(self, start, count):
+        "Row HTML for the rows in range(start, start + count) clipped to the row count."
+        start = max(0, start)
+        end = min(self.row_count, start + max(0, count))
+        return [self.row_maker(index) for index in range(start, end)]
+
+    def refresh(self):
+        "Tell the browser to refetch the rows (after the row content or count changed)."
+        self.version += 1
+        if self.controller is not None:
+            do(self.controller.reset(self.row_count, self.version))
+
+    def scroll_to(self, index):
+        if self.controller is not None:
+            do(self.controller.scroll_to(index))
+
+    def set_on_row_click(self, callback):
+        "callback(index) is called when a row is clicked."
+        old_callback = self.on_row_click
+        self.on_row_click = callback
+        if self.controller is not None:
+            self.hold_callback(callback)
+            do(self.controller.set_on_click(callback))
+            if old_callback is not None and old_callback != callback:
+                self.drop_callback(old_callback)
+
+    def add_dependencies(self, gizmo):
+        super().add_dependencies(gizmo)
+        gizmo._relative_js(VIRTUAL_STACK_JS)
+        gizmo._initial_reference("H5Gizmos_virtual_stack")
+
+    def configure_jQuery_element(self, element):
+        super().configure_jQuery_element(element)
+        gizmo = self.gizmo
+        options = dict(
+            count=self.row_count,
+            row_height=self.row_height,
+            window_size=self.window_size,
+            overscan=self.overscan,
+            max_windows=self.max_windows,
+            version=self.version,
+        )
+        self.controller = self.cache(
+            "virtual_stack", gizmo.H5Gizmos_virtual_stack(element, self.getter_name, options))
+        if self.on_row_click is not None:
+            self.hold_callback(self.on_row_click)
+            do(self.controller.set_on_click(self.on_row_click))
+
+    def release(self):
+        super().release()
+        self.on_row_click = None
@@ -26,11 +26,18 @@ def lorenz(x, y, z, s=10, r=28, b=2.667):
     z_dot = x*y - b*z
     return x_dot, y_dot, z_dot
 
-plot_region = Plotter()
+# Render in a worker thread so slider ticks are not blocked by savefig,
+# and remember recent plots so moving a slider back is instant.
+plot_region = Plotter(background=True, cache_size=64)
 
 def draw_plot(*ignored):
-    with plot_region:
-        plot_curve()
+    b = b_slider.value
+    s = s_slider.value
+    r = r_slider.value
+    b_text.text("b=" + repr(b))
+    r_text.text("r=" + repr(r))
+    s_text.text("s=" + repr(s))
+    plot_region.plot(plot_curve, key=(s, r, b))
 
 info = Text("A parametric curve.")
 s_text = Text("s")
@@ -53,9 +60,6 @@ def plot_curve():
     b = b_slider.value
     s = s_slider.value
     r = r_slider.value
-    b_text.text("b=" + repr(b))
-    r_text.text("r=" + repr(r))
-    s_text.text("s=" + repr(s))
 
     xs = np.empty(num_steps + 1)
     ys = np.empty(num_steps + 1)
@@ -61,7 +61,7 @@ class ChatController:
         #parent = dashboard
         parent = None
         (relative, full, path) = add_launcher(
-            dashboard.gizmo, self.add_new_member, parent_component=parent)
+            dashboard.gizmo, self.add_new_member, parent_component=parent, warm_pool_size=2)
         self.full_path.text(full)
         self.launch_link.html(
             '<a href="%s"  target="_blank" >%s</a>' % (relative, relative)
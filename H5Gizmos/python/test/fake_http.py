@@ -0,0 +1,15 @@
+"""
+Minimal stand ins for aiohttp requests and the gizmo_server interface,
+shared by the getter tests.
+"""
+
+class FakeRequest:
+
+    def __init__(self, headers=None, **query):
+        self.headers = headers or {}
+        self.query = query
+
+class FakeInterface:
+
+    def respond(self, body=None, status=200, content_type=None, headers=None):
+        return (body, status, content_type, headers)
@@ -795,3 +795,12 @@ class TestPipelineWSErr(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(P.last_unicode_sent, None)
         self.assertEqual(P.last_json_received, None)
         self.assertNotEqual(P.ws_error_message, None)
+
+class TestPackageExports(unittest.TestCase):
+
+    def test_star_import(self):
+        namespace = {}
+        exec("from H5Gizmos import *", namespace)
+        for name in ("serve", "do", "Html", "Stack", "Button", "TimeSeries"):
+            self.assertIn(name, namespace)
+        self.assertNotIn("time", namespace)
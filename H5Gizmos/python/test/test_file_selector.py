@@ -0,0 +1,31 @@
+import unittest
+from unittest import mock
+import tempfile
+import os
+
+from H5Gizmos.python.gizmo_server import GzServer
+from H5Gizmos.python.file_selector import FileSelector
+
+class TestFileSelector(unittest.IsolatedAsyncioTestCase):
+
+    async def test_hidden_listings_are_pruned(self):
+        with tempfile.TemporaryDirectory() as folder:
+            for name in ("a", "b"):
+                os.mkdir(os.path.join(folder, name))
+                for index in range(3):
+                    open(os.path.join(folder, name, "f%s.txt" % index), "w").close()
+            S = GzServer()
+            gizmo = S.gizmo(title="select")
+            selector = FileSelector(root_folder=folder)
+            selector.gizmo.prepare_application(gizmo)
+            with mock.patch("H5Gizmos.python.gz_components.do"):
+                selector.set_current_path("a")
+                a_count = len(selector.path_selectors)
+                a_stacks = len(selector.listing_stacks)
+                for i in range(5):
+                    selector.set_current_path("b")
+                    selector.set_current_path("a")
+            # the caches only hold what is displayed.
+            self.assertEqual(len(selector.path_selectors), a_count)
+            self.assertEqual(len(selector.listing_stacks), a_stacks)
+            self.assertEqual(set(selector.path_selectors) | set(selector.listing_stacks), selector.displayed_keys)
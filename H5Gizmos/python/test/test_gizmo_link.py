@@ -0,0 +1,316 @@
+
+import unittest
+import asyncio
+import sys
+import os
+
+from H5Gizmos.python.gizmo_link import (
+    GizmoLink,
+    WarmScriptPool,
+    ScriptWatcher,
+    ScriptSupervisor,
+    ScriptLimitExceeded,
+    RingLog,
+    process_usage,
+)
+
+# Start gizmo_script using the current interpreter (the script may not be on the PATH during tests).
+STARTER = "%s -c 'from H5Gizmos.python.gizmo_script_support import main; main()'" % sys.executable
+# The started interpreter must find this H5Gizmos wherever the tests are run from.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+STARTER_ENVIRONMENT = dict(PYTHONPATH=os.pathsep.join([REPO_ROOT] + ([os.environ["PYTHONPATH"]] if os.environ.get("PYTHONPATH") else [])))
+
+class TestWarmScriptPool(unittest.IsolatedAsyncioTestCase):
+
+    async def test_warm_worker_assignment(self):
+        pool = WarmScriptPool("H5Gizmos", 1, starter=STARTER, environment=STARTER_ENVIRONMENT)
+        pool.fill()
+        self.assertEqual(pool.starting, 1)
+        for i in range(200):
+            if pool.ready or pool.failures:
+                break
+            await asyncio.sleep(0.05)
+        self.assertEqual(len(pool.ready), 1)
+        warm = pool.take()
+        self.assertTrue(warm.alive())
+        # the pool refills in the background
+        self.assertEqual(pool.starting, 1)
+        # No such script: the worker should exit with an error after the assignment.
+        await warm.assign("no_such_script", "http://127.0.0.1:9999/GizmoLink/")
+        returncode = await asyncio.wait_for(warm.process.wait(), 30)
+        self.assertNotEqual(returncode, 0)
+        while pool.starting:
+            await asyncio.sleep(0.05)
+        refilled = list(pool.ready)
+        pool.stop()
+        for warm in refilled:
+            await warm.process.wait()
+
+    def test_pool_disabled_by_default(self):
+        link = GizmoLink(0, "/", "GizmoLink", verbose=False, warm_pool_size=0)
+        self.assertIsNone(link.warm_pool("H5Gizmos"))
+        self.assertIsNone(link.take_warm_process("H5Gizmos"))
+
+    def test_least_recently_used_pools_are_stopped(self):
+        from unittest import mock
+        link = GizmoLink(0, "/", "GizmoLink", verbose=False, warm_pool_size=1)
+        link.warm_pool_limit = 2
+        with mock.patch.object(WarmScriptPool, "fill"), mock.patch.object(WarmScriptPool, "stop") as stop:
+            first = link.warm_pool("a")
+            link.warm_pool("b")
+            self.assertIs(link.warm_pool("a"), first)
+            link.warm_pool("c")
+            self.assertEqual(list(link.module_to_warm_pool), ["a", "c"])
+            self.assertEqual(stop.call_count, 1)
+
+async def start_app(app):
+    from aiohttp import web
+    from H5Gizmos.python.gizmo_server import choose_port1
+    port = choose_port1()
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "localhost", port).start()
+    return (runner, port)
+
+class TestPooledProxy(unittest.IsolatedAsyncioTestCase):
+
+    async def test_least_recently_used_upstreams_are_closed(self):
+        link = GizmoLink(0, "/", "GizmoLink", verbose=False, warm_pool_size=0)
+        link.upstream_limit = 2
+        first = link.upstream(1001)
+        busy = link.upstream(1002)
+        busy.open_web_sockets = 1
+        self.assertIs(link.upstream(1001), first)
+        link.upstream(1003)
+        # 1002 is the least recently used but is still relaying a web socket.
+        self.assertEqual(list(link.port_to_upstream), [1002, 1003])
+        busy.open_web_sockets = 0
+        link.upstream(1004)
+        self.assertEqual(list(link.port_to_upstream), [1003, 1004])
+
+    async def test_streaming_range_passthrough(self):
+        import json
+        import aiohttp
+        from aiohttp import web
+        content = bytes(range(256)) * 1000
+        seen_headers = []
+        async def upstream_get(request):
+            seen_headers.append(dict(request.headers))
+            (start, end) = request.headers["Range"][len("bytes="):].split("-")
+            (start, end) = (int(start), int(end) + 1)
+            headers = {"Content-Range": "bytes %s-%s/%s" % (start, end - 1, len(content)), "ETag": '"v1"'}
+            return web.Response(body=content[start:end], status=206, headers=headers)
+        upstream = web.Application()
+        upstream.router.add_route("GET", "/gizmo/http/{tail:.*}", upstream_get)
+        (upstream_runner, upstream_port) = await start_app(upstream)
+        link = GizmoLink(0, "/", "GizmoLink", verbose=False, warm_pool_size=0)
+        (link_runner, link_port) = await start_app(link.get_app())
+        try:
+            url = "http://localhost:%s/connect/%s/gizmo/http/MGR_1/data" % (link_port, upstream_port)
+            async with aiohttp.ClientSession() as client:
+                for i in range(3):
+                    headers = {"Range": "bytes=1000-200999", "If-None-Match": '"v0"'}
+                    async with client.get(url, headers=headers) as resp:
+                        self.assertEqual(resp.status, 206)
+                        self.assertEqual(resp.headers["ETag"], '"v1"')
+                        body = await resp.read()
+                        self.assertEqual(body, content[1000:201000])
+                async with client.get("http://localhost:%s/proxy_stats" % link_port) as resp:
+                    stats = json.loads(await resp.text())
+        finally:
+            await link_runner.cleanup()
+            await upstream_runner.cleanup()
+        self.assertEqual(seen_headers[0]["If-None-Match"], '"v0"')
+        upstream_stats = stats[str(upstream_port)]
+        self.assertEqual(upstream_stats["requests"], 3)
+        self.assertEqual(upstream_stats["errors"], 0)
+        self.assertEqual(upstream_stats["bytes_sent"], 3 * 200000)
+        # one pooled session for the upstream
+        self.assertEqual(list(link.port_to_upstream), [upstream_port])
+        self.assertIsNone(link.port_to_upstream[upstream_port].session)
+
+    async def test_truncated_upstream_response(self):
+        import json
+        import aiohttp
+        from aiohttp import web
+        async def upstream_get(request):
+            response = web.StreamResponse(headers={"Content-Length": "100000"})
+            await response.prepare(request)
+            await response.write(b"x" * 1000)
+            request.transport.abort()
+            return response
+        upstream = web.Application()
+        upstream.router.add_route("GET", "/gizmo/http/{tail:.*}", upstream_get)
+        (upstream_runner, upstream_port) = await start_app(upstream)
+        link = GizmoLink(0, "/", "GizmoLink", verbose=False, warm_pool_size=0)
+        (link_runner, link_port) = await start_app(link.get_app())
+        try:
+            url = "http://localhost:%s/connect/%s/gizmo/http/MGR_1/data" % (link_port, upstream_port)
+            async with aiohttp.ClientSession() as client:
+                async with client.get(url) as resp:
+                    # the relayed headers arrive, then the body is cut short (not a second response).
+                    self.assertEqual(resp.status, 200)
+                    with self.assertRaises(aiohttp.ClientPayloadError):
+                        await resp.read()
+                async with client.get("http://localhost:%s/proxy_stats" % link_port) as resp:
+                    stats = json.loads(await resp.text())
+        finally:
+            await link_runner.cleanup()
+            await upstream_runner.cleanup()
+        self.assertEqual(stats[str(upstream_port)]["errors"], 1)
+
+class FakeRelayMessage:
+
+    def __init__(self, type, data=None):
+        self.type = type
+        self.data = data
+
+class FakeRelaySocket:
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+        self.sent = []
+
+    async def receive(self):
+        return self.messages.pop(0)
+
+    async def send_str(self, data):
+        await asyncio.sleep(0.01)   # a slow receiver
+        self.sent.append(data)
+
+class TestWebSocketRelay(unittest.IsolatedAsyncioTestCase):
+
+    async def test_slow_receiver_gets_every_message(self):
+        import aiohttp
+        from H5Gizmos.python.gizmo_link import WebSocketConnector
+        texts = ["m%s" % i for i in range(5)]
+        messages = [FakeRelayMessage(aiohttp.WSMsgType.TEXT, text) for text in texts]
+        from_ws = FakeRelaySocket(messages + [FakeRelayMessage(aiohttp.WSMsgType.CLOSE)])
+        to_ws = FakeRelaySocket([])
+        connector = WebSocketConnector(None, 0, "", queue_size=1)
+        connector.terminate_listeners = lambda: asyncio.sleep(0)
+        await connector.listen_to_server(from_ws, to_ws)
+        self.assertEqual(to_ws.sent, texts)
+
+    async def test_binary_and_ping_relay(self):
+        import json
+        import aiohttp
+        from aiohttp import web
+        async def upstream_ws(request):
+            ws = web.WebSocketResponse()
+            await ws.prepare(request)
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    await ws.send_str(msg.data.upper())
+                elif msg.type == aiohttp.WSMsgType.BINARY:
+                    await ws.send_bytes(msg.data[::-1])
+            return ws
+        upstream = web.Application()
+        upstream.router.add_route("GET", "/gizmo/ws/{tail:.*}", upstream_ws)
+        (upstream_runner, upstream_port) = await start_app(upstream)
+        link = GizmoLink(0, "/", "GizmoLink", verbose=False, warm_pool_size=0)
+        (link_runner, link_port) = await start_app(link.get_app())
+        payload = bytes(range(256)) * 100
+        try:
+            url = "http://localhost:%s/connect/%s/gizmo/ws/MGR_1" % (link_port, upstream_port)
+            async with aiohttp.ClientSession() as client:
+                async with client.ws_connect(url, autoping=False) as ws:
+                    await ws.send_str("hello")
+                    msg = await ws.receive()
+                    self.assertEqual(msg.type, aiohttp.WSMsgType.TEXT)
+                    self.assertEqual(msg.data, "HELLO")
+                    await ws.send_bytes(payload)
+                    msg = await ws.receive()
+                    self.assertEqual(msg.type, aiohttp.WSMsgType.BINARY)
+                    self.assertEqual(msg.data, payload[::-1])
+                    # the upstream answers the relayed ping
+                    await ws.ping(b"are you there")
+                    msg = await ws.receive()
+                    self.assertEqual(msg.type, aiohttp.WSMsgType.PONG)
+                    self.assertEqual(msg.data, b"are you there")
+                async with client.get("http://localhost:%s/proxy_stats" % link_port) as resp:
+                    stats = json.loads(await resp.text())
+        finally:
+            await link_runner.cleanup()
+            await upstream_runner.cleanup()
+        upstream_stats = stats[str(upstream_port)]
+        self.assertEqual(upstream_stats["ws_messages"]["to_server"], 3)
+        self.assertEqual(upstream_stats["ws_messages"]["to_client"], 3)
+        self.assertEqual(upstream_stats["ws_bytes"]["to_client"], 5 + len(payload) + len(b"are you there"))
+
+class TestUnixSocketProxy(unittest.IsolatedAsyncioTestCase):
+
+    async def test_proxy_through_unix_socket(self):
+        import json
+        import tempfile
+        import aiohttp
+        from aiohttp import web
+        from H5Gizmos.python.gizmo_server import unix_socket_path
+        folder = tempfile.mkdtemp()
+        port = 123456  # a pseudo port: there is no TCP listener
+        async def upstream_get(request):
+            return web.Response(text="via socket " + request.path)
+        upstream = web.Application()
+        upstream.router.add_route("GET", "/gizmo/http/{tail:.*}", upstream_get)
+        upstream_runner = web.AppRunner(upstream)
+        await upstream_runner.setup()
+        await web.UnixSite(upstream_runner, unix_socket_path(port, folder)).start()
+        link = GizmoLink(0, "/", "GizmoLink", verbose=False, warm_pool_size=0, unix_socket_dir=folder)
+        self.assertEqual(link.script_environment()["GIZMO_UNIX_SOCKET_DIR"], folder)
+        (link_runner, link_port) = await start_app(link.get_app())
+        try:
+            url = "http://localhost:%s/connect/%s/gizmo/http/MGR_1/index.html" % (link_port, port)
+            async with aiohttp.ClientSession() as client:
+                async with client.get(url) as resp:
+                    self.assertEqual(resp.status, 200)
+                    text = await resp.text()
+                async with client.get("http://localhost:%s/proxy_stats" % link_port) as resp:
+                    stats = json.loads(await resp.text())
+        finally:
+            await link_runner.cleanup()
+            await upstream_runner.cleanup()
+        self.assertEqual(text, "via socket /gizmo/http/MGR_1/index.html")
+        self.assertEqual(stats[str(port)]["unix_socket"], unix_socket_path(port, folder))
+
+class TestScriptSupervisor(unittest.IsolatedAsyncioTestCase):
+
+    def test_ring_log(self):
+        log = RingLog(limit=10)
+        for block in [b"abcd", b"efgh", b"ijkl"]:
+            log.append(block)
+        self.assertEqual(list(log), [b"efgh", b"ijkl"])
+        self.assertEqual(log.dropped, 4)
+        log.append(b"0123456789xyz")
+        self.assertEqual(log.tail(), b"3456789xyz")
+        self.assertEqual(log.size, 10)
+
+    def test_process_usage(self):
+        import os
+        (cpu, rss) = process_usage(os.getpid())
+        self.assertGreater(cpu, 0)
+        self.assertGreater(rss, 1000000)
+
+    async def test_limit_and_idle_reaping(self):
+        import time
+        activity = {}
+        supervisor = ScriptSupervisor(limit=1, idle_ttl=60, activity=activity.get)
+        watcher = ScriptWatcher("some_module", "some_script", "http://localhost:9999/", verbose=False)
+        watcher.process = await asyncio.create_subprocess_exec("sleep", "30")
+        watcher.port = 5555
+        supervisor.check_limit("alice", "some_module")
+        supervisor.add(watcher, "alice")
+        with self.assertRaises(ScriptLimitExceeded):
+            supervisor.check_limit("alice", "some_module")
+        supervisor.check_limit("bob", "some_module")
+        supervisor.check_limit("alice", "other_module")
+        # recent traffic keeps the script alive
+        activity[5555] = time.time() + 100
+        self.assertEqual(supervisor.reap_idle(now=time.time() + 120), [])
+        self.assertEqual(supervisor.reap_idle(now=time.time() + 200), [watcher])
+        await asyncio.wait_for(watcher.process.wait(), 5)
+        await asyncio.sleep(0.01)
+        self.assertEqual(supervisor.running, [])
+        [finished] = supervisor.status()["finished"]
+        self.assertEqual(finished["kill_reason"], "idle")
+        self.assertEqual(finished["user"], "alice")
+        self.assertIn("some_script", supervisor.status_html())
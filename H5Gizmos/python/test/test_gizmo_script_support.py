@@ -0,0 +1,54 @@
+
+import unittest
+import tempfile
+import os
+from unittest import mock
+
+from H5Gizmos.python import gizmo_script_support
+from H5Gizmos.python.gizmo_script_support import (
+    entry_point_table,
+    find_entry,
+)
+
+ENTRIES = [["hello", "H5Gizmos.python.hex_codec:bytearray_to_hex"]]
+
+class TestEntryPointIndex(unittest.TestCase):
+
+    def setUp(self):
+        gizmo_script_support.module_to_name_to_entry.clear()
+        self.index_path = os.path.join(tempfile.mkdtemp(), "entry_points.json")
+
+    def tearDown(self):
+        gizmo_script_support.module_to_name_to_entry.clear()
+
+    def test_index_reused_until_path_changes(self):
+        with mock.patch.object(gizmo_script_support, "scan_entry_points", return_value=ENTRIES) as scan:
+            self.assertEqual(entry_point_table(index_path=self.index_path), ENTRIES)
+            self.assertTrue(os.path.exists(self.index_path))
+            self.assertEqual(entry_point_table(index_path=self.index_path), ENTRIES)
+            self.assertEqual(scan.call_count, 1)
+            with mock.patch.object(gizmo_script_support, "entry_point_index_key", return_value="changed"):
+                entry_point_table(index_path=self.index_path)
+            self.assertEqual(scan.call_count, 2)
+
+    def test_index_file_per_environment(self):
+        path = gizmo_script_support.entry_point_index_path()
+        self.assertEqual(gizmo_script_support.entry_point_index_path(), path)
+        with mock.patch.object(gizmo_script_support.sys, "prefix", "/other/venv"):
+            other = gizmo_script_support.entry_point_index_path()
+        self.assertNotEqual(other, path)
+        self.assertEqual(os.path.dirname(other), os.path.dirname(path))
+
+    def test_find_entry_rescans_for_missing_script(self):
+        results = [[], ENTRIES]
+        def scan():
+            return results.pop(0)
+        with mock.patch.object(gizmo_script_support, "scan_entry_points", side_effect=scan), \
+                mock.patch.object(gizmo_script_support, "entry_point_index_path", return_value=self.index_path):
+            entry = find_entry("H5Gizmos", "hello")
+        self.assertEqual(entry.name, "hello")
+        self.assertEqual(entry.load()(bytearray(b"\x01\xff")), "01ff")
+        with mock.patch.object(gizmo_script_support, "scan_entry_points", return_value=ENTRIES), \
+                mock.patch.object(gizmo_script_support, "entry_point_index_path", return_value=self.index_path):
+            with self.assertRaises(KeyError):
+                find_entry("H5Gizmos", "no_such_script")
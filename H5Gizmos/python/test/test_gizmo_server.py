@@ -238,6 +238,50 @@ class TestStartStop(StartStop):
         task = await self.startup(server, delay)
         await self.shutdown(server, task)
 
+    async def test_ready_without_sleeping(self):
+        server = GzServer(resolve_server=False)
+        self.assertEqual(server.server, "localhost")
+        task = server.run_in_task()
+        ready = await server.wait_until_ready(timeout=5)
+        self.assertTrue(ready)
+        # no delay before validation: the server name is resolved and checked after the bind.
+        reachable = await server.check_server_name_is_reachable()
+        self.assertTrue(reachable)
+        self.assertFalse(server.server_name_pending)
+        await self.shutdown(server, task)
+
+    async def test_ready_false_if_stopped(self):
+        server = GzServer()
+        server.ready_future()
+        server.set_ready(False)
+        self.assertFalse(await server.wait_until_ready(timeout=1))
+
+    async def test_unix_socket_only(self):
+        import os
+        import tempfile
+        from unittest import mock
+        from H5Gizmos.python.gizmo_server import UNIX_SOCKET_ENV_VAR, UNIX_SOCKET_ONLY_ENV_VAR
+        folder = tempfile.mkdtemp()
+        env = {UNIX_SOCKET_ENV_VAR: folder, UNIX_SOCKET_ONLY_ENV_VAR: "1"}
+        with mock.patch.dict(os.environ, env):
+            server = GzServer()
+        # a pseudo port naming the socket
+        self.assertGreater(server.port, 65535)
+        self.assertEqual(server.server, "localhost")
+        path = server.unix_socket_path()
+        self.assertEqual(os.path.dirname(path), folder)
+        task = server.run_in_task(log=False)
+        self.assertTrue(await server.wait_until_ready(timeout=5))
+        self.assertTrue(await server.check_server_name_is_reachable())
+        self.assertTrue(os.path.exists(path))
+        connector = aiohttp.UnixConnector(path=path)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            async with session.get("http://localhost/ping") as resp:
+                text = await resp.text()
+        self.assertTrue(text.startswith("pong"))
+        await self.shutdown(server, task)
+        self.assertFalse(os.path.exists(path))
+
 def std_url(path, protocol="http", server=None):
     if path.startswith("/"):
         path = path[1:]
@@ -321,6 +365,297 @@ class TestHTTP404(StartStop):
         self.assertEqual(info.status, 404)
 
 
+class TestCompressedVariants(unittest.TestCase):
+
+    def test_parse_accept_encoding(self):
+        from H5Gizmos.python.gizmo_server import parse_accept_encoding
+        accepted = parse_accept_encoding("gzip, deflate;q=0.5, br;q=0, *;q=0.1")
+        self.assertEqual(accepted, set(["gzip", "deflate", "*"]))
+        self.assertEqual(parse_accept_encoding(None), set())
+
+    def test_variant_cache(self):
+        import tempfile
+        import gzip
+        import os
+        from H5Gizmos.python.gizmo_server import CompressedVariants
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "script.js")
+            content = b"var x = 1;\n" * 1000
+            with open(path, "wb") as f:
+                f.write(content)
+            variants = CompressedVariants()
+            compressed = variants.get_variant(path, "gzip")
+            self.assertEqual(gzip.decompress(compressed), content)
+            # runtime variants are only kept in memory.
+            self.assertFalse(os.path.isfile(path + ".gz"))
+            # cached by (path, encoding)
+            self.assertIn((path, "gzip"), variants.path_encoding_to_mtime_and_bytes)
+            self.assertIs(variants.get_variant(path, "gzip"), compressed)
+            # small files are not compressed
+            small = os.path.join(folder, "small.js")
+            with open(small, "wb") as f:
+                f.write(b"var y;")
+            self.assertIsNone(variants.get_variant(small, "gzip"))
+
+    def test_bounded_cache(self):
+        import tempfile
+        import os
+        from H5Gizmos.python.gizmo_server import CompressedVariants
+        with tempfile.TemporaryDirectory() as folder:
+            paths = []
+            for index in range(3):
+                path = os.path.join(folder, "script%s.js" % index)
+                with open(path, "wb") as f:
+                    f.write(os.urandom(3000))
+                paths.append(path)
+            variants = CompressedVariants(max_bytes=7000)
+            for path in paths:
+                variants.get_variant(path, "gzip")
+            # the least recently used variant was dropped.
+            self.assertEqual([key[0] for key in variants.path_encoding_to_mtime_and_bytes], paths[1:])
+            self.assertLessEqual(variants.cached_bytes, 7000)
+
+    def test_precompress_writes_siblings(self):
+        import tempfile
+        import os
+        from H5Gizmos.python.gizmo_server import precompress_folder
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "script.js")
+            with open(path, "wb") as f:
+                f.write(b"var x = 1;\n" * 1000)
+            self.assertGreaterEqual(precompress_folder(folder, encodings=["gzip"], verbose=False), 1)
+            self.assertTrue(os.path.isfile(path + ".gz"))
+
+class TestCompressedDelivery(StartStop):
+
+    async def test_gzip_delivery(self, delay=0.1):
+        import tempfile
+        import os
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "script.js")
+            content = "var x = 1;\n" * 1000
+            with open(path, "w") as f:
+                f.write(content)
+            S = GzServer()
+            mgr = S.get_new_manager()
+            handler = mgr.add_file(path)
+            url = std_url(handler.method_path(), server=S)
+            task = None
+            try:
+                task = await self.startup(S, delay)
+                async with aiohttp.ClientSession() as client:
+                    async with client.get(url, headers={"Accept-Encoding": "gzip"}) as resp:
+                        self.assertEqual(resp.status, 200)
+                        self.assertEqual(resp.headers.get("Content-Encoding"), "gzip")
+                        self.assertEqual(resp.headers.get("Vary"), "Accept-Encoding")
+                        text = await resp.text()
+                    async with client.get(url, headers={"Accept-Encoding": "identity"}) as resp:
+                        self.assertEqual(resp.headers.get("Content-Encoding"), None)
+                        text2 = await resp.text()
+            finally:
+                if task is not None:
+                    await self.shutdown(S, task)
+            self.assertEqual(text, content)
+            self.assertEqual(text2, content)
+
+class TestBytesGetterContent(unittest.TestCase):
+
+    def test_parse_range_header(self):
+        from H5Gizmos.python.gizmo_server import parse_range_header, RANGE_NOT_SATISFIABLE
+        self.assertEqual(parse_range_header("bytes=0-9", 100), (0, 10))
+        self.assertEqual(parse_range_header("bytes=90-", 100), (90, 100))
+        self.assertEqual(parse_range_header("bytes=-10", 100), (90, 100))
+        self.assertEqual(parse_range_header("bytes=50-500", 100), (50, 100))
+        self.assertEqual(parse_range_header("bytes=0-1,5-6", 100), None)
+        self.assertEqual(parse_range_header(None, 100), None)
+        self.assertEqual(parse_range_header("bytes=100-", 100), RANGE_NOT_SATISFIABLE)
+
+    def test_zero_copy_array(self):
+        from H5Gizmos.python.gizmo_server import BytesGetter
+        S = GzServer()
+        mgr = S.get_new_manager()
+        array = np.arange(1000, dtype=np.float32).reshape((10, 100))
+        getter = BytesGetter("array.bin", array, mgr, "application/octet-stream")
+        self.assertEqual(len(getter.bytes), array.nbytes)
+        self.assertTrue(np.shares_memory(np.frombuffer(getter.bytes, dtype=np.float32), array))
+        # non contiguous arrays are copied in C order
+        getter.set_content(array[:, ::2])
+        self.assertEqual(getter.bytes.tobytes(), array[:, ::2].tobytes())
+
+    def test_mmap_lifts_limit(self):
+        import mmap
+        import tempfile
+        from H5Gizmos.python.gizmo_server import BytesGetter
+        S = GzServer()
+        mgr = S.get_new_manager()
+        getter = BytesGetter("small.bin", b"0123", mgr, "application/octet-stream")
+        getter.get_sanity_limit = 10
+        with self.assertRaises(ValueError):
+            getter.set_content(b"x" * 100)
+        with tempfile.TemporaryFile() as f:
+            f.write(b"y" * 100)
+            f.flush()
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            getter.set_content(mapped)
+            self.assertEqual(len(getter.bytes), 100)
+            getter.bytes.release()
+            mapped.close()
+
+class TestBytesGetterRanges(StartStop):
+
+    async def test_range_delivery(self, delay=0.1):
+        from H5Gizmos.python.gizmo_server import BytesGetter
+        content = bytes(range(256)) * 40
+        S = GzServer()
+        mgr = S.get_new_manager()
+        getter = BytesGetter("data.bin", content, mgr, "application/octet-stream", chunksize=1000)
+        mgr.add_http_handler(getter.filename, getter)
+        url = std_url(getter.method_path(), server=S)
+        task = None
+        results = {}
+        try:
+            task = await self.startup(S, delay)
+            async with aiohttp.ClientSession() as client:
+                for (name, header) in [("all", None), ("small", "bytes=10-19"), ("big", "bytes=100-5099"), ("bad", "bytes=20000-")]:
+                    headers = {}
+                    if header:
+                        headers["Range"] = header
+                    async with client.get(url, headers=headers) as resp:
+                        results[name] = (resp.status, await resp.read(), resp.headers.get("Content-Range"))
+        finally:
+            if task is not None:
+                await self.shutdown(S, task)
+        self.assertEqual(results["all"][:2], (200, content))
+        self.assertEqual(results["small"], (206, content[10:20], "bytes 10-19/10240"))
+        self.assertEqual(results["big"], (206, content[100:5100], "bytes 100-5099/10240"))
+        self.assertEqual(results["bad"][0], 416)
+
+class TestSessionReaper(unittest.IsolatedAsyncioTestCase):
+
+    async def test_reap_idle_session(self):
+        import time
+        from H5Gizmos.python.gizmo_server import BytesGetter
+        S = GzServer()
+        G = S.gizmo(poll_for_exceptions=False)
+        mgr = G._manager
+        getter = BytesGetter("data.bin", b"x" * 1000, mgr, "application/octet-stream")
+        mgr.add_http_handler(getter.filename, getter)
+        G._register_callback(print)
+        other = S.get_new_manager()
+        now = time.time()
+        other.last_activity = now + 100
+        self.assertEqual(await S.reap_idle_sessions(ttl=10, now=now + 5), [])
+        report = await S.reap_idle_sessions(ttl=10, now=now + 20)
+        self.assertEqual([r[0] for r in report], [mgr.identifier])
+        self.assertGreaterEqual(report[0][1], 1000)
+        self.assertNotIn(mgr.identifier, S.identifier_to_manager)
+        self.assertIn(other.identifier, S.identifier_to_manager)
+        self.assertEqual(mgr.filename_to_http_handler, {})
+        self.assertTrue(G._torn_down)
+        self.assertEqual(G._call_backs, {})
+        self.assertEqual(S.reaped_sessions, 1)
+
+class TestWorkerPool(StartStop):
+
+    async def test_worker_session_relay(self, delay=0.1):
+        from H5Gizmos.python.gizmo_workers import WorkerPool, WorkerSession, maker_reference
+        with self.assertRaises(ValueError):
+            maker_reference(lambda: None)
+        S = GzServer()
+        task = None
+        pool = WorkerPool(nworkers=1, server=S)
+        try:
+            task = await self.startup(S, delay)
+            await pool.start()
+            (identifier, filename) = await pool.launch("H5Gizmos.python.gz_jQuery:jQueryComponent")
+            session = S.identifier_to_manager[identifier]
+            self.assertIsInstance(session, WorkerSession)
+            # worker session identifiers include the worker pid
+            self.assertTrue(identifier.startswith("MGR%s_" % pool.workers[0].pid))
+            self.assertEqual(pool.workers[0].sessions, set([identifier]))
+            url = std_url("/gizmo/http/%s/%s" % (identifier, filename), server=S)
+            info = await self.get_url_response(url)
+        finally:
+            await pool.stop()
+            if task is not None:
+                await self.shutdown(S, task)
+        self.assertEqual(info.status, 200)
+        self.assertIn("H5Gizmos.js", info.text)
+
+    async def test_duplicate_session_identifier_is_refused(self):
+        from H5Gizmos.python.gizmo_workers import WorkerPool, WorkerLaunchError
+        class FakeWorker:
+            def __init__(self):
+                self.closed = []
+            async def launch(self, reference, title):
+                return dict(identifier="MGR_1_1", filename="index.html")
+            def close_session(self, identifier):
+                self.closed.append(identifier)
+        S = GzServer()
+        existing = object()
+        S.identifier_to_manager["MGR_1_1"] = existing
+        worker = FakeWorker()
+        pool = WorkerPool(nworkers=1, server=S)
+        pool.choose_worker = lambda: worker
+        with self.assertRaises(WorkerLaunchError):
+            await pool.launch("H5Gizmos.python.gz_jQuery:jQueryComponent")
+        self.assertIs(S.identifier_to_manager["MGR_1_1"], existing)
+        self.assertEqual(worker.closed, ["MGR_1_1"])
+
+class TestWarmGizmoPool(unittest.IsolatedAsyncioTestCase):
+
+    async def test_take_skips_reaped_gizmos(self):
+        from H5Gizmos.python.gizmo_launch_url import WarmGizmoPool
+        class FakeManager:
+            last_activity = 0
+        class FakeGizmo:
+            _torn_down = False
+            def __init__(self):
+                self._manager = FakeManager()
+        class FakePool(WarmGizmoPool):
+            made = 0
+            async def make_gizmo(self):
+                self.made += 1
+                return FakeGizmo()
+        pool = FakePool(size=2)
+        pool.fill()
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(pool.ready), 2)
+        pool.ready[0]._torn_down = True
+        gizmo = await pool.take()
+        self.assertIs(gizmo._torn_down, False)
+        self.assertGreater(gizmo._manager.last_activity, 0)
+        await asyncio.sleep(0.01)
+        # the reaped gizmo and the taken one are both replaced
+        self.assertEqual(len(pool.ready), 2)
+        self.assertEqual(pool.made, 4)
+
+    async def test_reaper_keeps_pooled_gizmos(self):
+        import time
+        from H5Gizmos.python.gizmo_launch_url import WarmGizmoPool, launch_component
+        from H5Gizmos.python.gz_jQuery import Html
+        S = GzServer()
+        class ServerPool(WarmGizmoPool):
+            async def make_gizmo(self):
+                gizmo = S.gizmo(title=self.title)
+                self.primer(gizmo)
+                return gizmo
+        pool = ServerPool(size=1)
+        pool.fill()
+        await asyncio.sleep(0.01)
+        [warm] = pool.ready
+        # long after the session ttl the unused warm gizmo is still there.
+        self.assertEqual(await S.reap_idle_sessions(ttl=10, now=time.time() + 1000), [])
+        gizmo = await launch_component(Html("<div>launched</div>"), warm_pool=pool)
+        self.assertIs(gizmo, warm)
+        await asyncio.sleep(0.01)
+        [refill] = pool.ready
+        # the launched gizmo is reaped if the browser never connects, the refill is kept.
+        report = await S.reap_idle_sessions(ttl=10, now=time.time() + 1000)
+        self.assertEqual([r[0] for r in report], [gizmo._manager.identifier])
+        self.assertIn(refill._manager.identifier, S.identifier_to_manager)
+        self.assertFalse(refill._torn_down)
+
 class TestNoFileForWebSocket(StartStop):
 
     async def test_ws_no_file(self, delay=0.1):
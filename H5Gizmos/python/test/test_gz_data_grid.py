@@ -0,0 +1,107 @@
+import unittest
+import json
+
+import numpy as np
+
+from H5Gizmos.python.gizmo_server import GzServer
+from H5Gizmos.python.gz_data_grid import DataGrid, ColumnWindowGetter, DataGridError, data_columns
+from H5Gizmos.python.test.fake_http import FakeRequest, FakeInterface
+
+def decode_columns(body):
+    "Python version of H5Gizmos_decode_columns in data_grid.js."
+    header_length = int(np.frombuffer(body[:4], dtype="<u4")[0])
+    header = json.loads(body[4: 4 + header_length].decode("utf8"))
+    base = (4 + header_length + 7) & ~7
+    count = header["count"]
+    result = {}
+    for c in header["columns"]:
+        if c["kind"] == "text":
+            ends = np.frombuffer(body, dtype="<u4", count=count + 1, offset=base + c["offsets"])
+            start = base + c["offset"]
+            result[c["name"]] = [body[start + ends[i]: start + ends[i + 1]].decode("utf8") for i in range(count)]
+        else:
+            result[c["name"]] = np.frombuffer(body, dtype=c["dtype"], count=count, offset=base + c["offset"]).tolist()
+    return (header, result)
+
+def sample_data():
+    return dict(
+        name=np.array(["delta", "Alpha", "charlie", "bravo", "alpha"]),
+        size=np.array([4, 1, 3, 2, 1], dtype=np.int64),
+        weight=np.array([0.5, 1.5, 2.5, 3.5, 4.5], dtype=np.float32),
+        flag=np.array([True, False, True, False, True]),
+    )
+
+class TestDataGrid(unittest.IsolatedAsyncioTestCase):
+
+    def test_columns(self):
+        table = np.zeros((3,), dtype=[("a", "i4"), ("b", "f8")])
+        self.assertEqual([name for (name, values) in data_columns(table)], ["a", "b"])
+        with self.assertRaises(DataGridError):
+            data_columns(np.zeros((3,)))
+        with self.assertRaises(DataGridError):
+            data_columns(dict(a=[1, 2], b=[1]))
+
+    def test_sort_and_filter(self):
+        grid = DataGrid(sample_data())
+        self.assertEqual(grid.row_indices(0, 10).tolist(), [0, 1, 2, 3, 4])
+        grid.sort_by("size")
+        # stable: equal sizes keep their order.
+        self.assertEqual(grid.row_indices(0, 10).tolist(), [1, 4, 3, 2, 0])
+        permutation = grid.permutation(1)
+        grid.header_clicked(1)
+        self.assertFalse(grid.ascending)
+        self.assertIs(grid.permutation(1), permutation)
+        self.assertEqual(grid.row_indices(0, 10).tolist(), [0, 2, 3, 4, 1])
+        grid.set_filter("name", "ALPHA")
+        self.assertEqual(grid.row_indices(0, 10).tolist(), [4, 1])
+        grid.set_filter("size", ">=2")
+        self.assertEqual(grid.view_count(), 0)
+        grid.set_filter("name", "")
+        self.assertEqual(grid.row_indices(0, 10).tolist(), [0, 2, 3])
+        grid.set_filter("weight", "1..3")
+        self.assertEqual(grid.row_indices(0, 10).tolist(), [2])
+        # text never matches numbers.
+        grid.set_filter("weight", "abc")
+        self.assertEqual(grid.view_count(), 0)
+        grid.set_filter("weight", "1..3")
+        found = []
+        grid.set_on_row_click(found.append)
+        grid.row_clicked(0)
+        self.assertEqual(found, [2])
+
+    async def test_window_getter(self):
+        S = GzServer()
+        gizmo = S.gizmo(title="grid")
+        grid = DataGrid(sample_data())
+        grid.prepare_application(gizmo)
+        grid.get_element(gizmo)
+        getter = gizmo._manager.filename_to_http_handler[grid.getter_name]
+        self.assertIsInstance(getter, ColumnWindowGetter)
+        grid.sort_by("name")
+        # the sorted view is computed off the event loop; until then the old view is shown.
+        self.assertIsNotNone(grid.view_task)
+        self.assertEqual(grid.row_indices(0, 2).tolist(), [0, 1])
+        version = grid.version
+        await grid.view_task
+        self.assertIsNone(grid.view_task)
+        self.assertEqual(grid.version, version + 1)
+        (body, status, ctype, headers) = await getter.handle_get(
+            None, FakeRequest(start="1", count="3"), FakeInterface())
+        self.assertEqual(ctype, "application/octet-stream")
+        (header, columns) = decode_columns(body)
+        self.assertEqual((header["start"], header["count"], header["total"], header["nrows"]), (1, 3, 5, 5))
+        self.assertEqual(columns["name"], ["alpha", "bravo", "charlie"])
+        self.assertEqual(columns["size"], [1, 2, 3])
+        self.assertEqual(columns["weight"], [4.5, 3.5, 2.5])
+        self.assertEqual(columns["flag"], [1, 0, 1])
+        kinds = [c["kind"] for c in header["columns"]]
+        self.assertEqual(kinds, ["text", "int", "float", "bool"])
+        # int64 is sent as float64 for javascript.
+        self.assertEqual(header["columns"][1]["dtype"], "float64")
+        (body, status, ctype, headers) = await getter.handle_get(
+            None, FakeRequest(start="1", count="many"), FakeInterface())
+        self.assertEqual(status, 400)
+        grid.window_size = 2
+        (body, status, ctype, headers) = await getter.handle_get(
+            None, FakeRequest(start="0", count="1000000"), FakeInterface())
+        self.assertEqual(decode_columns(body)[0]["count"], 2)
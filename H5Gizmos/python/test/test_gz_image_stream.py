@@ -0,0 +1,91 @@
+import unittest
+import asyncio
+import json
+import io
+
+import numpy as np
+
+from H5Gizmos.python.gizmo_server import GzServer
+from H5Gizmos.python.gz_image_stream import (
+    ImageStream, FrameGetter, ImageStreamError, frame_array, changed_rectangle, encode_frame,
+)
+from H5Gizmos.python.test.fake_http import FakeRequest, FakeInterface
+
+def decode_frame(body):
+    header_length = int(np.frombuffer(body[:4], dtype="<u4")[0])
+    header = json.loads(body[4: 4 + header_length].decode("utf8"))
+    return (header, body[4 + header_length:])
+
+class TestImageStream(unittest.IsolatedAsyncioTestCase):
+
+    def test_frame_array(self):
+        self.assertEqual(frame_array(np.ones((2, 3, 1)) * 300).tolist(), [[255] * 3] * 2)
+        scaled = frame_array(np.arange(4.0).reshape((2, 2)), scale=True)
+        self.assertEqual(scaled.tolist(), [[0, 85], [170, 255]])
+        with self.assertRaises(ImageStreamError):
+            frame_array(np.zeros((2, 2, 2)))
+        with self.assertRaises(ImageStreamError):
+            ImageStream(format="gif")
+
+    def test_delta_frames(self):
+        old = np.zeros((10, 20, 3), dtype=np.uint8)
+        new = old.copy()
+        new[2:4, 5:9, 1] = 7
+        self.assertEqual(changed_rectangle(old, new), (5, 2, 4, 2))
+        self.assertEqual(changed_rectangle(old, old), (0, 0, 0, 0))
+        self.assertIsNone(changed_rectangle(old, new[:5]))
+        (header, payload) = decode_frame(encode_frame(3, new, old, "raw", 80))
+        self.assertEqual((header["x"], header["y"], header["w"], header["h"]), (5, 2, 4, 2))
+        self.assertEqual(payload, new[2:4, 5:9].tobytes())
+        (header, payload) = decode_frame(encode_frame(3, new, None, "quantized", 80))
+        self.assertEqual((header["w"], header["h"], header["channels"], len(payload)), (20, 10, 0, 200))
+        # a frame of a new size is sent whole, not as a delta.
+        (header, payload) = decode_frame(encode_frame(4, new[:5], old, "raw", 80))
+        self.assertEqual((header["w"], header["h"], header["delta"]), (20, 5, False))
+
+    async def test_resized_frame_is_not_a_delta(self):
+        stream = ImageStream(np.zeros((4, 4), dtype=np.uint8), delta=True)
+        stream.send_frame(np.zeros((8, 8), dtype=np.uint8))
+        (header, payload) = decode_frame(await stream.next_frame_bytes(1, 0.01))
+        self.assertEqual((header["width"], header["height"], header["w"], header["h"]), (8, 8, 8, 8))
+        self.assertIs(header["delta"], False)
+
+    def test_compressed_frame(self):
+        from PIL import Image
+        pixels = np.zeros((16, 16, 4), dtype=np.uint8)
+        (header, payload) = decode_frame(encode_frame(1, pixels, None, "jpeg", 50))
+        self.assertEqual(Image.open(io.BytesIO(payload)).size, (16, 16))
+
+    async def test_latest_frame_wins(self):
+        S = GzServer()
+        gizmo = S.gizmo(title="stream")
+        stream = ImageStream(np.zeros((4, 4), dtype=np.uint8), delta=True)
+        stream.prepare_application(gizmo)
+        stream.get_element(gizmo)
+        getter = gizmo._manager.filename_to_http_handler[stream.getter_name]
+        self.assertIsInstance(getter, FrameGetter)
+        (body, status, ctype, headers) = await getter.handle_get(None, FakeRequest(after="-1"), FakeInterface())
+        (header, payload) = decode_frame(body)
+        self.assertEqual((header["seq"], header["delta"]), (1, False))
+        # the browser asks for the next frame before it exists.
+        waiting = asyncio.ensure_future(getter.handle_get(None, FakeRequest(after="1"), FakeInterface()))
+        await asyncio.sleep(0.01)
+        self.assertFalse(waiting.done())
+        frame = np.zeros((4, 4), dtype=np.uint8)
+        frame[1, 2] = 9
+        stream.send_frame(frame)
+        frame[1, 2] = 0   # the stream keeps its own copy
+        (body, status, ctype, headers) = await waiting
+        (header, payload) = decode_frame(body)
+        self.assertEqual((header["seq"], header["x"], header["y"], header["w"], header["h"]), (2, 2, 1, 1, 1))
+        self.assertEqual(payload, b"\x09")
+        # frames 3 and 4 arrive while the browser is busy: only 4 is sent.
+        stream.send_frame(frame)
+        stream.send_frame(frame + 1)
+        (body, status, ctype, headers) = await getter.handle_get(None, FakeRequest(after="2"), FakeInterface())
+        (header, payload) = decode_frame(body)
+        self.assertEqual(header["seq"], 4)
+        self.assertEqual(stream.stats()["skipped"], 1)
+        self.assertIsNone(await stream.next_frame_bytes(4, 0.01))
+        (body, status, ctype, headers) = await getter.handle_get(None, FakeRequest(after="last"), FakeInterface())
+        self.assertEqual(status, 400)
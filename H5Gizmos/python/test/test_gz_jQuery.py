@@ -0,0 +1,232 @@
+
+import unittest
+from unittest import mock
+
+from H5Gizmos.python.gizmo_server import GzServer
+from H5Gizmos.python.gz_jQuery import (
+    Html,
+    Text,
+    Stack,
+    Input,
+    jQueryImage,
+    Plotter,
+    static_tag_html,
+    longest_increasing_subsequence,
+)
+
+class TestStaticTagHtml(unittest.TestCase):
+
+    def test_simple_tags(self):
+        self.assertEqual(static_tag_html("<div/>", "hi", ["a", "b"], {"fontSize": 12}, "tip"),
+            '<div class="a b" style="font-size: 12px" title="tip">hi</div>')
+        self.assertEqual(static_tag_html('<input type="text" value="x" />', "", [], {}, None),
+            '<input type="text" value="x">')
+        self.assertEqual(static_tag_html("<h1>Title</h1>", None, [], {"opacity": 0.5}, None),
+            '<h1 style="opacity: 0.5">Title</h1>')
+
+    def test_unsupported_tags(self):
+        # content replacing existing content
+        self.assertIsNone(static_tag_html("<h1>Title</h1>", "other", [], {}, None))
+        # merging with existing attributes
+        self.assertIsNone(static_tag_html('<div class="x"/>', None, ["y"], {}, None))
+        self.assertIsNone(static_tag_html("not a tag", None, [], {}, None))
+
+class TestServerSideRender(unittest.IsolatedAsyncioTestCase):
+
+    async def test_render_stack_into_page(self):
+        S = GzServer()
+        gizmo = S.gizmo(title="ssr")
+        child = Text("hello").css(color="red")
+        stack = Stack([Html("<h1>Title</h1>"), child, Input("v")])
+        stack.set_server_side_render()
+        stack.prepare_application(gizmo)
+        self.assertTrue(stack.rendered_on_server)
+        self.assertTrue(child.rendered_on_server)
+        page = gizmo._html_page.as_string()
+        self.assertIn('<div id="%s">' % stack.static_id, page)
+        self.assertIn('<div style="color: red">hello</div>', page)
+        self.assertIn('<div id="%s">' % child.static_id, page)
+        self.assertEqual(stack.children, stack.initial_children)
+
+    async def test_image_falls_back(self):
+        S = GzServer()
+        gizmo = S.gizmo(title="no ssr")
+        image = jQueryImage("example.png", b"not really an image")
+        stack = Stack([Text("caption"), image])
+        stack.set_server_side_render()
+        stack.prepare_application(gizmo)
+        self.assertFalse(stack.rendered_on_server)
+        self.assertIsNone(stack.static_id)
+        self.assertNotIn("caption", gizmo._html_page.as_string())
+
+    async def test_not_rendered_by_default(self):
+        S = GzServer()
+        gizmo = S.gizmo(title="default")
+        text = Text("plain")
+        text.prepare_application(gizmo)
+        self.assertFalse(text.rendered_on_server)
+        self.assertNotIn("plain", gizmo._html_page.as_string())
+
+class TestReconcileChildren(unittest.IsolatedAsyncioTestCase):
+
+    def test_longest_increasing_subsequence(self):
+        self.assertEqual(longest_increasing_subsequence([]), [])
+        self.assertEqual(longest_increasing_subsequence([3, 1, 2, 0, 4]), [1, 2, 4])
+        self.assertEqual(longest_increasing_subsequence([4, 3, 2, 1]), [1])
+        self.assertEqual(longest_increasing_subsequence([0, 1, 2]), [0, 1, 2])
+
+    async def test_keyed_moves(self):
+        S = GzServer()
+        gizmo = S.gizmo(title="keyed")
+        (a, b, c, d) = [Text(x) for x in "abcd"]
+        stack = Stack([a, b, c])
+        stack.prepare_application(gizmo)
+        wrappers = dict(zip("abc", stack.child_wrappers))
+        with mock.patch("H5Gizmos.python.gz_jQuery.do") as sent:
+            stack.attach_children([c, a, b])
+        # only c moves
+        self.assertEqual(sent.call_count, 1)
+        self.assertEqual([w.reference for w in stack.child_wrappers],
+            [wrappers[x].reference for x in "cab"])
+        with mock.patch("H5Gizmos.python.gz_jQuery.do") as sent:
+            stack.attach_children([c, a, b])
+        self.assertEqual(sent.call_count, 0)
+        stack.attach_children([c, d, a])
+        self.assertEqual(stack.children, [c, d, a])
+        self.assertIs(stack.child_wrappers[0], wrappers["c"])
+        self.assertIs(stack.child_wrappers[2], wrappers["a"])
+        self.assertNotIn(wrappers["b"], stack.child_wrappers)
+        stack.move_child(a, 0)
+        stack.remove_child(d)
+        stack.insert_child(b)
+        self.assertEqual(stack.children, [a, c, b])
+        with self.assertRaises(AssertionError):
+            stack.attach_children([a, a])
+
+class TestPlotter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        import matplotlib
+        matplotlib.use("Agg")
+
+    def draw(self, value):
+        import matplotlib.pyplot as plt
+        self.draws.append(value)
+        plt.plot([0, 1], [0, value])
+
+    async def test_background_latest_plot_wins(self):
+        self.draws = []
+        P = Plotter(background=True)
+        shown = []
+        P.change_content_url = lambda png, mime_type: shown.append(png)
+        for value in range(3):
+            P.plot(lambda: self.draw(value))
+        await P.render_task
+        self.assertEqual(self.draws, [0, 1, 2])
+        # the first two plots were superseded before the render thread started them.
+        self.assertEqual(len(shown), 1)
+        self.assertEqual(P.shown_generation, 3)
+        self.assertTrue(P.png_content.startswith(b"\x89PNG"))
+
+    def test_cached_plots(self):
+        self.draws = []
+        P = Plotter(cache_size=2)
+        for value in (1, 2, 1, 3, 1, 2):
+            P.plot(lambda: self.draw(value), key=value)
+        # 2 was dropped from the cache when 3 was added.
+        self.assertEqual(self.draws, [1, 2, 3, 2])
+        self.assertEqual(list(P.png_cache.keys()), [1, 2])
+        self.assertEqual(P.png_content, P.png_cache[2])
+        with P:
+            self.draw(4)
+        self.assertEqual(P.generation, 7)
+
+class TestDestroy(unittest.IsolatedAsyncioTestCase):
+
+    async def test_destroy_releases_tree(self):
+        S = GzServer()
+        gizmo = S.gizmo(title="destroy")
+        shared = lambda *args: None
+        own = lambda *args: None
+        (a, b) = (Text("a"), Text("b"))
+        a.set_on_click(shared)
+        a.on("dblclick", own)
+        b.set_on_click(shared)
+        image = jQueryImage("destroy_test.png", b"not really an image")
+        stack = Stack([Stack([a, image])])
+        outer = Stack([stack, b])
+        outer.prepare_application(gizmo)
+        handlers = gizmo._manager.filename_to_http_handler
+        self.assertIn(image.filename, handlers)
+        self.assertIn(own, gizmo._callable_to_oid)
+        cache_names = [c.cache_name for c in stack.component_tree()]
+        self.assertEqual(len(cache_names), 4)
+        with mock.patch("H5Gizmos.python.gz_components.do") as sent:
+            stack.destroy()
+        # one message releases all the javascript caches.
+        self.assertEqual(sent.call_count, 1)
+        self.assertNotIn(image.filename, handlers)
+        self.assertNotIn(own, gizmo._callable_to_oid)
+        for cache_name in cache_names:
+            self.assertIsNone(getattr(gizmo, cache_name))
+        self.assertIsNone(a.element)
+        self.assertIsNone(a.cached_dom_element_reference)
+        # b still uses the shared callback.
+        self.assertIn(shared, gizmo._callable_to_oid)
+        with mock.patch("H5Gizmos.python.gz_components.do"):
+            b.destroy()
+        self.assertNotIn(shared, gizmo._callable_to_oid)
+        self.assertEqual(gizmo._callback_holders, {})
+        # the destroyed components drop their callback references.
+        self.assertEqual(a.event_name_to_callback_and_depth, {})
+        self.assertIsNone(a.on_click)
+
+    async def test_replaced_callbacks_are_released(self):
+        S = GzServer()
+        gizmo = S.gizmo(title="replace")
+        (first, second, third) = (lambda *args: 1, lambda *args: 2, lambda *args: 3)
+        text = Text("t")
+        text.on("dblclick", first)
+        text.set_on_click(third)
+        text.prepare_application(gizmo)
+        self.assertIn(first, gizmo._callable_to_oid)
+        text.on("dblclick", second)
+        self.assertNotIn(first, gizmo._callable_to_oid)
+        self.assertIn(second, gizmo._callable_to_oid)
+        text.off("dblclick")
+        self.assertNotIn(second, gizmo._callable_to_oid)
+        text.set_on_click(first)
+        self.assertNotIn(third, gizmo._callable_to_oid)
+
+    async def test_callbacks_registered_elsewhere_are_kept(self):
+        S = GzServer()
+        gizmo = S.gizmo(title="foreign")
+        callback = lambda *args: None
+        # registered by non-component code first.
+        gizmo._register_callback(callback)
+        text = Text("t")
+        text.set_on_click(callback)
+        text.prepare_application(gizmo)
+        with mock.patch("H5Gizmos.python.gz_components.do"):
+            text.destroy()
+        self.assertIn(callback, gizmo._callable_to_oid)
+        self.assertEqual(gizmo._callback_holders, {})
+
+    async def test_store_array_keeps_shared_progress_callbacks(self):
+        import numpy as np
+        S = GzServer()
+        gizmo = S.gizmo(title="progress")
+        text = Text("t")
+        text.prepare_application(gizmo)
+        async def fake_get(command, timeout=None):
+            # sending the command registers the progress callback.
+            gizmo._register_callback(progress)
+            return 8
+        shared = lambda *args: None
+        gizmo._register_callback(shared)
+        for (progress, kept) in ((shared, True), (lambda *args: None, False)):
+            with mock.patch("H5Gizmos.python.gz_components.get", fake_get), \
+                    mock.patch("H5Gizmos.python.gz_components.do"):
+                await text.store_array(np.arange(2, dtype=np.int32), "stored", on_progress=progress)
+            self.assertEqual(progress in gizmo._callable_to_oid, kept)
+        self.assertEqual(gizmo._callback_holders, {})
@@ -0,0 +1,44 @@
+import unittest
+
+import numpy as np
+
+from H5Gizmos.python.gz_plotly import Plot, plotly_column, plotly_traces
+
+class TestPlotlyColumns(unittest.TestCase):
+
+    def test_columns(self):
+        self.assertEqual(plotly_column(np.arange(3)).dtype, np.float64)
+        self.assertEqual(plotly_column(np.arange(3, dtype=np.int32)).dtype, np.int32)
+        self.assertEqual(plotly_column([1, 2.5]).dtype, np.float64)
+        self.assertEqual(plotly_column(["a", 1]), ["a", 1])
+        self.assertEqual(plotly_column("lines"), "lines")
+        trace = plotly_traces([dict(x=[1, 2], y=np.arange(2), marker=dict(color=np.arange(2, dtype=np.uint64)))])[0]
+        self.assertEqual(trace["y"].dtype, np.float64)
+        self.assertEqual(trace["marker"]["color"].dtype, np.float64)
+
+    def test_only_data_arrays_are_converted(self):
+        trace = plotly_traces(dict(
+            x=[1, 2], text=[3, 4], ids=[5, 6], selectedpoints=[0], customdata=[7, 8],
+            marker=dict(size=[9, 10], symbol=[1, 2])))
+        self.assertEqual(trace["x"].dtype, np.float64)
+        self.assertEqual(trace["marker"]["size"].dtype, np.float64)
+        for key in ("text", "ids", "selectedpoints", "customdata"):
+            self.assertIsInstance(trace[key], list)
+        self.assertEqual(trace["marker"]["symbol"], [1, 2])
+
+    def test_extend_and_update(self):
+        P = Plot([dict(x=[0, 1], y=[5, 6]), dict(x=[0], y=[7], name="second")])
+        P.extend({0: dict(x=[2, 3], y=[7, 8]), 1: dict(x=[1], y=[9])}, max_points=3)
+        self.assertEqual(P.plotly_data[0]["x"].tolist(), [1, 2, 3])
+        self.assertEqual(P.plotly_data[0]["y"].tolist(), [6, 7, 8])
+        self.assertEqual(P.plotly_data[1]["y"].tolist(), [7, 9])
+        P.extend({0: dict(y=[9], text=["late"])}, max_points=3)
+        self.assertEqual(P.plotly_data[0]["text"], ["late"])
+        self.assertEqual(P.plotly_data[0]["y"].tolist(), [7, 8, 9])
+        with self.assertRaises(AssertionError):
+            P.extend({0: dict(x=[4]), 1: dict(x=[2], y=[1])})
+        P.update(layout=dict(title="updated"))
+        self.assertEqual(P.plotly_layout, dict(title="updated"))
+        P.update([dict(x=np.arange(4), y=np.arange(4))])
+        self.assertEqual(len(P.plotly_data), 1)
+        self.assertEqual(P.plotly_data[0]["x"].dtype, np.float64)
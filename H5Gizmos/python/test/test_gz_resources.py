@@ -11,6 +11,7 @@ from H5Gizmos.python.gz_resources import (
     Resource,
     get_file_path,
 )
+from H5Gizmos.python.test.fake_http import FakeRequest, FakeInterface
 
 class TestHTMLGeneration(unittest.TestCase):
 
@@ -36,6 +37,102 @@ class TestHTMLGeneration(unittest.TestCase):
         #self.assertIsNone(R.configure_in_gizmo_manager())
 
 
+class TestCachedPage(unittest.IsolatedAsyncioTestCase):
+
+    async def test_cached_etag_and_not_modified(self):
+        P = HTMLPage(title="cached", embed_gizmo=False)
+        P.remote_js("https://unpkg.com/wavesurfer.js")
+        I = FakeInterface()
+        (body, status, ctype, headers) = await P.handle_get(None, FakeRequest(), I)
+        self.assertEqual(status, 200)
+        self.assertIn(b"wavesurfer", body)
+        etag = headers["ETag"]
+        self.assertIs(P.render()[0], body)
+        (body2, status2, _, _) = await P.handle_get(None, FakeRequest(headers={"If-None-Match": etag}), I)
+        self.assertEqual(status2, 304)
+        self.assertIsNone(body2)
+        # changing the page invalidates the cached rendering
+        P.embedded_script("var x = 1;")
+        (body3, status3, _, headers3) = await P.handle_get(None, FakeRequest(headers={"If-None-Match": etag}), I)
+        self.assertEqual(status3, 200)
+        self.assertNotEqual(headers3["ETag"], etag)
+
+    async def test_gzip_variant(self):
+        import gzip
+        P = HTMLPage(title="zipped", embed_gizmo=True)
+        for i in range(20):
+            P.link_reference("ref%s" % i, "window")
+        I = FakeInterface()
+        (body, status, ctype, headers) = await P.handle_get(None, FakeRequest(headers={"Accept-Encoding": "gzip, deflate"}), I)
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(body), P.as_string().encode("utf-8"))
+
+    def test_preload_hints(self):
+        P = HTMLPage(title="hints", embed_gizmo=False, preload_hints=True)
+        P.remote_css("./style.css")
+        P.remote_js("./late.js", in_body=True)
+        S = P.as_string()
+        self.assertIn('<link rel="preload" href="./late.js" as="script"/>', S)
+        self.assertIn('<link rel="preload" href="./style.css" as="style"/>', S)
+        self.assertLess(S.index('rel="preload" href="./late.js"'), S.index("</head>"))
+        self.assertNotIn("preload", HTMLPage(title="none", embed_gizmo=False, preload_hints=False).as_string())
+
+class TestResourceBundler(unittest.TestCase):
+
+    def test_bundles_local_head_resources(self):
+        import tempfile
+        from H5Gizmos.python.gizmo_server import GzServer
+        from H5Gizmos.python.gz_resources import ResourceBundler
+        with tempfile.TemporaryDirectory() as folder:
+            static = os.path.join(folder, "static")
+            os.mkdir(static)
+            for (name, text) in [("a.js", "var a = 1"), ("b.js", "var b = 2;"), ("c.css", "p { background: url(img/x.png); }"), ("d.css", "h1 { color: red; }")]:
+                with open(os.path.join(static, name), "w") as f:
+                    f.write(text)
+            mgr = GzServer().get_new_manager()
+            mgr.serve_folder(static, "STATIC")
+            bundler = ResourceBundler(mgr, folder=os.path.join(folder, "cache"), minify=False)
+            P = HTMLPage(title="bundled", embed_gizmo=False, bundler=bundler)
+            P.remote_js("./STATIC/a.js")
+            P.remote_css("./STATIC/c.css")
+            P.remote_js("./STATIC/b.js")
+            P.remote_css("./STATIC/d.css")
+            P.remote_js("https://unpkg.com/wavesurfer.js")
+            S = P.as_string()
+            self.assertNotIn("a.js", S)
+            self.assertIn("wavesurfer.js", S)
+            bundles = [fn for fn in mgr.filename_to_http_handler if fn.startswith("gizmo_bundle_")]
+            self.assertEqual(len(bundles), 2)
+            [js] = [fn for fn in bundles if fn.endswith(".js")]
+            self.assertLess(S.index(js), S.index("wavesurfer.js"))
+            content = open(mgr.filename_to_http_handler[js].fs_path).read()
+            self.assertLess(content.index("var a = 1"), content.index("var b = 2"))
+            [css] = [fn for fn in bundles if fn.endswith(".css")]
+            content = open(mgr.filename_to_http_handler[css].fs_path).read()
+            self.assertIn("url(./STATIC/img/x.png)", content)
+            # a new page for the same files reuses the disk cache
+            self.assertEqual(len(os.listdir(os.path.join(folder, "cache"))), 2)
+            P2 = HTMLPage(title="again", embed_gizmo=False, bundler=ResourceBundler(mgr, folder=bundler.folder, minify=False))
+            P2.remote_js("./STATIC/a.js")
+            P2.remote_js("./STATIC/b.js")
+            self.assertIn(js, P2.as_string())
+            self.assertEqual(len(os.listdir(os.path.join(folder, "cache"))), 2)
+
+    def test_stale_bundles_are_removed(self):
+        import tempfile
+        import time
+        from H5Gizmos.python.gz_resources import ResourceBundler
+        with tempfile.TemporaryDirectory() as folder:
+            bundler = ResourceBundler(None, folder=folder, max_bytes=2500)
+            for index in range(4):
+                path = os.path.join(folder, "bundle_%s.js" % index)
+                with open(path, "wb") as f:
+                    f.write(b"x" * 1000)
+                os.utime(path, (time.time() + index, time.time() + index))
+            bundler.remove_stale_bundles(keep=os.path.join(folder, "bundle_0.js"))
+            # the oldest bundles go first, but never the one just written.
+            self.assertEqual(sorted(os.listdir(folder)), ["bundle_0.js", "bundle_3.js"])
+
 class TestFileNames(unittest.TestCase):
 
     def test_finds_local_test_file_folder(self):
@@ -0,0 +1,63 @@
+import unittest
+import asyncio
+import io
+
+import numpy as np
+
+from H5Gizmos.python.gizmo_server import GzServer
+from H5Gizmos.python.gz_tiled_image import (
+    TiledImage, TileGetter, TiledImageError, pyramid_levels, tile_pixels,
+)
+from H5Gizmos.python.test.fake_http import FakeRequest, FakeInterface
+
+def png_pixels(body):
+    from PIL import Image
+    return np.array(Image.open(io.BytesIO(body)))
+
+class TestTiledImage(unittest.IsolatedAsyncioTestCase):
+
+    def test_pyramid(self):
+        self.assertEqual(pyramid_levels(100, 100, 256), 1)
+        self.assertEqual(pyramid_levels(40000, 30000, 256), 9)
+        A = np.arange(100 * 60).reshape((100, 60))
+        tile = tile_pixels(A, 1, 1, 0, 16, 0, A.max())
+        self.assertEqual(tile.shape, (16, 14))
+        self.assertEqual(tile.dtype, np.uint8)
+        tile = tile_pixels(A.astype(np.uint8), 2, 0, 1, 16)
+        self.assertEqual(tile.shape, (9, 15))
+        self.assertEqual(tile[0, 1], A.astype(np.uint8)[64, 4])
+        with self.assertRaises(TiledImageError):
+            TiledImage(np.zeros((4, 4, 2)))
+
+    async def test_tiles_and_pixels(self):
+        S = GzServer()
+        gizmo = S.gizmo(title="tiles")
+        A = (np.arange(300 * 500) % 251).astype(np.uint8).reshape((300, 500))
+        viewer = TiledImage(A, tile_size=128, cache_tiles=3)
+        self.assertEqual(viewer.levels, 3)
+        viewer.prepare_application(gizmo)
+        viewer.get_element(gizmo)
+        getter = gizmo._manager.filename_to_http_handler[viewer.getter_name]
+        self.assertIsInstance(getter, TileGetter)
+        (body, status, ctype, headers) = await getter.handle_get(
+            None, FakeRequest(level="0", x="3", y="2"), FakeInterface())
+        self.assertEqual(ctype, "image/png")
+        self.assertEqual(png_pixels(body).tolist(), A[256:, 384:].tolist())
+        (body, status, ctype, headers) = await getter.handle_get(
+            None, FakeRequest(level="2", x="0", y="0"), FakeInterface())
+        self.assertEqual(png_pixels(body).tolist(), A[::4, ::4].tolist())
+        (body, status, ctype, headers) = await getter.handle_get(
+            None, FakeRequest(level="0", x="4", y="0"), FakeInterface())
+        self.assertEqual(status, 404)
+        (body, status, ctype, headers) = await getter.handle_get(
+            None, FakeRequest(level="zero", x="0", y="0"), FakeInterface())
+        self.assertEqual(status, 404)
+        # neighbors are prefetched into the least recently used cache.
+        await asyncio.sleep(0.2)
+        self.assertLessEqual(len(viewer.tiles), 3)
+        self.assertIn((0, 2, 2), viewer.tiles)
+        found = []
+        viewer.on_pixel(found.append, delay=0)
+        viewer._pixel_callback(dict(type="click", pixel_row=299, pixel_column=700))
+        self.assertEqual((found[0]["pixel_row"], found[0]["pixel_column"]), (299, 499))
+        self.assertEqual(found[0]["pixel_data"], A[299, 499])
@@ -0,0 +1,75 @@
+import unittest
+
+import numpy as np
+
+from H5Gizmos.python.gz_time_series import TimeSeries, RingBuffer, min_max_decimate, lttb
+
+class TestRingBuffer(unittest.TestCase):
+
+    def test_wrap_around(self):
+        R = RingBuffer(5)
+        R.append([0, 1, 2])
+        R.append([3, 4, 5, 6])
+        self.assertEqual(len(R), 5)
+        self.assertEqual(R.values().tolist(), [2, 3, 4, 5, 6])
+        self.assertEqual(R.since(5).tolist(), [5, 6])
+        self.assertEqual(R.since(0).tolist(), [2, 3, 4, 5, 6])
+        R.append(np.arange(10, 22))
+        self.assertEqual(R.values().tolist(), [17, 18, 19, 20, 21])
+        self.assertEqual(R.total, 19)
+        R2 = RingBuffer(3, 2)
+        R2.append([[1, 2], [3, 4]])
+        self.assertEqual(R2.since(1).tolist(), [[3, 4]])
+
+class TestDecimation(unittest.TestCase):
+
+    def test_min_max(self):
+        t = np.arange(8.0)
+        y = np.array([1, 5, 0, 2, 7, 7, 3, 9.0])
+        bins = np.array([0, 0, 0, 1, 1, 1, 2, 3])
+        (td, yd) = min_max_decimate(t, y, bins)
+        self.assertEqual(td.tolist(), [1, 2, 3, 4, 6, 7])
+        self.assertEqual(yd.tolist(), [5, 0, 2, 7, 3, 9])
+
+    def test_lttb(self):
+        t = np.arange(1000.0)
+        y = np.sin(t / 50)
+        y[500] = 10
+        (td, yd) = lttb(t, y, 50)
+        self.assertEqual(len(td), 50)
+        self.assertEqual((td[0], td[-1]), (0, 999))
+        self.assertIn(500, td.tolist())
+        self.assertTrue(np.all(np.diff(td) > 0))
+
+class TestTimeSeries(unittest.TestCase):
+
+    def test_frames_send_new_decimated_points(self):
+        T = TimeSeries(series=["a", "b"], window=1.0, width=10, capacity=10000)
+        t = np.arange(1000) / 1000.0
+        T.append(t, np.stack([t, -t], axis=1))
+        T.send_frame()
+        # 9 completed bins of 100 points become 9 min/max pairs; the last bin is held back.
+        self.assertEqual(len(T.plotly_data[0]["x"]), 18)
+        self.assertEqual(T.plotly_data[1]["y"][-1], -t[899])
+        T.append(1.0, [1.0, -1.0])
+        T.send_frame()
+        self.assertEqual(len(T.plotly_data[0]["x"]), 20)
+        # no new data: the held back bin is sent.
+        T.send_frame()
+        self.assertEqual(T.plotly_data[0]["x"][-1], 1.0)
+        self.assertEqual(T.unsent, 1001)
+
+    def test_zoom_and_follow(self):
+        T = TimeSeries(window=1.0, width=10, method="lttb")
+        t = np.arange(10000) / 1000.0
+        T.append(t, np.sin(t))
+        T.relayout({"xaxis.range[0]": 2.0, "xaxis.range[1]": 3.0})
+        self.assertFalse(T.following)
+        self.assertEqual(T.plotly_layout["xaxis"]["range"], [2.0, 3.0])
+        x = T.plotly_data[0]["x"]
+        self.assertLessEqual(len(x), 20)
+        self.assertTrue(2.0 <= x.min() and x.max() <= 3.0)
+        T.relayout({"xaxis.autorange": True})
+        self.assertTrue(T.following)
+        x = T.plotly_data[0]["x"]
+        self.assertTrue(x.min() >= 8.9)
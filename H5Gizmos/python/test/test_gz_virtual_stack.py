@@ -0,0 +1,42 @@
+
+import unittest
+import json
+
+from H5Gizmos.python.gizmo_server import GzServer
+from H5Gizmos.python.gz_virtual_stack import VirtualStack, RowWindowGetter
+from H5Gizmos.python.test.fake_http import FakeRequest, FakeInterface
+
+class TestVirtualStack(unittest.IsolatedAsyncioTestCase):
+
+    def test_rows_are_clipped(self):
+        stack = VirtualStack(["a", "<b>", "c"])
+        self.assertEqual(stack.rows(1, 10), ["&lt;b&gt;", "c"])
+        self.assertEqual(stack.rows(5, 10), [])
+        stack = VirtualStack(row_maker=lambda i: "<div>%s</div>" % i, row_count=10 ** 9)
+        self.assertEqual(stack.rows(10 ** 9 - 1, 100), ["<div>999999999</div>"])
+
+    async def test_window_getter_and_refresh(self):
+        S = GzServer()
+        gizmo = S.gizmo(title="virtual")
+        items = list(range(1000000))
+        stack = VirtualStack(items, row_maker=lambda x: "row %s" % x)
+        stack.prepare_application(gizmo)
+        stack.get_element(gizmo)
+        getter = gizmo._manager.filename_to_http_handler[stack.getter_name]
+        self.assertIsInstance(getter, RowWindowGetter)
+        (body, status, ctype, headers) = await getter.handle_get(
+            None, FakeRequest(start="500", count="3"), FakeInterface())
+        self.assertEqual(ctype, "application/json")
+        self.assertEqual(json.loads(body), dict(start=500, version=0, rows=["row 500", "row 501", "row 502"]))
+        # malformed windows are rejected and large windows are clamped to the window size.
+        (body, status, ctype, headers) = await getter.handle_get(
+            None, FakeRequest(start="x", count="3"), FakeInterface())
+        self.assertEqual(status, 400)
+        (body, status, ctype, headers) = await getter.handle_get(
+            None, FakeRequest(start="0", count="1000000"), FakeInterface())
+        self.assertEqual(len(json.loads(body)["rows"]), stack.window_size)
+        stack.set_rows(["x"])
+        self.assertEqual(stack.version, 1)
+        (body, status, ctype, headers) = await getter.handle_get(
+            None, FakeRequest(start="0", count="100"), FakeInterface())
+        self.assertEqual(json.loads(body)["rows"], ["x"])
@@ -0,0 +1,169 @@
+
+// Browser side of the gz_data_grid.DataGrid component.
+// Sorting and filtering happen in Python: the browser shows a header row with sort
+// buttons and filter inputs over a virtual_stack.js row list which fetches windows of
+// visible rows in binary columnar form.  Requires virtual_stack.js.
+
+var H5GIZMOS_GRID_TYPED_ARRAYS = {
+    int8: Int8Array, uint8: Uint8Array, int16: Int16Array, uint16: Uint16Array,
+    int32: Int32Array, uint32: Uint32Array, float32: Float32Array, float64: Float64Array,
+};
+
+function H5Gizmos_decode_columns(buffer) {
+    // Decode a window: uint32 header length, JSON header, then 8 byte aligned column blocks.
+    var view = new DataView(buffer);
+    var header_length = view.getUint32(0, true);
+    var header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, header_length)));
+    var base = 8 * Math.ceil((4 + header_length) / 8);
+    var count = header.count;
+    var columns = [];
+    for (var c of header.columns) {
+        var values;
+        if (c.kind == "text") {
+            var offsets = new Uint32Array(buffer, base + c.offsets, count + 1);
+            var bytes = new Uint8Array(buffer, base + c.offset, offsets[count]);
+            var decoder = new TextDecoder();
+            values = [];
+            for (var i = 0; i < count; i++) {
+                values.push(decoder.decode(bytes.subarray(offsets[i], offsets[i + 1])));
+            }
+        } else {
+            values = new H5GIZMOS_GRID_TYPED_ARRAYS[c.dtype](buffer, base + c.offset, count);
+        }
+        columns.push({name: c.name, kind: c.kind, values: values});
+    }
+    header.columns = columns;
+    return header;
+};
+
+function H5Gizmos_grid_cell_text(kind, value) {
+    if (kind == "bool") {
+        return value ? "true" : "false";
+    }
+    if (kind == "float") {
+        return Number.isInteger(value) ? String(value) : String(Number(value.toPrecision(7)));
+    }
+    return String(value);
+};
+
+function H5Gizmos_grid_escape(text) {
+    return text.replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;");
+};
+
+class H5Gizmos_GridRows extends H5Gizmos_VirtualStack {
+    constructor(grid, element, url, options) {
+        super(element, url, options);
+        this.grid = grid;
+    };
+    load_rows(url) {
+        var grid = this.grid;
+        return fetch(url).then(function (response) {
+            return response.arrayBuffer();
+        }).then(function (buffer) {
+            var data = H5Gizmos_decode_columns(buffer);
+            grid.show_counts(data.total, data.nrows);
+            var rows = [];
+            for (var i = 0; i < data.count; i++) {
+                var cells = [];
+                for (var c of data.columns) {
+                    var text = H5Gizmos_grid_escape(H5Gizmos_grid_cell_text(c.kind, c.values[i]));
+                    cells.push('<span class="H5Gizmo-grid-cell" title="' + text.replace(/"/g, "&quot;") + '">' + text + '</span>');
+                }
+                rows.push(cells.join(""));
+            }
+            return rows;
+        });
+    };
+};
+
+class H5Gizmos_DataGrid {
+    constructor(element, url, options) {
+        var that = this;
+        this.$element = jQuery(element);
+        this.$element.empty().css({display: "flex", "flex-direction": "column"});
+        this.column_width = options.column_width;
+        this.on_sort = null;
+        this.on_filter = null;
+        this.$header = jQuery('<div class="H5Gizmo-grid-header"/>').css({
+            overflow: "hidden", "white-space": "nowrap", "flex": "none", "font-weight": "bold",
+        }).appendTo(this.$element);
+        var $body = jQuery('<div class="H5Gizmo-grid-body"/>').css({
+            flex: "1 1 auto", "min-height": "0px",
+        }).appendTo(this.$element);
+        this.$footer = jQuery('<div class="H5Gizmo-grid-footer"/>').css({flex: "none"}).appendTo(this.$element);
+        this.rows = new H5Gizmos_GridRows(this, $body[0], url, options);
+        $body.on("scroll", function () {
+            that.$header[0].scrollLeft = this.scrollLeft;
+        });
+        this.set_columns(options.columns, options.sort_column, options.ascending);
+        this.show_counts(options.count, options.nrows);
+    };
+    set_columns(names, sort_column, ascending) {
+        // (Re)build the header and the cell styles for the column names.
+        var that = this;
+        var width = this.column_width;
+        this.$header.empty();
+        this.names = names;
+        this.$labels = [];
+        names.forEach(function (name, index) {
+            var $cell = jQuery('<span class="H5Gizmo-grid-cell"/>').appendTo(that.$header);
+            var $label = jQuery('<div/>').css({cursor: "pointer"}).attr("title", "sort by " + name)
+                .on("click", function () {
+                    if (that.on_sort) { that.on_sort(index); }
+                }).appendTo($cell);
+            jQuery('<input type="text" placeholder="filter"/>').css({width: (width - 8) + "px"})
+                .on("change", function () {
+                    if (that.on_filter) { that.on_filter(index, this.value); }
+                }).appendTo($cell);
+            that.$labels.push($label);
+        });
+        this.show_sort(sort_column, ascending);
+        var row_width = (names.length * width) + "px";
+        this.$element.find("style").remove();
+        var scope = "#" + this.element_id();
+        jQuery("<style/>").text(
+            scope + " .H5Gizmo-grid-cell { display: inline-block; box-sizing: border-box; padding: 0px 4px;" +
+            " overflow: hidden; white-space: nowrap; text-overflow: ellipsis; width: " + width + "px; }" +
+            scope + " .H5Gizmo-virtual-row { width: " + row_width + "; white-space: nowrap; }"
+        ).appendTo(this.$element);
+    };
+    show_sort(sort_column, ascending) {
+        // Mark the sorted column in the header (sort_column is null if unsorted).
+        var that = this;
+        this.names.forEach(function (name, index) {
+            var mark = (index === sort_column) ? (ascending ? " \u25B2" : " \u25BC") : "";
+            that.$labels[index].text(name + mark);
+        });
+    };
+    element_id() {
+        var id = this.$element.attr("id");
+        if (!id) {
+            id = "H5Gizmo_grid_" + Math.floor(Math.random() * 1e9);
+            this.$element.attr("id", id);
+        }
+        return id;
+    };
+    show_counts(total, nrows) {
+        var text = total + " rows";
+        if (total != nrows) {
+            text += " (filtered from " + nrows + ")";
+        }
+        this.$footer.text(text);
+    };
+    set_handlers(on_sort, on_filter, on_click) {
+        this.on_sort = on_sort;
+        this.on_filter = on_filter;
+        this.rows.set_on_click(on_click);
+    };
+    reset(count, version, nrows) {
+        this.show_counts(count, nrows);
+        this.rows.reset(count, version);
+    };
+    scroll_to(index) {
+        this.rows.scroll_to(index);
+    };
+};
+
+function H5Gizmos_data_grid(element, url, options) {
+    return new H5Gizmos_DataGrid(element, url, options);
+};
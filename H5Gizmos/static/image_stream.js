@@ -0,0 +1,94 @@
+
+// Browser side of the gz_image_stream.ImageStream component.
+// Long poll the frame getter for the newest frame and draw it into the canvas.
+// The next frame is only requested after the last one is drawn, so when the
+// browser falls behind the Python side skips the frames in between.
+
+var H5GIZMOS_FRAME_MIME_TYPES = {jpeg: "image/jpeg", webp: "image/webp"};
+
+class H5Gizmos_ImageStream {
+    constructor(canvas, url) {
+        this.canvas = jQuery(canvas)[0];
+        this.context = this.canvas.getContext("2d");
+        this.url = url;
+        this.seq = -1;
+        this.stopped = false;
+        this.run();
+    };
+    stop() {
+        this.stopped = true;
+    };
+    destroy() {
+        this.stop();
+    };
+    async run() {
+        while (!this.stopped) {
+            try {
+                var response = await fetch(this.url + "?after=" + this.seq);
+                if (response.status == 204) {
+                    continue;  // no new frame yet
+                }
+                if (!response.ok) {
+                    throw new Error("frame request failed: " + response.status);
+                }
+                await this.draw(await response.arrayBuffer());
+            } catch (error) {
+                if (!document.body.contains(this.canvas)) {
+                    this.stopped = true;
+                    break;
+                }
+                console.warn("image stream", error);
+                await new Promise(function (resolve) { setTimeout(resolve, 1000); });
+            }
+        }
+    };
+    async draw(buffer) {
+        var header_length = new DataView(buffer).getUint32(0, true);
+        var header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, header_length)));
+        var payload = new Uint8Array(buffer, 4 + header_length);
+        var canvas = this.canvas;
+        if (canvas.width != header.width || canvas.height != header.height) {
+            canvas.width = header.width;
+            canvas.height = header.height;
+        }
+        if (header.w && header.h) {
+            var mime_type = H5GIZMOS_FRAME_MIME_TYPES[header.format];
+            if (mime_type) {
+                var bitmap = await createImageBitmap(new Blob([payload], {type: mime_type}));
+                this.context.drawImage(bitmap, header.x, header.y);
+                bitmap.close();
+            } else {
+                var image = new ImageData(this.rgba(payload, header.channels, header.w * header.h), header.w, header.h);
+                this.context.putImageData(image, header.x, header.y);
+            }
+        }
+        this.seq = header.seq;
+    };
+    rgba(payload, channels, npixels) {
+        // Expand gray (1), RGB (3) or 3-3-2 quantized (0) pixels to RGBA.
+        if (channels == 4) {
+            return new Uint8ClampedArray(payload.buffer, payload.byteOffset, 4 * npixels);
+        }
+        var result = new Uint8ClampedArray(4 * npixels);
+        for (var i = 0, j = 0; i < npixels; i++, j += 4) {
+            if (channels == 3) {
+                result[j] = payload[3 * i];
+                result[j + 1] = payload[3 * i + 1];
+                result[j + 2] = payload[3 * i + 2];
+            } else if (channels == 1) {
+                result[j] = result[j + 1] = result[j + 2] = payload[i];
+            } else {
+                var q = payload[i];
+                result[j] = q & 0xE0;
+                result[j + 1] = (q << 3) & 0xE0;
+                result[j + 2] = (q << 6) & 0xC0;
+            }
+            result[j + 3] = 255;
+        }
+        return result;
+    };
+};
+
+function H5Gizmos_image_stream(canvas, url) {
+    return new H5Gizmos_ImageStream(canvas, url);
+};
@@ -0,0 +1,224 @@
+
+// Browser side of the gz_tiled_image.TiledImage component.
+// Show the tiles of the image pyramid level matching the zoom which cover the view.
+// Tiles of the previous level stay underneath until the new level has loaded.
+
+class H5Gizmos_TiledImage {
+    constructor(element, url, options) {
+        var that = this;
+        this.$element = jQuery(element);
+        this.element = this.$element[0];
+        this.url = url;
+        this.tiles = new Map();   // "level/x/y" --> img element
+        this.level = 0;
+        this.scheduled = false;
+        this.drag = null;
+        this.dragged = false;
+        this.$element.css({position: "relative", overflow: "hidden", cursor: "grab", "touch-action": "none"});
+        this.element.addEventListener("pointerdown", function (event) { that.start_drag(event); });
+        this.element.addEventListener("pointermove", function (event) { that.move_drag(event); });
+        this.element.addEventListener("pointerup", function (event) { that.end_drag(event); });
+        this.element.addEventListener("wheel", function (event) { that.wheel(event); }, {passive: false});
+        this.observer = null;
+        if (window.ResizeObserver) {
+            this.observer = new ResizeObserver(function() { that.schedule_render(); });
+            this.observer.observe(this.element);
+        }
+        this.set_image(options);
+    };
+    destroy() {
+        if (this.observer) {
+            this.observer.disconnect();
+        }
+        this.tiles.clear();
+    };
+    set_image(options) {
+        this.img_height = options.img_height;
+        this.img_width = options.img_width;
+        this.tile_size = options.tile_size;
+        this.levels = options.levels;
+        this.version = options.version;
+        for (var img of this.tiles.values()) {
+            img.remove();
+        }
+        this.tiles.clear();
+        this.fit();
+    };
+    fit() {
+        // Zoom so the whole image is visible and centered.
+        var cw = this.element.clientWidth || this.img_width;
+        var ch = this.element.clientHeight || this.img_height;
+        this.zoom = Math.min(cw / this.img_width, ch / this.img_height);
+        this.offset_x = (cw - this.img_width * this.zoom) / 2;
+        this.offset_y = (ch - this.img_height * this.zoom) / 2;
+        this.schedule_render();
+    };
+    center_on(row, column, zoom) {
+        if (zoom) {
+            this.zoom = zoom;
+        }
+        this.offset_x = this.element.clientWidth / 2 - (column + 0.5) * this.zoom;
+        this.offset_y = this.element.clientHeight / 2 - (row + 0.5) * this.zoom;
+        this.schedule_render();
+    };
+    zoom_at(factor, sx, sy) {
+        // Zoom by factor keeping the image point under screen position (sx, sy) in place.
+        var min_zoom = 0.5 * Math.min(this.element.clientWidth / this.img_width, this.element.clientHeight / this.img_height);
+        var zoom = Math.min(64, Math.max(min_zoom, this.zoom * factor));
+        this.offset_x = sx - (sx - this.offset_x) * zoom / this.zoom;
+        this.offset_y = sy - (sy - this.offset_y) * zoom / this.zoom;
+        this.zoom = zoom;
+        this.schedule_render();
+    };
+    screen_position(event) {
+        var rect = this.element.getBoundingClientRect();
+        return [event.clientX - rect.left, event.clientY - rect.top];
+    };
+    wheel(event) {
+        event.preventDefault();
+        var [sx, sy] = this.screen_position(event);
+        this.zoom_at(Math.pow(1.2, -Math.sign(event.deltaY)), sx, sy);
+    };
+    start_drag(event) {
+        this.drag = [event.clientX, event.clientY, this.offset_x, this.offset_y];
+        this.dragged = false;
+        this.element.setPointerCapture(event.pointerId);
+        this.element.style.cursor = "grabbing";
+    };
+    move_drag(event) {
+        if (!this.drag) {
+            return;
+        }
+        var [x, y, ox, oy] = this.drag;
+        var dx = event.clientX - x;
+        var dy = event.clientY - y;
+        if (Math.abs(dx) + Math.abs(dy) > 3) {
+            this.dragged = true;
+        }
+        this.offset_x = ox + dx;
+        this.offset_y = oy + dy;
+        this.schedule_render();
+    };
+    end_drag(event) {
+        this.drag = null;
+        this.element.style.cursor = "grab";
+    };
+    on_pixel(type, callback) {
+        // Call back with full resolution pixel coordinates for events over the image.
+        var that = this;
+        this.$element.off(type + ".tiled").on(type + ".tiled", function (event) {
+            if (that.dragged && (type == "click")) {
+                return;  // end of a pan, not a click.
+            }
+            if (that.drag && (type != "click")) {
+                return;
+            }
+            var [sx, sy] = that.screen_position(event);
+            var column = Math.floor((sx - that.offset_x) / that.zoom);
+            var row = Math.floor((sy - that.offset_y) / that.zoom);
+            if ((row < 0) || (column < 0) || (row >= that.img_height) || (column >= that.img_width)) {
+                return;
+            }
+            callback({type: type, pixel_row: row, pixel_column: column, offsetX: sx, offsetY: sy});
+        });
+    };
+    schedule_render() {
+        var that = this;
+        if (!this.scheduled) {
+            this.scheduled = true;
+            requestAnimationFrame(function () { that.render(); });
+        }
+    };
+    render() {
+        this.scheduled = false;
+        var zoom = this.zoom;
+        var level = Math.max(0, Math.min(this.levels - 1, Math.floor(Math.log2(1 / zoom))));
+        this.level = level;
+        var stride = Math.pow(2, level);
+        var span = this.tile_size * stride;
+        var cw = this.element.clientWidth;
+        var ch = this.element.clientHeight;
+        var last_x = Math.ceil(this.img_width / span) - 1;
+        var last_y = Math.ceil(this.img_height / span) - 1;
+        var tx0 = Math.max(0, Math.floor(-this.offset_x / zoom / span));
+        var tx1 = Math.min(last_x, Math.floor((cw - this.offset_x) / zoom / span));
+        var ty0 = Math.max(0, Math.floor(-this.offset_y / zoom / span));
+        var ty1 = Math.min(last_y, Math.floor((ch - this.offset_y) / zoom / span));
+        var wanted = new Set();
+        for (var ty = ty0; ty <= ty1; ty++) {
+            for (var tx = tx0; tx <= tx1; tx++) {
+                var key = level + "/" + tx + "/" + ty;
+                wanted.add(key);
+                var img = this.tiles.get(key);
+                if (!img) {
+                    img = this.make_tile(level, tx, ty);
+                    this.tiles.set(key, img);
+                }
+            }
+        }
+        for (var [key, img] of this.tiles) {
+            this.place_tile(img);
+            if (!wanted.has(key) && ((img.level == level) || !this.in_view(img))) {
+                img.remove();
+                this.tiles.delete(key);
+            }
+        }
+        this.$element.css({"image-rendering": (zoom > 1) ? "pixelated" : "auto"});
+        this.drop_covered_tiles(wanted);
+    };
+    in_view(img) {
+        // Is a tile of another level inside the view (so it may show while the current level loads)?
+        var cw = this.element.clientWidth;
+        var ch = this.element.clientHeight;
+        var left = parseFloat(img.style.left);
+        var top = parseFloat(img.style.top);
+        return (left < cw) && (top < ch) && (left + parseFloat(img.style.width) > 0) && (top + parseFloat(img.style.height) > 0);
+    };
+    make_tile(level, tx, ty) {
+        var that = this;
+        var img = document.createElement("img");
+        img.level = level;
+        img.tx = tx;
+        img.ty = ty;
+        img.draggable = false;
+        img.style.position = "absolute";
+        img.style.pointerEvents = "none";
+        img.onload = function () { that.schedule_render(); };
+        img.src = this.url + "?level=" + level + "&x=" + tx + "&y=" + ty + "&v=" + this.version;
+        this.element.appendChild(img);
+        return img;
+    };
+    place_tile(img) {
+        var stride = Math.pow(2, img.level);
+        var span = this.tile_size * stride;
+        var x = img.tx * span;
+        var y = img.ty * span;
+        // tile pixels times stride covers the (possibly partial) edge tiles.
+        var w = Math.ceil(Math.min(span, this.img_width - x) / stride) * stride;
+        var h = Math.ceil(Math.min(span, this.img_height - y) / stride) * stride;
+        var zoom = this.zoom;
+        img.style.left = (this.offset_x + x * zoom) + "px";
+        img.style.top = (this.offset_y + y * zoom) + "px";
+        img.style.width = (w * zoom) + "px";
+        img.style.height = (h * zoom) + "px";
+        img.style.zIndex = (img.level == this.level) ? 2 : 1;
+    };
+    drop_covered_tiles(wanted) {
+        // Once all tiles of the current level have loaded remove the other levels.
+        for (var key of wanted) {
+            if (!this.tiles.get(key).complete) {
+                return;
+            }
+        }
+        for (var [key, img] of this.tiles) {
+            if (img.level != this.level) {
+                img.remove();
+                this.tiles.delete(key);
+            }
+        }
+    };
+};
+
+function H5Gizmos_tiled_image(element, url, options) {
+    return new H5Gizmos_TiledImage(element, url, options);
+};
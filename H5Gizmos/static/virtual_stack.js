@@ -0,0 +1,196 @@
+
+// Browser side of the gz_virtual_stack.VirtualStack component.
+// Only the rows in or near the viewport are in the DOM.  Row HTML is fetched from
+// the Python side in windows of rows as the list scrolls, the most recently used
+// windows are kept, and the row divs are recycled.
+
+// Browsers limit element heights: scale the scroll range for very long lists.
+var H5GIZMOS_VIRTUAL_MAX_HEIGHT = 10000000;
+
+class H5Gizmos_VirtualStack {
+    constructor(element, url, options) {
+        var that = this;
+        this.$element = jQuery(element);
+        this.element = this.$element[0];
+        this.url = url;
+        this.count = options.count;
+        this.row_height = options.row_height;
+        this.window_size = options.window_size;
+        this.overscan = options.overscan;
+        this.max_windows = options.max_windows;
+        this.version = options.version;
+        this.windows = new Map();  // window index --> row html list, in least recently used order.
+        this.pending = new Set();  // window indices being fetched.
+        this.slots = [];
+        this.on_click = null;
+        this.scheduled = false;
+        this.$element.css({position: "relative", overflow: "auto"});
+        this.spacer = jQuery("<div/>").css({width: "1px", height: "0px"}).appendTo(this.$element)[0];
+        this.element.addEventListener("scroll", function() { that.schedule_render(); }, {passive: true});
+        if (window.ResizeObserver) {
+            new ResizeObserver(function() { that.schedule_render(); }).observe(this.element);
+        }
+        this.$element.on("click", ".H5Gizmo-virtual-row", function() {
+            var index = this.row_index;
+            if (that.on_click && (index !== null) && (index !== undefined)) {
+                that.on_click(index);
+            }
+        });
+        this.schedule_render();
+    };
+    set_on_click(callback) {
+        this.on_click = callback;
+    };
+    reset(count, version) {
+        // The rows changed on the Python side: drop the cached windows.
+        this.count = count;
+        this.version = version;
+        this.windows.clear();
+        this.pending.clear();
+        for (var slot of this.slots) {
+            slot.row_key = null;
+        }
+        this.schedule_render();
+    };
+    schedule_render() {
+        var that = this;
+        if (!this.scheduled) {
+            this.scheduled = true;
+            requestAnimationFrame(function () { that.render(); });
+        }
+    };
+    geometry() {
+        // Return [fractional index of the first visible row, spacer height].
+        var h = this.row_height;
+        var total = this.count * h;
+        var scroll_top = this.element.scrollTop;
+        if (total <= H5GIZMOS_VIRTUAL_MAX_HEIGHT) {
+            return [scroll_top / h, total];
+        }
+        var height = H5GIZMOS_VIRTUAL_MAX_HEIGHT;
+        var max_scroll = Math.max(1, height - this.element.clientHeight);
+        var max_top = Math.max(0, this.count - this.element.clientHeight / h);
+        return [(scroll_top / max_scroll) * max_top, height];
+    };
+    scroll_to(index) {
+        var h = this.row_height;
+        var total = this.count * h;
+        if (total <= H5GIZMOS_VIRTUAL_MAX_HEIGHT) {
+            this.element.scrollTop = index * h;
+        } else {
+            var max_scroll = Math.max(1, H5GIZMOS_VIRTUAL_MAX_HEIGHT - this.element.clientHeight);
+            var max_top = Math.max(1, this.count - this.element.clientHeight / h);
+            this.element.scrollTop = (index / max_top) * max_scroll;
+        }
+        this.schedule_render();
+    };
+    render() {
+        this.scheduled = false;
+        var h = this.row_height;
+        var [top_index, height] = this.geometry();
+        this.spacer.style.height = height + "px";
+        var nslots = Math.ceil(this.element.clientHeight / h) + 1 + 2 * this.overscan;
+        if (this.slots.length != nslots) {
+            this.make_slots(nslots);
+        }
+        var first = Math.max(0, Math.floor(top_index) - this.overscan);
+        var last = Math.min(this.count, first + nslots);
+        var scroll_top = this.element.scrollTop;
+        for (var slot of this.slots) {
+            slot.in_use = false;
+        }
+        for (var index = first; index < last; index++) {
+            // Each row index always uses the same slot, so scrolling one row rewrites one slot.
+            var slot = this.slots[index % nslots];
+            slot.in_use = true;
+            slot.style.top = (scroll_top + (index - top_index) * h) + "px";
+            slot.style.display = "";
+            var html = this.row_html(index);
+            var key = (html === null) ? null : (index + ":" + this.version);
+            if (slot.row_key !== key || key === null) {
+                slot.row_index = index;
+                slot.row_key = key;
+                slot.innerHTML = (html === null) ? "" : html;
+            }
+        }
+        for (var slot of this.slots) {
+            if (!slot.in_use) {
+                slot.style.display = "none";
+                slot.row_index = null;
+            }
+        }
+        // Prefetch the window after the visible rows.
+        if (last < this.count) {
+            this.row_html(Math.min(this.count - 1, last + this.overscan));
+        }
+    };
+    make_slots(nslots) {
+        for (var slot of this.slots) {
+            slot.remove();
+        }
+        this.slots = [];
+        for (var i = 0; i < nslots; i++) {
+            var slot = document.createElement("div");
+            slot.className = "H5Gizmo-virtual-row";
+            slot.style.position = "absolute";
+            slot.style.left = "0px";
+            slot.style.right = "0px";
+            slot.style.height = this.row_height + "px";
+            slot.style.overflow = "hidden";
+            slot.row_key = null;
+            slot.row_index = null;
+            this.element.appendChild(slot);
+            this.slots.push(slot);
+        }
+    };
+    row_html(index) {
+        // Return the row html or null if not loaded yet (and start loading its window).
+        var window_index = Math.floor(index / this.window_size);
+        var rows = this.windows.get(window_index);
+        if (rows) {
+            // most recently used goes last.
+            this.windows.delete(window_index);
+            this.windows.set(window_index, rows);
+            var html = rows[index - window_index * this.window_size];
+            return (html === undefined) ? "" : html;
+        }
+        this.fetch_window(window_index);
+        return null;
+    };
+    load_rows(url) {
+        // Promise for the list of row html strings for the window url (override to change the format).
+        return fetch(url).then(function (response) {
+            return response.json();
+        }).then(function (data) {
+            return data.rows;
+        });
+    };
+    fetch_window(window_index) {
+        var that = this;
+        if (this.pending.has(window_index)) {
+            return;
+        }
+        this.pending.add(window_index);
+        var version = this.version;
+        var start = window_index * this.window_size;
+        var url = this.url + "?start=" + start + "&count=" + this.window_size + "&version=" + version;
+        this.load_rows(url).then(function (rows) {
+            if (version !== that.version) {
+                return;  // stale
+            }
+            that.pending.delete(window_index);
+            that.windows.set(window_index, rows);
+            while (that.windows.size > that.max_windows) {
+                that.windows.delete(that.windows.keys().next().value);
+            }
+            that.schedule_render();
+        }).catch(function (error) {
+            that.pending.delete(window_index);
+            console.warn("virtual stack fetch failed", url, error);
+        });
+    };
+};
+
+function H5Gizmos_virtual_stack(element, url, options) {
+    return new H5Gizmos_VirtualStack(element, url, options);
+};
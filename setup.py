@@ -28,6 +28,7 @@ setup(
         'jupyter-server-proxy',
         #"pyperclip", # must be installed manually if needed.
         #"ipython",  # You should only need this if you have it installed already???
+        #"rjsmin", "rcssmin",  # optional: minify GIZMO_BUNDLE bundles if installed.
         ],
     scripts = [
         "bin/snap_gizmo",
@@ -37,13 +38,14 @@ setup(
         "bin/gz_examine",
         "bin/json_gizmo",
         "bin/gizmo_reachable_server_name",
+        "bin/gizmo_precompress_static",
     ],
     package_data={
         "H5Gizmos": [
             'js/*.js'
             ],
         },
-    python_requires=">=3.6",
+    python_requires=">=3.7",
     entry_points={
         'jupyter_serverproxy_servers': [
             'GizmoLink = H5Gizmos:setup_gizmo_link',
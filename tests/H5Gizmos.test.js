@@ -774,6 +774,46 @@ test("makes a function.", () => {
     expect(r).toEqual((4 + 5) * 3);
 });
 
+test("fetches an array in parallel ranges.", (done) => {
+    var h5 = H5Gizmos;
+    var data = new Uint8Array(1000);
+    for (var i=0; i<data.length; i++) {
+        data[i] = i % 251;
+    }
+    var ranges = [];
+    global.fetch = async function (url, options) {
+        var range = options.headers["Range"];
+        var match = /bytes=(\d+)-(\d+)/.exec(range);
+        var start = +match[1];
+        var end = +match[2] + 1;
+        ranges.push([start, end]);
+        var part = data.slice(start, end);
+        var sent = false;
+        var reader = {
+            read: async function () {
+                if (sent) { return {done: true}; }
+                sent = true;
+                return {done: false, value: part};
+            }
+        };
+        return {ok: true, status: 206, body: {getReader: function () { return reader; }}};
+    };
+    var store = {};
+    var progress = [];
+    var on_progress = function(loaded, total) { progress.push(loaded); };
+    var options = {chunk_size: 128, parallel: 3, shape: [10, 100], on_progress: on_progress};
+    var deferred = h5.fetch_array("data.bin", store, "array", Uint8Array, data.length, options);
+    var resolve = function(length) {
+        expect(length).toEqual(1000);
+        expect(ranges.length).toEqual(8);
+        expect(store.array.shape).toEqual([10, 100]);
+        expect(Array.from(store.array)).toEqual(Array.from(data));
+        expect(progress[progress.length - 1]).toEqual(1000);
+        done();
+    };
+    deferred.bind_actions(resolve, done);
+});
+
 /* New function has been commented because is doesn't always work.
 test("executes New.", () => {
     var h5 = H5Gizmos;